@@ -0,0 +1,57 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/17
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time per number needed to read the body lines of
+# the MF3 sections in tests/testdata in blocks of increasing size,
+# converted with NumPy and line by line.
+#
+# Usage: python benchmarks/bench_block_decoder.py [NUMBER_OF_LINES ...]
+
+import sys
+import time
+from pathlib import Path
+from endf_parserpy import math_utils
+from endf_parserpy.fortran_utils import read_fort_float_block
+
+
+def measure(func, repeat=5, number=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) / number
+
+
+if __name__ == "__main__":
+    nlines_list = (
+        [int(n) for n in sys.argv[1:]] if len(sys.argv) > 1 else [5, 10, 50, 200]
+    )
+    testdata_dir = Path(__file__).parent.parent / "tests" / "testdata"
+    endf_file = sorted(testdata_dir.glob("*.endf"))[0]
+    # body lines of the TAB1 records in MF3, without the HEAD, CONT and
+    # interpolation lines of the first section
+    lines = [l for l in endf_file.read_text().splitlines() if l[70:72] == " 3"]
+    lines = lines[3:]
+    numpy_module = math_utils.get_numpy()
+    for nlines in nlines_list:
+        block = lines[:nlines]
+        num = 6 * len(block)
+        timings = {}
+        for kernel in ("numpy", "line by line"):
+            math_utils._numpy = numpy_module if kernel == "numpy" else False
+            timings[kernel] = measure(lambda: read_fort_float_block(block, num))
+        math_utils._numpy = numpy_module
+        print(
+            f"{num:6d} numbers: NumPy {timings['numpy']/num*1e9:6.0f} ns/number, "
+            + f"line by line {timings['line by line']/num*1e9:6.0f} ns/number"
+        )
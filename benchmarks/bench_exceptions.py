@@ -0,0 +1,83 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Count the exceptions raised while parsing the sections of the
+# ENDF-6 files in tests/testdata, both with the interpreter and the
+# codegen backend. Exceptions raised and caught in C code are
+# invisible to the tracing function and hence not counted.
+#
+# Usage: python benchmarks/bench_exceptions.py [MF ...]
+
+import sys
+from collections import Counter
+from pathlib import Path
+from endf_parserpy import EndfParser
+from endf_parserpy.endf_utils import split_sections
+
+
+class ExceptionCounter:
+
+    def __init__(self):
+        self.exceptions = {}
+
+    def trace(self, frame, event, arg):
+        frame.f_trace_lines = False
+        return self.trace_local
+
+    def trace_local(self, frame, event, arg):
+        if event == "exception":
+            exc = arg[1]
+            # an exception propagating through several frames
+            # triggers an event in each of them. The references to the
+            # exceptions are kept so that their ids are not reused.
+            self.exceptions.setdefault(id(exc), exc)
+        return self.trace_local
+
+    def __enter__(self):
+        self.exceptions = {}
+        sys.settrace(self.trace)
+        return self
+
+    def __exit__(self, *args):
+        sys.settrace(None)
+
+
+if __name__ == "__main__":
+    mf_list = [int(mf) for mf in sys.argv[1:]]
+    testdata_dir = Path(__file__).parent.parent / "tests" / "testdata"
+    for backend in ("interpreter", "codegen"):
+        print(f"backend: {backend}")
+        parser = EndfParser(cache_dir=False, print_cache_info=False, backend=backend)
+        for endf_file in sorted(testdata_dir.glob("*.endf")):
+            lines = endf_file.read_text().splitlines()
+            # compile the recipes before counting
+            parser.parse(lines)
+            mfmt_list = [
+                (mf, mt)
+                for mf, mt_dic in split_sections(lines).items()
+                for mt in mt_dic
+                if mf != 0 and (len(mf_list) == 0 or mf in mf_list)
+            ]
+            total = Counter()
+            num_sections = 0
+            for mf, mt in mfmt_list:
+                with ExceptionCounter() as counter:
+                    parser.parse(lines, include=((mf, mt),))
+                total.update(type(exc).__name__ for exc in counter.exceptions.values())
+                num_sections += 1
+            num_exceptions = sum(total.values())
+            print(
+                f"{endf_file.name}: {num_exceptions} exceptions in "
+                + f"{num_sections} sections "
+                + f"({num_exceptions / max(num_sections, 1):.2f} per section)"
+            )
+            for name, count in total.most_common():
+                print(f"    {name}: {count}")
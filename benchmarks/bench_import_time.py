@@ -0,0 +1,62 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time needed to import endf_parserpy and some of
+# its modules in a fresh interpreter. The best time over several
+# runs is reported. If a limit in milliseconds is given, the
+# script fails if the import of the package exceeds it, which
+# allows to guard against regressions in continuous integration.
+#
+# Usage: python benchmarks/bench_import_time.py [num_repeats] [limit_ms]
+
+import subprocess
+import sys
+
+
+import_statements = (
+    "import endf_parserpy",
+    "from endf_parserpy.accessories import EndfPath",
+    "from endf_parserpy import user_tools",
+    "from endf_parserpy import EndfParser",
+)
+
+
+def measure_import_time(statement, num_repeats):
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    best_time = None
+    for _ in range(num_repeats):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            stdout=subprocess.PIPE,
+            check=True,
+            universal_newlines=True,
+        )
+        curtime = float(result.stdout.strip())
+        best_time = curtime if best_time is None else min(best_time, curtime)
+    return best_time
+
+
+if __name__ == "__main__":
+    num_repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    limit_ms = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    import_times = {}
+    for statement in import_statements:
+        import_times[statement] = measure_import_time(statement, num_repeats)
+        print(f"{statement:50s} {import_times[statement]*1e3:10.3f} ms")
+    package_time_ms = import_times[import_statements[0]] * 1e3
+    if limit_ms is not None and package_time_ms > limit_ms:
+        print(f"import of endf_parserpy exceeds the limit of {limit_ms} ms")
+        sys.exit(1)
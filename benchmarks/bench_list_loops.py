@@ -0,0 +1,69 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time per value needed to parse and write a LIST record
+# with a matrix of NE x NE values, as present in MF33 sections (LB=5),
+# for increasing NE. The loop over the columns is mapped in bulk.
+# For comparison, the matrix is also mapped value by value, which is
+# enforced by using the loop variable of the outer loop as last index.
+#
+# Usage: python benchmarks/bench_list_loops.py [NE ...]
+
+import sys
+import time
+from endf_parserpy import EndfParser
+
+
+recipe_template = """
+[MAT, 33, MT/ 0.0, 0.0, 0, 0, NE*NE, NE/
+    {{INDEX_SPEC}{kp=1 to NE}}{k=1 to NE} ]LIST
+SEND
+"""
+
+index_specs = {"bulk": "F[k,kp]", "value by value": "F[kp,k]"}
+
+
+def measure(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    ne_list = [int(ne) for ne in sys.argv[1:]] if len(sys.argv) > 1 else [50, 100, 200]
+    for backend in ("interpreter", "codegen"):
+        print(f"backend: {backend}")
+        for mode, index_spec in index_specs.items():
+            recipe = recipe_template.replace("INDEX_SPEC", index_spec)
+            parser = EndfParser(
+                recipes={33: {1: recipe}},
+                ignore_missing_tpid=True,
+                cache_dir=False,
+                print_cache_info=False,
+                backend=backend,
+            )
+            for ne in ne_list:
+                matrix = {
+                    k: {kp: k + kp / ne for kp in range(1, ne + 1)}
+                    for k in range(1, ne + 1)
+                }
+                datadic = {"MAT": 1, "MF": 33, "MT": 1, "NE": ne, "F": matrix}
+                write_time, lines = measure(lambda: parser.write({33: {1: datadic}}))
+                parse_time, _ = measure(lambda: parser.parse(lines))
+                numvals = ne * ne
+                print(
+                    f"{mode:>15}, NE={ne:4d}: "
+                    f"parsing {parse_time/numvals*1e9:6.0f} ns/value, "
+                    f"writing {write_time/numvals*1e9:6.0f} ns/value"
+                )
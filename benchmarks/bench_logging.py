@@ -0,0 +1,57 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/17
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time needed to parse the ENDF-6 files in tests/testdata
+# with the diagnostics switched off (logging level WARNING, the default)
+# and switched on (logging level INFO with the messages discarded).
+# The difference is the time spent on producing the diagnostics,
+# which should not be spent if they are switched off.
+#
+# Usage: python benchmarks/bench_logging.py [MF ...]
+
+import sys
+import time
+import logging
+from pathlib import Path
+from endf_parserpy import EndfParser
+
+
+def measure(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    include = tuple(int(mf) for mf in sys.argv[1:]) or None
+    testdata_dir = Path(__file__).parent.parent / "tests" / "testdata"
+    logger = logging.getLogger()
+    # messages of level INFO are passed to this handler and discarded
+    logger.addHandler(logging.NullHandler())
+    for backend in ("interpreter", "codegen"):
+        print(f"backend: {backend}")
+        parser = EndfParser(cache_dir=False, print_cache_info=False, backend=backend)
+        for endf_file in sorted(testdata_dir.glob("*.endf")):
+            lines = endf_file.read_text().splitlines()
+            # compile the recipes before measuring
+            parser.parse(lines, include=include)
+            timings = {}
+            for label, level in (("off", logging.WARNING), ("on", logging.INFO)):
+                logger.setLevel(level)
+                timings[label] = measure(lambda: parser.parse(lines, include=include))
+            logger.setLevel(logging.WARNING)
+            print(
+                f"{endf_file.name}: diagnostics off {timings['off']*1e3:7.1f} ms, "
+                + f"on {timings['on']*1e3:7.1f} ms"
+            )
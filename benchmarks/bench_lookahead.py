@@ -0,0 +1,73 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/17
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time per subsection needed to parse a section with
+# NS subsections, each of which contains an if statement with
+# lookahead, for increasing NS. The time per subsection should
+# not depend on the size of the data read before the lookahead.
+#
+# Usage: python benchmarks/bench_lookahead.py [NS ...]
+
+import sys
+import time
+from endf_parserpy import EndfParser
+
+
+recipe = """
+[MAT, 3, MT/ 0.0, 0.0, 0, 0, NS, 0]HEAD
+for k=1 to NS:
+    (subsection[k])
+    [MAT, 3, MT/ 0.0, 0.0, 0, 0, NP, 0/ {E[i]}{i=1 to NP} ]LIST
+    if LB == 1 [lookahead=1]:
+        [MAT, 3, MT/ 0.0, 0.0, LB, 0, NP, 0/ {X[i]}{i=1 to NP} ]LIST
+    elif LB == 2 [lookahead=1]:
+        [MAT, 3, MT/ 0.0, 0.0, LB, 0, 2*NP, NP/ {X[i], Y[i]}{i=1 to NP} ]LIST
+    endif
+    (/subsection[k])
+endfor
+SEND
+"""
+
+
+def measure(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    ns_list = [int(ns) for ns in sys.argv[1:]] if len(sys.argv) > 1 else [10, 100, 400]
+    np = 50
+    for backend in ("interpreter", "codegen"):
+        print(f"backend: {backend}")
+        parser = EndfParser(
+            recipes={3: {1: recipe}},
+            ignore_missing_tpid=True,
+            cache_dir=False,
+            print_cache_info=False,
+            backend=backend,
+        )
+        for ns in ns_list:
+            subsection = {
+                "NP": np,
+                "LB": 2,
+                "E": {i: float(i) for i in range(1, np + 1)},
+                "X": {i: 0.5 * i for i in range(1, np + 1)},
+                "Y": {i: 2.5 * i for i in range(1, np + 1)},
+            }
+            datadic = {"MAT": 1, "MF": 3, "MT": 1, "NS": ns}
+            datadic["subsection"] = {k: subsection for k in range(1, ns + 1)}
+            lines = parser.write({3: {1: datadic}})
+            parse_time, _ = measure(lambda: parser.parse(lines))
+            print(f"NS={ns:4d}: parsing {parse_time/ns*1e6:8.1f} us/subsection")
@@ -0,0 +1,58 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/17
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time per call of the arithmetic helpers used for
+# evaluating the expressions in the ENDF-6 recipes with scalars,
+# and the time per element for sequences of increasing length,
+# processed with NumPy and element by element.
+#
+# Usage: python benchmarks/bench_math_utils.py [N ...]
+
+import sys
+import time
+from endf_parserpy import math_utils
+from endf_parserpy.math_utils import math_add, math_mul, math_div, math_allclose
+
+
+def measure(func, repeat=5, number=1000):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) / number
+
+
+if __name__ == "__main__":
+    n_list = [int(n) for n in sys.argv[1:]] if len(sys.argv) > 1 else [100, 10000]
+    scalar_calls = {
+        "math_add(3, 4)": lambda: math_add(3, 4),
+        "math_mul(2.5, 4)": lambda: math_mul(2.5, 4),
+        "math_div(12, 4)": lambda: math_div(12, 4, True),
+        "math_allclose(1.5, 1.5)": lambda: math_allclose(1.5, 1.5),
+    }
+    for label, func in scalar_calls.items():
+        print(f"{label:>24}: {measure(func, number=100000)*1e9:6.0f} ns")
+    numpy_module = math_utils.get_numpy()
+    for n in n_list:
+        x = [0.1 * i for i in range(n)]
+        y = [v * (1 + 1e-7) for v in x]
+        for kernel in ("numpy", "elementwise"):
+            math_utils._numpy = numpy_module if kernel == "numpy" else False
+            number = max(1, 100000 // n)
+            add_time = measure(lambda: math_add(x, y), number=number)
+            close_time = measure(lambda: math_allclose(x, y), number=number)
+            print(
+                f"N={n:6d} {kernel:>11}: math_add {add_time/n*1e9:5.1f} ns/value, "
+                + f"math_allclose {close_time/n*1e9:5.1f} ns/value"
+            )
+        math_utils._numpy = numpy_module
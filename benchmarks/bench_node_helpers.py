@@ -0,0 +1,108 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time per call of the helper functions retrieving
+# information from the nodes of the compiled recipes, which is
+# needed whenever a record is mapped or a section opened.
+# The time of the cached helpers is compared with the time
+# needed for walking the subtree of a node.
+#
+# Usage: python benchmarks/bench_node_helpers.py
+
+import time
+from collections import defaultdict
+from endf_parserpy.endf_recipe_utils import RecipeTreeDict
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+from endf_parserpy.endf_mapping_core import RecordField
+from endf_parserpy.endf_mapping_utils import (
+    get_varname,
+    get_indexquants,
+    _find_varname,
+    _find_indexquants,
+)
+from endf_parserpy.meta_control_utils import open_section, close_section
+from endf_parserpy.tree_utils import search_name
+
+
+def collect_nodes(tree, names, nodes):
+    if hasattr(tree, "children"):
+        if tree.data in names:
+            nodes.append(tree)
+        for ch in tree.subtrees:
+            collect_nodes(ch, names, nodes)
+    return nodes
+
+
+def measure(func, nodes, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for node in nodes:
+            func(node)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(nodes)
+
+
+def report(label, walk_time, cached_time):
+    print(
+        f"{label:>32}: {walk_time*1e9:8.0f} ns walking the subtree, "
+        + f"{cached_time*1e9:6.0f} ns cached"
+    )
+
+
+if __name__ == "__main__":
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    extvarnames = []
+    exprs = []
+    section_heads = []
+    for mf, mt in tree_dic.iter_mfmt():
+        tree = tree_dic.get_tree(mf, mt)
+        collect_nodes(tree, ("extvarname",), extvarnames)
+        collect_nodes(tree, ("expr",), exprs)
+        collect_nodes(tree, ("section_head",), section_heads)
+    print(
+        f"{len(extvarnames)} variables, {len(exprs)} expressions, "
+        + f"{len(section_heads)} sections in the shipped recipes"
+    )
+    for node in extvarnames + section_heads:
+        get_varname(node)
+        get_indexquants(node)
+    report(
+        "get_varname",
+        measure(_find_varname, extvarnames),
+        measure(get_varname, extvarnames),
+    )
+    report(
+        "get_indexquants",
+        measure(_find_indexquants, extvarnames),
+        measure(get_indexquants, extvarnames),
+    )
+    fields = [RecordField(None, expr) for expr in exprs]
+    report(
+        "search_name DESIRED_NUMBER",
+        measure(lambda expr: search_name(expr, "DESIRED_NUMBER"), exprs),
+        measure(lambda field: field.contains_desired_number, fields),
+    )
+    report(
+        "get_varname for section heads",
+        measure(_find_varname, section_heads),
+        measure(get_varname, section_heads),
+    )
+
+    def open_close_section(node):
+        loop_vars = defaultdict(lambda: 1)
+        datadic = open_section(node, {}, loop_vars, True)
+        close_section(node, datadic, loop_vars)
+
+    print(
+        f"{'open_section + close_section':>32}: "
+        + f"{measure(open_close_section, section_heads)*1e9:8.0f} ns"
+    )
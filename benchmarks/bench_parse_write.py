@@ -0,0 +1,52 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time needed to parse and write the ENDF-6 files
+# in tests/testdata, both for selected MF sections and complete files,
+# with both backends of the parser.
+# The recipes are compiled before the measurement.
+#
+# Usage: python benchmarks/bench_parse_write.py [MF ...]
+
+import sys
+import time
+from pathlib import Path
+from endf_parserpy import EndfParser
+
+
+def measure(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    mf_list = [int(mf) for mf in sys.argv[1:]] if len(sys.argv) > 1 else [3, 6]
+    testdata_dir = Path(__file__).parent.parent / "tests" / "testdata"
+    for backend in ("interpreter", "codegen"):
+        print(f"backend: {backend}")
+        parser = EndfParser(cache_dir=False, print_cache_info=False, backend=backend)
+        for endf_file in sorted(testdata_dir.glob("*.endf")):
+            print(endf_file.name)
+            for include in [(mf,) for mf in mf_list] + [None]:
+                parser.parsefile(endf_file, include=include)
+                parse_time, endf_dic = measure(
+                    lambda: parser.parsefile(endf_file, include=include)
+                )
+                write_time, _ = measure(lambda: parser.write(endf_dic, include=include))
+                label = "all" if include is None else f"MF{include[0]}"
+                print(
+                    f"{label:>6}: parsing {parse_time*1e3:8.1f} ms, "
+                    f"writing {write_time*1e3:8.1f} ms"
+                )
@@ -0,0 +1,52 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the cost of creating EndfParser instances with different
+# option sets and retrieving all compiled recipes, once for the
+# first (cold) instance in the process and then for subsequent
+# instances that reuse the process-wide recipe registry.
+#
+# Usage: python benchmarks/bench_parser_instantiation.py [num_repeats]
+
+import sys
+import time
+from endf_parserpy import EndfParser
+from endf_parserpy.endf_recipe_utils import clear_recipe_registry
+
+
+def create_parser_and_load_recipes(**kwargs):
+    parser = EndfParser(print_cache_info=False, **kwargs)
+    parser.tree_dic.compile_all()
+    return parser
+
+
+def time_call(fun, *args, **kwargs):
+    start = time.perf_counter()
+    fun(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    num_repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    option_sets = (
+        {"ignore_number_mismatch": False, "fuzzy_matching": False},
+        {"ignore_number_mismatch": True, "fuzzy_matching": True},
+    )
+    clear_recipe_registry()
+    cold_time = time_call(create_parser_and_load_recipes, **option_sets[0])
+    warm_times = []
+    for i in range(num_repeats):
+        opts = option_sets[i % len(option_sets)]
+        warm_times.append(time_call(create_parser_and_load_recipes, **opts))
+    warm_time = sum(warm_times) / len(warm_times)
+    print(f"first instance (registry cold):  {cold_time*1e3:10.3f} ms")
+    print(f"later instances (registry warm): {warm_time*1e3:10.3f} ms")
+    print(f"speed-up: {cold_time / warm_time:.0f}x")
@@ -0,0 +1,50 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/16
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+# Measure the time needed to compile all default recipes
+# with the LALR and the Earley recipe compiler, including
+# the construction of the respective recipe parser.
+#
+# Usage: python benchmarks/bench_recipe_compilation.py
+
+import time
+from endf_parserpy.endf_lark import endf_recipe_grammar
+from endf_parserpy.endf_recipe_utils import (
+    RECIPE_COMPILERS,
+    RecipeTreeDict,
+    compile_recipe,
+    get_recipe_parser,
+)
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+
+
+def get_distinct_recipes():
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    recipes = set()
+    for mf, mt in tree_dic.iter_mfmt():
+        recipes.add(tree_dic.get_recipe(mf, mt))
+    return recipes
+
+
+if __name__ == "__main__":
+    recipes = get_distinct_recipes()
+    for compiler in RECIPE_COMPILERS:
+        start = time.perf_counter()
+        recipe_parser = get_recipe_parser(endf_recipe_grammar, compiler)
+        setup_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for recipe in recipes:
+            compile_recipe(recipe, recipe_parser)
+        compile_time = time.perf_counter() - start
+        print(
+            f"{compiler:>6}: parser creation {setup_time*1e3:8.1f} ms, "
+            f"compilation of {len(recipes)} recipes {compile_time*1e3:8.1f} ms"
+        )
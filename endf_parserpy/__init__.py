@@ -1,2 +1,34 @@
-from .endf_parser import EndfParser
-from .endf_parser import BasicEndfParser  # deprecated alias
+import sys
+
+# EndfParser and its dependencies are only imported when first
+# accessed so that modules such as accessories or user_tools can be
+# used without paying for the import of the complete parser (PEP 562).
+_lazy_attributes = {
+    "EndfParser": "endf_parser",
+    "BasicEndfParser": "endf_parser",  # deprecated alias
+    "preload": "endf_parser",
+}
+
+__all__ = ["EndfParser", "BasicEndfParser", "preload"]
+
+
+def __getattr__(name):
+    modname = _lazy_attributes.get(name, None)
+    if modname is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module("." + modname, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported before Python 3.7
+    from .endf_parser import EndfParser
+    from .endf_parser import BasicEndfParser
+    from .endf_parser import preload
@@ -3,7 +3,7 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2024/02/05
-# Last modified:   2024/02/13
+# Last modified:   2026/10/16
 # License:         MIT
 # Copyright (c) 2024 International Atomic Energy Agency (IAEA)
 #
@@ -13,10 +13,10 @@ import argparse
 import sys
 import logging
 from glob import glob
-from .endf_parser import EndfParser
 
 
 def validate_endf_files(files, strict=False):
+    from .endf_parser import EndfParser
 
     logger = logging.getLogger()
     logger.setLevel(logging.CRITICAL)
@@ -3,7 +3,7 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2024/02/17
+# Last modified:   2026/10/16
 # License:         MIT
 # Copyright (c) 2022 International Atomic Energy Agency (IAEA)
 #
@@ -153,3 +153,76 @@ DESIRED_NUMBER : NUMBER "?"
 // is permitted to be inconsistent with a previously read value
 inconsistent_varspec : extvarname "?"
 """
+
+
+# LALR version of the recipe grammar derived from the one above.
+# Record lines are matched as a whole by the RECORD_LINE terminal
+# because the record type only becomes known at the end of the line.
+# They are subsequently parsed with the start rule associated with
+# the record type given in `endf_record_start_rules`.
+# The last field of a record preceding a slash must not contain
+# a division, and the opening bracket of a lookahead option is
+# matched by a separate terminal to be distinguished from an index.
+# The parse trees are the same as those obtained with the grammar
+# above, once the LOOKAHEAD_BRACKET token is renamed to LSQB.
+_lalr_grammar_modifications = (
+    (
+        """code_token: (endf_line | for_loop | if_clause | section |
+            | abbreviation | comment_block)""",
+        """code_token: (endf_line | for_loop | if_clause | section
+            | abbreviation | comment_block)""",
+    ),
+    (
+        """endf_line : (list_line | head_or_cont_line | tab1_line | tab2_line
+            | text_line | dir_line | intg_line | send_line | stop_line) NEWLINE""",
+        """endf_line : (RECORD_LINE | send_line | stop_line) NEWLINE
+RECORD_LINE : /\\[(?:[^\\[\\]]|\\[[^\\[\\]]*\\])*\\] *[A-Z0-9]+(?: *\\([^()\\n]*\\))?/""",
+    ),
+    (
+        """record_fields : expr "," expr "," expr "," expr "," expr "," expr""",
+        """record_fields : expr "," expr "," expr "," expr "," expr "," last_field_expr
+last_field_expr : last_field_addition -> expr
+                | last_field_subtraction -> expr
+                | last_field_addpart -> expr
+last_field_addpart : last_field_multiplication -> addpart
+                   | last_field_modulo -> addpart
+                   | mulpart -> addpart
+last_field_multiplication : last_field_addpart "*" mulpart -> multiplication
+last_field_modulo : last_field_addpart "%" mulpart -> modulo
+last_field_addition : last_field_expr "+" last_field_addpart -> addition
+last_field_subtraction : last_field_expr "-" last_field_addpart -> subtraction""",
+    ),
+    (
+        """lookahead_option : "[" "lookahead" "=" expr "]\"""",
+        """lookahead_option : LOOKAHEAD_BRACKET "lookahead" "=" expr "]"
+LOOKAHEAD_BRACKET.2 : /\\[(?= *lookahead *=)/""",
+    ),
+    (
+        """VARNAME : LETTER (LETTER | DIGIT | "_")*""",
+        """VARNAME : /(?!else:)/ LETTER (LETTER | DIGIT | "_")*""",
+    ),
+)
+
+
+def _derive_grammar(grammar, modifications):
+    for old_rule, new_rule in modifications:
+        if old_rule not in grammar:
+            raise ValueError(f"rule `{old_rule}` not found in grammar")
+        grammar = grammar.replace(old_rule, new_rule)
+    return grammar
+
+
+endf_recipe_grammar_lalr = _derive_grammar(
+    endf_recipe_grammar, _lalr_grammar_modifications
+)
+
+endf_record_start_rules = {
+    "TEXT": "text_line",
+    "CONT": "head_or_cont_line",
+    "HEAD": "head_or_cont_line",
+    "DIR": "dir_line",
+    "INTG": "intg_line",
+    "TAB1": "tab1_line",
+    "TAB2": "tab2_line",
+    "LIST": "list_line",
+}
@@ -3,18 +3,27 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/11/15
-# Last modified:   2024/01/26
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022 International Atomic Energy Agency (IAEA)
 #
 ############################################################
 
-from .logging_utils import logging, abbreviate_valstr, should_skip_logging_info
+from .logging_utils import (
+    logging,
+    abbreviate_valstr,
+    info_enabled,
+    render_record_log,
+    should_skip_logging_info,
+)
 from .custom_exceptions import (
     NumberMismatchError,
     InvalidIntegerError,
+    LoopVariableError,
     SeveralUnboundVariablesError,
     SizeMismatchError,
+    UnavailableIndexError,
+    VariableNotFoundError,
 )
 from .endf_mapping_utils import (
     get_varname,
@@ -27,11 +36,213 @@ from .endf_mapping_utils import (
     set_varval,
     get_varval,
     generate_varname_str,
+    find_scope,
+    journal_assignment,
+    Abbreviation,
 )
-from .tree_utils import is_token, get_name, search_name, get_value
+from .tree_utils import is_tree, is_token, get_name, search_name, get_value
+from .endf_recipe_analysis import get_extvarnames, get_variable_ref
 from .math_utils import math_allclose
 
 
+class RecordField:
+    """Field of an ENDF record prepared for the mapping functions.
+
+    The information needed to map a field of a record to a variable
+    and back is determined once when a recipe is compiled
+    (see :func:`compile_record_fields`). The class is also used for
+    other expressions evaluated repeatedly, such as the bounds
+    of loops. If the expression
+    in the field consists only of a variable, its name is stored
+    in ``varname`` and the index specification in ``indices`` as a
+    tuple with the names of the loop variables and integer numbers.
+    If the expression is a number, it is stored in ``value``.
+    ``variables`` contains the variables in the expression as
+    tuples ``(varname, indices)``.
+    """
+
+    __slots__ = (
+        "key",
+        "expr",
+        "extvarname",
+        "varname",
+        "indices",
+        "is_const",
+        "value",
+        "contains_desired_number",
+        "contains_inconsistent_varspec",
+        "variables",
+    )
+
+    def __init__(self, key, expr):
+        self.key = key
+        self.expr = expr
+        self.extvarname = None
+        self.varname = None
+        self.indices = None
+        self.is_const = False
+        self.value = None
+        self.contains_desired_number = search_name(expr, "DESIRED_NUMBER")
+        self.contains_inconsistent_varspec = search_name(expr, "inconsistent_varspec")
+        if is_token(expr) and get_name(expr) == "VARNAME":
+            self.variables = frozenset(((get_value(expr), ()),))
+        else:
+            self.variables = frozenset(
+                get_variable_ref(v) for v in get_extvarnames(expr)
+            )
+        # descend to the variable or number if the expression consists only of it
+        node = expr
+        while is_tree(node) and node.data != "extvarname" and len(node.children) == 1:
+            node = node.children[0]
+        name = get_name(node)
+        if name in ("NUMBER", "DESIRED_NUMBER"):
+            self.is_const = True
+            self.value = eval_expr(node)[0]
+            return
+        if name not in ("VARNAME", "extvarname"):
+            return
+        indices = []
+        for idxquant in get_indexquants(node) or ():
+            if get_name(idxquant) == "INDEXVAR":
+                indices.append(get_value(idxquant))
+            else:
+                try:
+                    indices.append(int(get_value(idxquant)))
+                except ValueError:
+                    # leave the error reporting to the generic code path
+                    return
+        self.extvarname = node
+        self.varname = get_varname(node)
+        self.indices = tuple(indices)
+
+
+def compile_record_fields(expr_list, basekeys):
+    # remove COMMA tokens as they are not needed
+    expr_list = [
+        expr for expr in expr_list if not is_token(expr) or get_name(expr) != "COMMA"
+    ]
+    fields = tuple(RecordField(key, expr) for key, expr in zip(basekeys, expr_list))
+    return order_record_fields(fields)
+
+
+def order_record_fields(fields):
+    """Arrange the fields of a record in the order they can be solved.
+
+    A field can be mapped to a variable if its expression contains at
+    most one variable whose value is not known yet. The fields are
+    arranged so that each field comes after the fields determining the
+    other variables in its expression, assuming that none of the variables
+    is known before the record is read. Fields that can be solved in the
+    given order keep their position. If no field can be solved, the
+    variables are expected to be determined by preceding records
+    and the remaining fields keep their order.
+    """
+    remaining = list(fields)
+    ordered = []
+    known = set()
+    while len(remaining) > 0:
+        pos = 0
+        for curpos, field in enumerate(remaining):
+            if len(field.variables - known) <= 1:
+                pos = curpos
+                break
+        field = remaining.pop(pos)
+        known.update(field.variables)
+        ordered.append(field)
+    return tuple(ordered)
+
+
+def get_field_vv(field, datadic, loop_vars, cast_int):
+    # equivalent to eval_expr(field.expr, datadic, loop_vars, look_up=False,
+    # cast_int=cast_int) but faster for numbers and plain variables
+    varname = field.varname
+    if varname is None:
+        if field.is_const:
+            return (field.value, 0, None)
+        return eval_expr(
+            field.expr, datadic, loop_vars, look_up=False, cast_int=cast_int
+        )
+    if varname in loop_vars:
+        if varname in datadic:
+            raise LoopVariableError(
+                f"the variable {varname} is both a loop variable and "
+                "a record variable, which is forbidden, check the recipe"
+            )
+        return (loop_vars[varname], 0, None)
+    curdic = datadic
+    if varname not in curdic:
+        curdic = find_scope(varname, datadic, loop_vars, False)
+        if curdic is datadic:
+            return (0, 1, field.extvarname)
+    val = curdic[varname]
+    for idx in field.indices:
+        if idx.__class__ is str:
+            idx = loop_vars[idx]
+        if idx not in val:
+            return (0, 1, field.extvarname)
+        val = val[idx]
+    if val.__class__ is Abbreviation:
+        return val.evaluate(datadic, loop_vars, False, cast_int, True)
+    return (val, 0, None)
+
+
+def get_field_value(field, datadic, loop_vars, look_up=False, cast_int=False):
+    # equivalent to eval_expr_without_unknown_var(field.expr, datadic,
+    # loop_vars, look_up, cast_int)
+    varname = field.varname
+    if varname is None:
+        if field.is_const:
+            return field.value
+        return eval_expr_without_unknown_var(
+            field.expr, datadic, loop_vars, look_up=look_up, cast_int=cast_int
+        )
+    if varname in loop_vars:
+        if varname in datadic:
+            raise LoopVariableError(
+                f"the variable {varname} is both a loop variable and "
+                "a record variable, which is forbidden, check the recipe"
+            )
+        return loop_vars[varname]
+    curdic = datadic
+    if varname not in curdic:
+        curdic = find_scope(varname, datadic, loop_vars, look_up)
+    if varname not in curdic:
+        raise VariableNotFoundError(f"variable {varname} not found", varname)
+    val = curdic[varname]
+    for idx in field.indices:
+        if idx.__class__ is str:
+            idx = loop_vars[idx]
+        if idx not in val:
+            raise UnavailableIndexError(
+                f"index {idx} does not exist in array {varname}"
+            )
+        val = val[idx]
+    if val.__class__ is Abbreviation:
+        return val.evaluate(datadic, loop_vars, look_up, cast_int, False)[0]
+    return val
+
+
+def set_field_value(field, value, datadic, loop_vars):
+    indices = field.indices
+    if "__journal" in loop_vars:
+        keys = (field.varname,) + tuple(
+            loop_vars[idx] if idx.__class__ is str else idx for idx in indices
+        )
+        journal_assignment(datadic, keys, loop_vars)
+    if len(indices) == 0:
+        datadic[field.varname] = value
+        return
+    curdic = datadic.setdefault(field.varname, {})
+    for idx in indices[:-1]:
+        if idx.__class__ is str:
+            idx = loop_vars[idx]
+        curdic = curdic.setdefault(idx, {})
+    idx = indices[-1]
+    if idx.__class__ is str:
+        idx = loop_vars[idx]
+    curdic[idx] = value
+
+
 # TODO: Need to refactor the error message stuff
 def create_variable_exists_error_msg(varname, prev_val, cur_val):
     return (
@@ -70,17 +281,46 @@ def create_size_mismatch_error_msg(realval, expval, sourcekey):
 
 def log_offending_line(record_dic, logging_method):
     logfun = getattr(logging, logging_method)
-    if "__record_spec" in record_dic:
-        record_spec = record_dic["__record_spec"]
-        logfun("Record specification: " + record_spec)
-    if "__line" in record_dic:
-        line = record_dic["__line"]
-        logfun("Offending line: " + line)
+    if "__record_log" in record_dic:
+        record_log = render_record_log(record_dic["__record_log"])
+        logfun("Record specification: " + record_log["record_spec"])
+        logfun("Offending line: " + record_log["line"])
 
 
-def map_recorddic_to_datadic(
-    basekeys, record_dic, expr_list, datadic, loop_vars, parse_opts
-):
+def report_mismatch(mismatch_type, srcval, expval, sourcekey, record_dic, parse_opts):
+    # tolerated mismatches are counted by the diagnostics collector of
+    # the parse call and only logged one by one if requested
+    diagnostics = parse_opts.get("diagnostics", None)
+    keep_sample = False
+    if diagnostics is not None:
+        section = (record_dic.get("MF", None), record_dic.get("MT", None))
+        keep_sample = diagnostics.count_mismatch(mismatch_type, section)
+    should_log = diagnostics is None or parse_opts.get("log_mismatches", False)
+    if not keep_sample and not should_log:
+        return
+    msg = create_variable_wrong_value_error_msg(srcval, expval, sourcekey)
+    if keep_sample:
+        record_log = record_dic.get("__record_log", None)
+        diagnostics.add_sample(mismatch_type, section, msg, record_log)
+    if should_log:
+        logging.warning(msg)
+        log_offending_line(record_dic, "warning")
+
+
+def log_record_variables(varnames, datadic):
+    if not info_enabled():
+        return
+    varnames = tuple(v for v in varnames if v is not None)
+    # Logging info is only produced the first time we encounter a variable
+    if not should_skip_logging_info(varnames, datadic):
+        varvals = tuple(abbreviate_valstr(datadic[v]) for v in varnames)
+        logging.info(
+            "Variable names in this record: "
+            + ", ".join([f"{v}: {vv}" for v, vv in zip(varnames, varvals)])
+        )
+
+
+def map_recorddic_to_datadic(fields, record_dic, datadic, loop_vars, parse_opts):
     parse_opts = parse_opts if parse_opts is not None else {}
     fuzzy_matching = parse_opts.get("fuzzy_matching", False)
     ignore_zero_mismatch = parse_opts.get("ignore_zero_mismatch", True)
@@ -88,144 +328,145 @@ def map_recorddic_to_datadic(
     ignore_varspec_mismatch = parse_opts.get("ignore_varspec_mismatch", True)
     ignore_all_mismatches = parse_opts.get("ignore_all_mismatches", False)
     cast_int = not ignore_all_mismatches
-    zipit = zip(basekeys, expr_list)
-    found_unbound = False
     varnames = []
-    for sourcekey, curexpr in zipit:
-        try:
-            expr_vv = eval_expr(
-                curexpr, datadic, loop_vars, look_up=False, cast_int=cast_int
-            )
-        except SeveralUnboundVariablesError:
-            found_unbound = True
-            continue
-
-        targetkey = get_varname(expr_vv[2])
-        varnames.append(targetkey)
-        # If the record specification in the ENDF recipe
-        # specification contains a value, hence targetkey is None,
-        # we check if the value in the ENDF file is equal to this
-        # value and raise an exception otherwise. Apart from this,
-        # we don't do anything else, as the value in the record
-        # specification can be employed while translating informatoin
-        # in the datadic back to an an ENDF-6 file.
-        # NOTE: This branch is also entered if all variables
-        # appearing in an expression have already been read in
-        # before.
-        if targetkey is None:
-            assert expr_vv[1] == 0
-            # If we have a DESIRED_NUMBER in the expression,
-            # we expect a specific number but do not require it.
-            # If, on the other hand, there are only NUMBERs in the
-            # expression, any inconsistency between these numbers
-            # and the number in the ENDF file will yield an error.
-            contains_desired_number = search_name(curexpr, "DESIRED_NUMBER")
-            contains_inconsistent_varspec = search_name(curexpr, "inconsistent_varspec")
-
-            srcval = record_dic[sourcekey]
-            expval = expr_vv[0]
-            srcval_has_len = hasattr(srcval, "__len__")
-            expval_has_len = hasattr(expval, "__len__")
-            if (
-                (srcval_has_len and not expval_has_len)
-                or (expval_has_len and not srcval_has_len)
-                or (srcval_has_len and expval_has_len and len(srcval) != len(expval))
-            ):
-                errmsg = create_size_mismatch_error_msg(srcval, expval, sourcekey)
-                raise SizeMismatchError(errmsg)
-
-            if not fuzzy_matching:
-                value_mismatch_occurred = record_dic[sourcekey] != expr_vv[0]
-            else:
-                value_mismatch_occurred = not math_allclose(
-                    record_dic[sourcekey], expr_vv[0], atol=1e-7, rtol=1e-5
-                )
-            msg = create_variable_wrong_value_error_msg(
-                record_dic[sourcekey], expr_vv[0], sourcekey
-            )
-            if value_mismatch_occurred:
-                if ignore_zero_mismatch and expr_vv[0] == 0:
-                    logging.warning(msg)
-                    log_offending_line(record_dic, "warning")
-                elif ignore_number_mismatch and contains_desired_number:
-                    logging.warning(msg)
-                    log_offending_line(record_dic, "warning")
-                elif ignore_varspec_mismatch and contains_inconsistent_varspec:
-                    logging.warning(msg)
-                    log_offending_line(record_dic, "warning")
-                elif not ignore_all_mismatches:
-                    log_offending_line(record_dic, "error")
-                    raise NumberMismatchError(msg)
-        # The else branch covers the case when there is still a dangling variable
-        # but the linear equation given in the slot can be solved to obtain its value.
-        else:
+    # The fields are arranged by compile_record_fields in an order
+    # so that all variables can be determined in a single pass.
+    # Fields with several unbound variables are only deferred to
+    # another pass if variables expected to be known are missing.
+    remaining_passes = 3
+    while len(fields) > 0:
+        if remaining_passes == 0:
+            raise SeveralUnboundVariablesError("Found several unbound variables")
+        remaining_passes -= 1
+        deferred_fields = []
+        for field in fields:
+            sourcekey = field.key
             try:
-                val = varvalue_expr_conversion(
-                    expr_vv, record_dic[sourcekey], rwmode="read", cast_int=cast_int
-                )
-            except InvalidIntegerError as pexc:
-                raise InvalidIntegerError(str(pexc) + f" (variable {targetkey})")
+                expr_vv = get_field_vv(field, datadic, loop_vars, cast_int)
+            except SeveralUnboundVariablesError:
+                deferred_fields.append(field)
+                continue
+
+            unbound_expr = expr_vv[2]
+            # If the record specification in the ENDF recipe
+            # specification contains a value, hence unbound_expr is None,
+            # we check if the value in the ENDF file is equal to this
+            # value and raise an exception otherwise. Apart from this,
+            # we don't do anything else, as the value in the record
+            # specification can be employed while translating informatoin
+            # in the datadic back to an an ENDF-6 file.
+            # NOTE: This branch is also entered if all variables
+            # appearing in an expression have already been read in
+            # before.
+            if unbound_expr is None:
+                varnames.append(None)
+                assert expr_vv[1] == 0
+                # If we have a DESIRED_NUMBER in the expression,
+                # we expect a specific number but do not require it.
+                # If, on the other hand, there are only NUMBERs in the
+                # expression, any inconsistency between these numbers
+                # and the number in the ENDF file will yield an error.
+                contains_desired_number = field.contains_desired_number
+                contains_inconsistent_varspec = field.contains_inconsistent_varspec
+
+                srcval = record_dic[sourcekey]
+                expval = expr_vv[0]
+                srcval_has_len = hasattr(srcval, "__len__")
+                expval_has_len = hasattr(expval, "__len__")
+                if (
+                    (srcval_has_len and not expval_has_len)
+                    or (expval_has_len and not srcval_has_len)
+                    or (
+                        srcval_has_len and expval_has_len and len(srcval) != len(expval)
+                    )
+                ):
+                    errmsg = create_size_mismatch_error_msg(srcval, expval, sourcekey)
+                    raise SizeMismatchError(errmsg)
 
-            idxquants = get_indexquants(expr_vv[2])
-            if idxquants is None:
-                datadic[targetkey] = val
+                if not fuzzy_matching:
+                    value_mismatch_occurred = srcval != expval
+                else:
+                    value_mismatch_occurred = not math_allclose(
+                        srcval, expval, atol=1e-7, rtol=1e-5
+                    )
+                if value_mismatch_occurred:
+                    mismatch_type = None
+                    if ignore_zero_mismatch and expval == 0:
+                        mismatch_type = "zero"
+                    elif ignore_number_mismatch and contains_desired_number:
+                        mismatch_type = "number"
+                    elif ignore_varspec_mismatch and contains_inconsistent_varspec:
+                        mismatch_type = "varspec"
+                    elif not ignore_all_mismatches:
+                        msg = create_variable_wrong_value_error_msg(
+                            srcval, expval, sourcekey
+                        )
+                        log_offending_line(record_dic, "error")
+                        raise NumberMismatchError(msg)
+                    # mismatches in a lookahead are encountered again
+                    # when the selected branch is executed
+                    if mismatch_type is not None and "__lookahead" not in loop_vars:
+                        report_mismatch(
+                            mismatch_type,
+                            srcval,
+                            expval,
+                            sourcekey,
+                            record_dic,
+                            parse_opts,
+                        )
+            # A plain variable not bound yet takes the value in the field
+            elif unbound_expr is field.extvarname:
+                varnames.append(field.varname)
+                set_field_value(field, record_dic[sourcekey], datadic, loop_vars)
+            # The else branch covers the case when there is still a dangling variable
+            # but the linear equation given in the slot can be solved to obtain its value.
             else:
-                set_array_value(targetkey, idxquants, val, datadic, loop_vars)
+                targetkey = get_varname(unbound_expr)
+                varnames.append(targetkey)
+                try:
+                    val = varvalue_expr_conversion(
+                        expr_vv, record_dic[sourcekey], rwmode="read", cast_int=cast_int
+                    )
+                except InvalidIntegerError as pexc:
+                    raise InvalidIntegerError(str(pexc) + f" (variable {targetkey})")
 
-    # Logging info is only produced the first time we encounter a variable
-    tmp = tuple(v for v in varnames if v is not None)
-    if not should_skip_logging_info(tmp, datadic):
-        varvals = tuple(abbreviate_valstr(datadic[v]) for v in tmp)
-        logging.info(
-            "Variable names in this record: "
-            + ", ".join([f"{v}: {vv}" for v, vv in zip(tmp, varvals)])
-        )
+                idxquants = get_indexquants(unbound_expr)
+                if idxquants is None:
+                    journal_assignment(datadic, (targetkey,), loop_vars)
+                    datadic[targetkey] = val
+                else:
+                    set_array_value(targetkey, idxquants, val, datadic, loop_vars)
 
-    if found_unbound:
-        raise SeveralUnboundVariablesError(
-            "Found several unbound variables in this line"
-        )
-    else:
-        return datadic
+        fields = deferred_fields
 
+    log_record_variables(varnames, datadic)
+    return datadic
 
-def map_datadic_to_recorddic(
-    basekeys, record_dic, expr_list, datadic, loop_vars, parse_opts
-):
-    zipit = zip(basekeys, expr_list)
-    for sourcekey, curexpr in zipit:
-        val = eval_expr_without_unknown_var(
-            curexpr, datadic, loop_vars, look_up=False, cast_int=False
-        )
-        record_dic[sourcekey] = val
-    return record_dic
 
+def map_datadic_to_recorddic(fields, record_dic, datadic, loop_vars, parse_opts):
+    for field in fields:
+        record_dic[field.key] = get_field_value(field, datadic, loop_vars)
+    return record_dic
 
-def map_record_helper(
-    expr_list, basekeys, record_dic, datadic, loop_vars, rwmode, parse_opts=None
-):
-    # remove COMMA tokens as they are not needed
-    expr_list = [
-        expr for expr in expr_list if not is_token(expr) or get_name(expr) != "COMMA"
-    ]
 
+def map_record_fields(fields, record_dic, datadic, loop_vars, rwmode, parse_opts=None):
     if rwmode == "read":
-        parse_tries = 3
-        while parse_tries > 0:
-            try:
-                return map_recorddic_to_datadic(
-                    basekeys, record_dic, expr_list, datadic, loop_vars, parse_opts
-                )
-            except SeveralUnboundVariablesError:
-                parse_tries -= 1
-
-        raise SeveralUnboundVariablesError("Found several unbound variables")
+        return map_recorddic_to_datadic(
+            fields, record_dic, datadic, loop_vars, parse_opts
+        )
     else:
         return map_datadic_to_recorddic(
-            basekeys, record_dic, expr_list, datadic, loop_vars, parse_opts
+            fields, record_dic, datadic, loop_vars, parse_opts
         )
 
 
+def map_record_helper(
+    expr_list, basekeys, record_dic, datadic, loop_vars, rwmode, parse_opts=None
+):
+    fields = compile_record_fields(expr_list, basekeys)
+    return map_record_fields(fields, record_dic, datadic, loop_vars, rwmode, parse_opts)
+
+
 def map_text_record_helper(
     expr_list, basekeys, record_dic, datadic, loop_vars, rwmode, parse_opts=None
 ):
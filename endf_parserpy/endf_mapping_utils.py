@@ -3,13 +3,19 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2022/05/30
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022 International Atomic Energy Agency (IAEA)
 #
 ############################################################
 
-from .tree_utils import is_tree, get_name, get_value, is_token, get_child, get_value
+from .tree_utils import (
+    is_tree,
+    get_name,
+    get_value,
+    is_token,
+    get_child,
+)
 from .logging_utils import write_info
 from .custom_exceptions import (
     VariableInDenominatorError,
@@ -20,6 +26,7 @@ from .custom_exceptions import (
     SeveralUnboundVariablesError,
 )
 from .math_utils import math_add, math_sub, math_mul, math_div, math_mod, math_neg
+from copy import deepcopy
 import re
 
 
@@ -44,11 +51,9 @@ def get_indexvalue(token, loop_vars):
 
 
 def substitute_abbreviation(val, datadic, loop_vars, look_up):
-    if not is_tree(val):
+    if val.__class__ is not Abbreviation:
         return val
-    assert get_name(val) == "expr"
-    val = eval_expr_without_unknown_var(val, datadic, loop_vars, look_up)
-    return val
+    return val.evaluate(datadic, loop_vars, look_up, True, False)[0]
 
 
 def get_array_value(varname, idxquants, datadic, loop_vars):
@@ -64,7 +69,47 @@ def get_array_value(varname, idxquants, datadic, loop_vars):
     return curdic
 
 
+# While a lookahead is performed, the changes made to the dictionaries
+# are recorded in the journal stored under the key `__journal` in
+# loop_vars so that they can be undone afterwards. Each entry is a
+# tuple (dic, key, value) with the value of dic[key] before the change.
+_missing = object()
+
+
+def journal_assignment(dic, keys, loop_vars):
+    """Record the state before the assignment to a nested dictionary.
+
+    ``keys`` is the sequence of keys leading to the element assigned
+    in ``dic``. If a ``dict`` along the way does not exist yet, its
+    creation is recorded, otherwise the previous value of the element.
+    Nothing is done if no lookahead is performed.
+    """
+    journal = loop_vars.get("__journal") if loop_vars is not None else None
+    if journal is None:
+        return
+    for key in keys[:-1]:
+        if key not in dic:
+            journal.append((dic, key, _missing))
+            return
+        dic = dic[key]
+    key = keys[-1]
+    journal.append((dic, key, dic.get(key, _missing)))
+
+
+def undo_journal(journal):
+    """Undo the changes recorded in a journal in reverse order."""
+    for dic, key, value in reversed(journal):
+        if value is _missing:
+            dic.pop(key, None)
+        else:
+            dic[key] = value
+    journal.clear()
+
+
 def set_array_value(varname, idxquants, value, datadic, loop_vars):
+    if "__journal" in loop_vars:
+        keys = (varname,) + tuple(get_indexvalue(q, loop_vars) for q in idxquants)
+        journal_assignment(datadic, keys, loop_vars)
     curdic = datadic.setdefault(varname, {})
     for idxquant in idxquants[:-1]:
         idx = get_indexvalue(idxquant, loop_vars)
@@ -101,6 +146,115 @@ def generate_varname_str(expr, loop_vars):
     return retstr
 
 
+class Abbreviation:
+    """Abbreviation of an expression introduced in a recipe.
+
+    The abbreviations visible in the open sections are kept in the
+    ``dict`` stored under the key ``__abbrevs`` in ``loop_vars``,
+    which maps their names to objects of this class. ``datadic`` is
+    the ``dict`` of the section in which the abbreviation has been
+    introduced and ``shadowed`` an equally named abbreviation of an
+    outer section. The value of the expression is cached once all
+    variables in it are bound. It is reused as long as the loop
+    variables and index variables that may appear in the expression,
+    directly or via other abbreviations, keep their values.
+    """
+
+    __slots__ = (
+        "varname",
+        "expr",
+        "func",
+        "depnames",
+        "datadic",
+        "shadowed",
+        "cache_datadic",
+        "cache_key",
+        "value",
+    )
+
+    def __init__(self, varname, expr, datadic, shadowed=None, abbrevs=None):
+        self.varname = varname
+        self.expr = expr
+        self.func = compile_expr(expr)
+        depnames = _get_names(expr, set())
+        if abbrevs is not None:
+            for name in tuple(depnames):
+                if name in abbrevs:
+                    depnames.update(abbrevs[name].depnames)
+        self.depnames = tuple(sorted(depnames))
+        self.datadic = datadic
+        self.shadowed = shadowed
+        self.invalidate()
+
+    def invalidate(self):
+        self.cache_datadic = None
+        self.cache_key = None
+        self.value = None
+
+    def evaluate(self, datadic, loop_vars, look_up, cast_int, accept_missing):
+        key = (look_up, cast_int, tuple(map(loop_vars.get, self.depnames)))
+        if self.cache_datadic is datadic and self.cache_key == key:
+            return self.value
+        value = self.func(datadic, loop_vars, look_up, cast_int, accept_missing)
+        if value[2] is None:
+            self.cache_datadic = datadic
+            self.cache_key = key
+            self.value = value
+        return value
+
+    def __deepcopy__(self, memo):
+        # the expression and its compiled function are shared
+        abbrev = Abbreviation.__new__(Abbreviation)
+        abbrev.varname = self.varname
+        abbrev.expr = self.expr
+        abbrev.func = self.func
+        abbrev.depnames = self.depnames
+        abbrev.datadic = deepcopy(self.datadic, memo)
+        abbrev.shadowed = deepcopy(self.shadowed, memo)
+        abbrev.invalidate()
+        return abbrev
+
+
+def _get_names(expr, names):
+    # names of the variables and index variables in an expression
+    if is_tree(expr):
+        for ch in expr.children:
+            _get_names(ch, names)
+    elif get_name(expr) in ("VARNAME", "INDEXVAR"):
+        names.add(get_value(expr))
+    return names
+
+
+def find_scope(varname, datadic, loop_vars, look_up=True):
+    """Return the ``dict`` in which a variable is found.
+
+    The variable is first searched in ``datadic``. If ``look_up``
+    is true, the search continues in the dictionaries of the
+    outer sections, which are kept on the scope stack stored under
+    the key ``__scopes`` in ``loop_vars`` with the dictionary of the
+    current section on top. If the name refers to an abbreviation
+    introduced in a section searched, the ``dict`` with the
+    abbreviations is returned, which maps the name to an
+    :class:`Abbreviation` object. If the variable is not found,
+    ``datadic`` is returned.
+    """
+    if varname in datadic or loop_vars is None:
+        return datadic
+    abbrevs = loop_vars.get("__abbrevs")
+    abbrev = abbrevs.get(varname) if abbrevs else None
+    if not look_up:
+        if abbrev is not None and abbrev.datadic is datadic:
+            return abbrevs
+        return datadic
+    scopes = loop_vars.get("__scopes") or (datadic,)
+    for dic in reversed(scopes):
+        if varname in dic:
+            return dic
+        if abbrev is not None and abbrev.datadic is dic:
+            return abbrevs
+    return datadic
+
+
 def get_varval(expr, datadic, loop_vars, look_up=True, eval_abbrev=True):
     varname_or_extvarname_check(expr)
     varname = get_varname(expr)
@@ -116,8 +270,7 @@ def get_varval(expr, datadic, loop_vars, look_up=True, eval_abbrev=True):
             return loop_vars[varname]
 
     orig_datadic = datadic
-    while varname not in datadic and "__up" in datadic and look_up:
-        datadic = datadic["__up"]
+    datadic = find_scope(varname, datadic, loop_vars, look_up)
     if varname not in datadic:
         raise VariableNotFoundError(f"variable {varname} not found", varname)
     if idxquants is None:
@@ -140,6 +293,7 @@ def set_varval(expr, datadic, loop_vars, value):
     varname = get_varname(expr)
     idxquants = get_indexquants(expr)
     if idxquants is None:
+        journal_assignment(datadic, (varname,), loop_vars)
         datadic[varname] = value
     else:
         set_array_value(varname, idxquants, value, datadic, loop_vars)
@@ -162,10 +316,36 @@ def count_unassigned_vars(expr, datadic, loop_vars, look_up=True):
         return 0
 
 
+# variable names, index specifications and compiled expressions
+# only depend on the node of a compiled recipe, so they are determined
+# once and stored in the `cache` of the node, which is released along
+# with the recipe
+_not_cached = object()
+
+
+def _get_node_cache(expr):
+    cache = expr.cache
+    if cache is None:
+        cache = {}
+        expr.cache = cache
+    return cache
+
+
 def get_varname(expr):
+    cache = expr.cache
+    if cache is not None:
+        varname = cache.get("varname", _not_cached)
+        if varname is not _not_cached:
+            return varname
+    varname = _find_varname(expr)
+    _get_node_cache(expr)["varname"] = varname
+    return varname
+
+
+def _find_varname(expr):
     if is_tree(expr):
         for ch in expr.children:
-            varname = get_varname(ch)
+            varname = _find_varname(ch)
             if varname is not None:
                 return varname
     elif is_token(expr):
@@ -176,12 +356,25 @@ def get_varname(expr):
 
 
 def get_indexquants(expr):
+    cache = expr.cache
+    if cache is not None:
+        idxquants = cache.get("indexquants", _not_cached)
+        if idxquants is not _not_cached:
+            return idxquants
+    idxquants = _find_indexquants(expr)
+    if idxquants is not None:
+        idxquants = tuple(idxquants)
+    _get_node_cache(expr)["indexquants"] = idxquants
+    return idxquants
+
+
+def _find_indexquants(expr):
     if not is_tree(expr):
         return None
     idxquants = []
     for ch in expr.children:
         if is_tree(ch):
-            varname = get_indexquants(ch)
+            varname = _find_indexquants(ch)
             if varname is not None:
                 idxquants.extend(varname)
         elif get_name(ch) in ("INDEXVAR", "INDEXNUM"):
@@ -234,105 +427,69 @@ def eval_expr_without_unknown_var(
     return ret[0]
 
 
-def eval_expr(
-    expr, datadic=None, loop_vars=None, look_up=True, cast_int=True, accept_missing=True
-):
+def compile_expr(expr):
+    """Compile an expression of a recipe into a function.
+
+    The returned function takes the arguments
+    ``(datadic, loop_vars, look_up, cast_int, accept_missing)``
+    with the same meaning as in :func:`eval_expr` and returns the
+    ``(const, coeff, unbound_var)`` triple. Number literals are
+    converted upon compilation and subexpressions only made up
+    of numbers are replaced by their values.
+    """
+    return _compile_node(expr)[0]
+
+
+def _compile_node(expr):
+    # every entry is a tuple (function, constant) with `constant` being
+    # the result triple of the expression if it does not depend on any
+    # variable, stored in the cache of the node
+    cache = _get_node_cache(expr)
+    entry = cache.get("compiled")
+    if entry is None:
+        entry = _compile_node_uncached(expr)
+        cache["compiled"] = entry
+    return entry
+
+
+def _compile_constant(value):
+    def evaluate(datadic, loop_vars, look_up, cast_int, accept_missing):
+        return value
+
+    return (evaluate, value)
+
+
+def _compile_node_uncached(expr):
     name = get_name(expr, nofail=True)
     # reminder: VARNAME is is a string of letters and number, e.g., foo1
     #           extvarname can contain an index specification, e.g., foo1[i]
     if name in ("VARNAME", "extvarname"):
-        if datadic is None:
-            return (0, 1, expr)
-        else:
-            # if datadic and variable exists in datadic
-            # we substitute the variable name by its value
-            try:
-                val = get_varval(expr, datadic, loop_vars, look_up, False)
-                if is_tree(val) and get_name(val) == "expr":
-                    return eval_expr(
-                        val, datadic, loop_vars, look_up, cast_int, accept_missing
-                    )
-                else:
-                    return (val, 0, None)
-            except VariableNotFoundError as exc:
-                if not accept_missing:
-                    raise exc
-                return (0, 1, expr)
-            except UnavailableIndexError as exc:
-                if not accept_missing:
-                    raise exc
-                return (0, 1, expr)
+        return (_compile_variable(expr), None)
     elif name == "NUMBER" or name == "DESIRED_NUMBER":
-        vstr = expr.value
         # a desired number is suffixed by a question mark
         # so we strip that away before proceeding
-        vstr = vstr.rstrip("?")
+        vstr = expr.value.rstrip("?")
         # if it was an integer, we preserve this quality
         if re.match("^ *[0-9]+ *$", vstr):
             v = int(vstr)
         else:
             v = float(vstr)
-        return (v, 0, None)
+        return _compile_constant((v, 0, None))
     elif name == "minusexpr":
-        v = eval_expr(
-            expr.children[0], datadic, loop_vars, look_up, cast_int, accept_missing
-        )
-        return (math_neg(v[0]), -v[1], v[2])
-    elif name in ("addition", "subtraction", "multiplication", "modulo", "division"):
-        v1 = eval_expr(
-            expr.children[0], datadic, loop_vars, look_up, cast_int, accept_missing
-        )
-        # children[1] contains the operator symbol *,/,+,-
-        v2 = eval_expr(
-            expr.children[2], datadic, loop_vars, look_up, cast_int, accept_missing
-        )
-        if name == "multiplication":
-            if v1[1] != 0 and v2[1] != 0:
-                raise SeveralUnboundVariablesError(
-                    "More than one unassigned variables must not appear "
-                    + "in an expression."
-                )
-            if v1[1] == 0:
-                return (math_mul(v1[0], v2[0]), math_mul(v1[0], v2[1]), v2[2])
-            else:
-                return (math_mul(v1[0], v2[0]), math_mul(v1[1], v2[0]), v1[2])
-        elif name == "division":
-            if v2[1] != 0:
-                raise VariableInDenominatorError(
-                    "A variable name must not appear in the denominator "
-                    + "of an expression."
-                )
-            vx = math_div(v1[0], v2[0], cast_int)
-            vy = math_div(v1[1], v2[0], cast_int)
-            return (vx, vy, v1[2])
-        elif name == "modulo":
-            if v1[1] != 0 or v2[1] != 0:
-                raise SeveralUnboundVariablesError(
-                    "Both x and y in the operation x % y (modulo) "
-                    + "must be known values. However, unbound variables"
-                    + "are present in the expressions corresponding to x or y."
-                )
-            vx = math_mod(v1[0], v2[0], cast_int)
-            return (vx, 0, None)
-        elif name == "addition":
-            if v1[1] != 0 and v2[1] != 0:
-                raise SeveralUnboundVariablesError(
-                    "More than one unassigned variable must not appear "
-                    + "in an expression."
-                )
-            vexpr = v1[2] if v1[1] != 0 else v2[2]
-            return (math_add(v1[0], v2[0]), math_add(v1[1], v2[1]), vexpr)
-        elif name == "subtraction":
-            if v1[1] != 0 and v2[1] != 0:
-                raise SeveralUnboundVariablesError(
-                    "More than one unassigned variable must not appear "
-                    + "in an expression."
-                )
-            vexpr = v1[2] if v1[1] != 0 else v2[2]
-            return (math_sub(v1[0], v2[0]), math_sub(v1[1], v2[1]), vexpr)
+        # the first child may be the token of the minus sign
+        func, const = _compile_node(expr.children[-1])
+        if const is not None:
+            return _compile_constant((math_neg(const[0]), -const[1], const[2]))
+
+        def evaluate(datadic, loop_vars, look_up, cast_int, accept_missing):
+            v = func(datadic, loop_vars, look_up, cast_int, accept_missing)
+            return (math_neg(v[0]), -v[1], v[2])
+
+        return (evaluate, None)
+    elif name in _binary_operations:
+        return _compile_binary_operation(_binary_operations[name], expr)
     elif name == "inconsistent_varspec":
-        ch = get_child(expr, "extvarname")
-        return eval_expr(ch, datadic, loop_vars, look_up, cast_int, accept_missing)
+        return _compile_node(get_child(expr, "extvarname"))
     else:
         # we remove enclosing brackets if present
         ch_first = expr.children[0]
@@ -347,6 +504,146 @@ def eval_expr(
         else:
             trimmed_children = expr.children
         assert len(trimmed_children) == 1
-        return eval_expr(
-            trimmed_children[0], datadic, loop_vars, look_up, cast_int, accept_missing
+        return _compile_node(trimmed_children[0])
+
+
+def _compile_variable(expr):
+    varname = get_varname(expr)
+    idxquants = get_indexquants(expr) or ()
+    unbound = (0, 1, expr)
+
+    def evaluate(datadic, loop_vars, look_up, cast_int, accept_missing):
+        if datadic is None:
+            return unbound
+        if loop_vars is not None and varname in loop_vars:
+            if varname in datadic:
+                raise LoopVariableError(
+                    f"the variable {varname} is both a loop variable and "
+                    "a record variable, which is forbidden, check the recipe"
+                )
+            return (loop_vars[varname], 0, None)
+        curdic = datadic
+        if varname not in curdic:
+            curdic = find_scope(varname, datadic, loop_vars, look_up)
+        if varname not in curdic:
+            if accept_missing:
+                return unbound
+            raise VariableNotFoundError(f"variable {varname} not found", varname)
+        val = curdic[varname]
+        for idxquant in idxquants:
+            idx = get_indexvalue(idxquant, loop_vars)
+            if idx not in val:
+                if accept_missing:
+                    return unbound
+                raise UnavailableIndexError(
+                    f"index {idx} does not exist in array {varname}"
+                )
+            val = val[idx]
+        if val.__class__ is Abbreviation:
+            return val.evaluate(datadic, loop_vars, look_up, cast_int, accept_missing)
+        return (val, 0, None)
+
+    return evaluate
+
+
+def _compile_binary_operation(combine, expr):
+    # children[1] contains the operator symbol *,/,+,-
+    func1, const1 = _compile_node(expr.children[0])
+    func2, const2 = _compile_node(expr.children[2])
+    if const1 is not None and const2 is not None:
+        # division and modulo only depend on cast_int if the
+        # result is not an integer, which is an error if cast_int is True,
+        # so we keep the evaluation of such expressions for later
+        try:
+            return _compile_constant(combine(const1, const2, True))
+        except Exception:
+            pass
+    if const1 is not None:
+
+        def evaluate(datadic, loop_vars, look_up, cast_int, accept_missing):
+            v2 = func2(datadic, loop_vars, look_up, cast_int, accept_missing)
+            return combine(const1, v2, cast_int)
+
+    elif const2 is not None:
+
+        def evaluate(datadic, loop_vars, look_up, cast_int, accept_missing):
+            v1 = func1(datadic, loop_vars, look_up, cast_int, accept_missing)
+            return combine(v1, const2, cast_int)
+
+    else:
+
+        def evaluate(datadic, loop_vars, look_up, cast_int, accept_missing):
+            v1 = func1(datadic, loop_vars, look_up, cast_int, accept_missing)
+            v2 = func2(datadic, loop_vars, look_up, cast_int, accept_missing)
+            return combine(v1, v2, cast_int)
+
+    return (evaluate, None)
+
+
+def _multiply(v1, v2, cast_int):
+    if v1[1] != 0 and v2[1] != 0:
+        raise SeveralUnboundVariablesError(
+            "More than one unassigned variables must not appear " + "in an expression."
+        )
+    if v1[1] == 0:
+        return (math_mul(v1[0], v2[0]), math_mul(v1[0], v2[1]), v2[2])
+    else:
+        return (math_mul(v1[0], v2[0]), math_mul(v1[1], v2[0]), v1[2])
+
+
+def _divide(v1, v2, cast_int):
+    if v2[1] != 0:
+        raise VariableInDenominatorError(
+            "A variable name must not appear in the denominator " + "of an expression."
+        )
+    vx = math_div(v1[0], v2[0], cast_int)
+    vy = math_div(v1[1], v2[0], cast_int)
+    return (vx, vy, v1[2])
+
+
+def _modulo(v1, v2, cast_int):
+    if v1[1] != 0 or v2[1] != 0:
+        raise SeveralUnboundVariablesError(
+            "Both x and y in the operation x % y (modulo) "
+            + "must be known values. However, unbound variables"
+            + "are present in the expressions corresponding to x or y."
+        )
+    vx = math_mod(v1[0], v2[0], cast_int)
+    return (vx, 0, None)
+
+
+def _add(v1, v2, cast_int):
+    if v1[1] != 0 and v2[1] != 0:
+        raise SeveralUnboundVariablesError(
+            "More than one unassigned variable must not appear " + "in an expression."
+        )
+    vexpr = v1[2] if v1[1] != 0 else v2[2]
+    return (math_add(v1[0], v2[0]), math_add(v1[1], v2[1]), vexpr)
+
+
+def _subtract(v1, v2, cast_int):
+    if v1[1] != 0 and v2[1] != 0:
+        raise SeveralUnboundVariablesError(
+            "More than one unassigned variable must not appear " + "in an expression."
         )
+    vexpr = v1[2] if v1[1] != 0 else v2[2]
+    return (math_sub(v1[0], v2[0]), math_sub(v1[1], v2[1]), vexpr)
+
+
+_binary_operations = {
+    "multiplication": _multiply,
+    "division": _divide,
+    "modulo": _modulo,
+    "addition": _add,
+    "subtraction": _subtract,
+}
+
+
+def eval_expr(
+    expr, datadic=None, loop_vars=None, look_up=True, cast_int=True, accept_missing=True
+):
+    cache = expr.cache
+    entry = cache.get("compiled") if cache is not None else None
+    if entry is None:
+        entry = _compile_node(expr)
+    return entry[0](datadic, loop_vars, look_up, cast_int, accept_missing)
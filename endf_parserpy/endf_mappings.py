@@ -3,53 +3,572 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2022/02/01
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022-2024 International Atomic Energy Agency (IAEA)
 #
 ############################################################
 
-from lark.lexer import Token
-from .tree_utils import is_tree, get_name, get_child, get_child_value
-from .meta_control_utils import cycle_for_loop, should_proceed
+from collections.abc import Mapping
+from .tree_utils import (
+    is_tree,
+    get_name,
+    get_child,
+    get_child_value,
+    reconstruct_tree_str,
+    retrieve_value,
+    RecipeToken,
+)
+from .meta_control_utils import get_loop_bounds, should_proceed
 from .meta_control_utils import open_section, close_section
+from .endf_mapping_utils import find_scope, journal_assignment
+from .logging_utils import info_enabled, write_info
 from .custom_exceptions import (
     VariableNotFoundError,
     UnexpectedControlRecordError,
     MoreListElementsExpectedError,
     UnconsumedListElementsError,
 )
-from .endf_mapping_core import map_record_helper, map_text_record_helper
+from .endf_mapping_core import (
+    RecordField,
+    compile_record_fields,
+    log_record_variables,
+    map_record_fields,
+    map_text_record_helper,
+)
+from .endf_recipe_analysis import record_field_names, record_types
 from .accessories import EndfPath
 
 
-def check_ctrl_spec(record_line_node, record_dic, datadic, rwmode):
-    ctrl_spec = get_child(record_line_node, "ctrl_spec")
-    dic = record_dic if rwmode == "read" else datadic
-    # if MAT not found in local scope, scan the outer ones
-    while "MAT" not in dic and "__up" in dic:
-        dic = dic["__up"]
+class RecordSpec:
+    """Record specification prepared for the mapping functions.
+
+    The information in the parse tree of a record specification,
+    such as the expressions in the fields, the names of the table
+    or list and the structure of the list body, is extracted once
+    by :func:`compile_record` so that the mapping functions do not
+    need to search the parse tree whenever a record is mapped.
+    ``record_str`` contains the record specification as given in
+    the recipe for the record logs.
+    """
+
+    __slots__ = (
+        "node",
+        "record_type",
+        "record_str",
+        "ctrl_spec",
+        "fields",
+        "table_name",
+        "table_fields",
+        "list_body",
+        "ndigit_expr",
+        "stop_message",
+    )
+
+    def __init__(self, node, record_type):
+        self.node = node
+        self.record_type = record_type
+        self.record_str = reconstruct_tree_str(node)
+        self.ctrl_spec = None
+        self.fields = ()
+        self.table_name = None
+        self.table_fields = ()
+        self.list_body = ()
+        self.ndigit_expr = None
+        self.stop_message = None
+
+
+class ListLoopSpec:
+    """Loop in the body of a LIST record prepared for :func:`map_list_dic`.
+
+    If the body of the loop only consists of distinct array variables
+    whose last index is the loop variable, e.g., ``{X[i], Y[i]}{i=1 to N}``,
+    the fields are stored in ``bulk_fields`` so that the values of all
+    iterations can be mapped at once by :func:`map_list_loop_bulk`.
+    """
+
+    __slots__ = ("varname", "start", "stop", "head_str", "body", "bulk_fields")
+
+    def __init__(self, list_loop_node):
+        for_head = get_child(list_loop_node, "list_for_head")
+        self.varname = get_child_value(for_head, "VARNAME")
+        self.start = RecordField(None, get_child(for_head, "for_start"))
+        self.stop = RecordField(None, get_child(for_head, "for_stop"))
+        self.head_str = reconstruct_tree_str(for_head)
+        self.body = compile_list_body(get_child(list_loop_node, "list_body"))
+        self.bulk_fields = None
+        varname = self.varname
+        varnames = set()
+        for item in self.body:
+            if (
+                item.__class__ is not RecordField
+                or item.varname is None
+                or item.varname == varname
+                or item.varname in varnames
+                or len(item.indices) == 0
+                or item.indices[-1] != varname
+                or varname in item.indices[:-1]
+            ):
+                return
+            varnames.add(item.varname)
+        if len(self.body) > 0:
+            self.bulk_fields = self.body
+
+
+def compile_list_body(list_body_node):
+    items = []
+    for node in list_body_node.children:
+        node_type = get_name(node)
+        if node_type == "expr":
+            items.extend(compile_record_fields([node], ("val",)))
+        # sometimes the expectation is that within a list body (list in LIST record)
+        # a line must be padded with zeros until the end before a new subrecord
+        # starts on the next line
+        elif node_type == "LINEPADDING":
+            items.append(node_type)
+        elif node_type == "list_loop":
+            items.append(ListLoopSpec(node))
+        elif is_tree(node) and node_type == "list_body":
+            items.extend(compile_list_body(node))
+        # we are fine with a new line and a comma
+        elif node_type in ("NEWLINE", "COMMA"):
+            continue
+        else:
+            raise ValueError(
+                f"A node of type {node_type} must not appear in a list_body"
+            )
+    return tuple(items)
+
+
+def compile_record(record_node):
+    """Prepare a record specification for the mapping functions.
+
+    Parameters
+    ----------
+    record_node : RecipeNode
+        Node of a record specification in the parse tree of a recipe,
+        e.g., of type ``head_or_cont_line`` or ``list_line``.
+
+    Returns
+    -------
+    RecordSpec
+        The information needed to map the record.
+    """
+    name = get_name(record_node)
+    if name == "head_or_cont_line":
+        record_type = get_child_value(record_node, "CONT_SUBTYPE")
+    elif name == "send_line":
+        return RecordSpec(record_node, "SEND")
+    elif name == "stop_line":
+        spec = RecordSpec(record_node, "STOP")
+        stop_message = retrieve_value(record_node, "STOP_MESSAGE")
+        if stop_message is None:
+            stop_message = "stop instruction"
+        spec.stop_message = stop_message
+        return spec
+    elif name in record_types:
+        record_type = record_types[name]
+    else:
+        raise TypeError(f"unsupported record node `{name}`")
+
+    spec = RecordSpec(record_node, record_type)
+    ctrl_spec = get_child(record_node, "ctrl_spec")
+    spec.ctrl_spec = tuple(
+        (v, get_child_value(ctrl_spec, v + "_SPEC")) for v in ("MAT", "MF", "MT")
+    )
+    cn = record_field_names.get(name)
+    if name == "text_line":
+        textfields = get_child(record_node, "text_fields").children
+        spec.fields = tuple(t for t in textfields if get_name(t) == "textplaceholder")
+    elif name in ("head_or_cont_line", "list_line"):
+        expr_list = get_child(record_node, "record_fields").children
+        spec.fields = compile_record_fields(expr_list, cn)
+    elif name == "dir_line":
+        expr_list = get_child(record_node, "dir_fields").children
+        spec.fields = compile_record_fields(expr_list, cn)
+    elif name == "intg_line":
+        expr_list = get_child(record_node, "intg_fields").children
+        spec.fields = compile_record_fields(expr_list, cn)
+        spec.ndigit_expr = get_child(record_node, "ndigit_expr")
+    elif name == "tab1_line":
+        tab1_fields = get_child(record_node, "tab1_fields")
+        tab1_cont_fields = get_child(tab1_fields, "record_fields")
+        # we remove NR and NP (last two elements) because redundant information
+        # and not used by write_tab1 and read_tab1 (2+1 because a comma separates NR and NP)
+        expr_list = tab1_cont_fields.children[:-3]
+        spec.fields = compile_record_fields(expr_list, cn)
+        # deal with the mapping of the variable names in the table first
+        tab1_def_fields = get_child(tab1_fields, "tab1_def").children
+        # remove the slash
+        tab1_def_fields = [f for f in tab1_def_fields if get_name(f) != "SLASH"]
+        expr_list = [RecipeToken("VARNAME", "NBT"), RecipeToken("VARNAME", "INT")]
+        expr_list += tab1_def_fields
+        spec.table_fields = compile_record_fields(expr_list, ("NBT", "INT", "X", "Y"))
+        spec.table_name = get_child(record_node, "table_name", nofail=True)
+    elif name == "tab2_line":
+        tab2_fields = get_child(record_node, "tab2_fields")
+        tab2_cont_fields = get_child(tab2_fields, "record_fields")
+        # we remove NR because we can infer it from the length of the NBT array
+        # we keep NZ because it contains the number of following TAB1/LIST records
+        # NOTE: -(2+1) because a comma separates NR and NZ
+        expr_list = tab2_cont_fields.children[:-3] + tab2_cont_fields.children[-1:]
+        spec.fields = compile_record_fields(expr_list, cn)
+        # tab2_def_fields contains the name of the Z variable
+        # we don't need it because the following TAB1/LIST records
+        # contain the name of this variable at position of C2
+        expr_list = [RecipeToken("VARNAME", "NBT"), RecipeToken("VARNAME", "INT")]
+        spec.table_fields = compile_record_fields(expr_list, ("NBT", "INT"))
+        spec.table_name = get_child(record_node, "table_name", nofail=True)
+    if name == "list_line":
+        spec.table_name = get_child(record_node, "list_name", nofail=True)
+        spec.list_body = compile_list_body(get_child(record_node, "list_body"))
+    return spec
+
+
+def check_ctrl(ctrl_spec, record_dic, datadic, rwmode, loop_vars=None):
+    if rwmode == "read":
+        dic = record_dic
+    else:
+        # if MAT not found in local scope, scan the outer ones
+        dic = find_scope("MAT", datadic, loop_vars)
     for v in ("MAT", "MF", "MT"):
         if v not in dic:
             raise VariableNotFoundError(f"Variable {v} missing in dictionary.", v)
-    cur_mat = dic["MAT"]
-    cur_mf = dic["MF"]
-    cur_mt = dic["MT"]
-    exp_mat = get_child_value(ctrl_spec, "MAT_SPEC")
-    exp_mf = get_child_value(ctrl_spec, "MF_SPEC")
-    exp_mt = get_child_value(ctrl_spec, "MT_SPEC")
-    if exp_mat != "MAT" and int(exp_mat) != cur_mat:
-        raise UnexpectedControlRecordError(
-            f"Expected MAT {exp_mat} but encountered {cur_mat}"
+    for v, expval in ctrl_spec:
+        curval = dic[v]
+        if expval != v and int(expval) != curval:
+            raise UnexpectedControlRecordError(
+                f"Expected {v} {expval} but encountered {curval}"
+            )
+
+
+def check_ctrl_spec(record_line_node, record_dic, datadic, rwmode):
+    ctrl_spec = get_child(record_line_node, "ctrl_spec")
+    ctrl_spec = tuple(
+        (v, get_child_value(ctrl_spec, v + "_SPEC")) for v in ("MAT", "MF", "MT")
+    )
+    check_ctrl(ctrl_spec, record_dic, datadic, rwmode)
+
+
+def map_record(
+    spec,
+    record_dic,
+    datadic,
+    loop_vars,
+    rwmode="read",
+    parse_opts=None,
+    path="",
+):
+    """Map the content of a record to variables or vice versa.
+
+    Parameters
+    ----------
+    spec : RecordSpec
+        The record specification as returned by :func:`compile_record`.
+    record_dic : dict
+        The content of the record as returned by the ``read_*`` functions
+        in :mod:`endf_utils` in ``read`` mode. In ``write`` mode, the
+        content of the record is stored in this ``dict``.
+    datadic : dict
+        The ``dict`` with the variables of the current section.
+    loop_vars : dict
+        The ``dict`` with the values of the loop variables.
+    rwmode : str
+        Either ``read`` or ``write``.
+    parse_opts : dict
+        The options for parsing, see ``parse_opts`` attribute
+        of :class:`EndfParser`.
+    path : Union[str, EndfPath]
+        The path of the current section used in error messages.
+
+    Returns
+    -------
+    dict
+        In ``read`` mode ``datadic``, in ``write`` mode ``record_dic``.
+    """
+    check_ctrl(spec.ctrl_spec, record_dic, datadic, rwmode, loop_vars)
+    record_type = spec.record_type
+    if record_type == "TEXT":
+        return map_text_record_helper(
+            spec.fields, ("HL",), record_dic, datadic, loop_vars, rwmode, parse_opts
         )
-    if exp_mf != "MF" and int(exp_mf) != cur_mf:
-        raise UnexpectedControlRecordError(
-            f"Expected MF {exp_mf} but encountered {cur_mf}"
+    elif record_type in ("TAB1", "TAB2"):
+        return _map_table(
+            spec, record_dic, datadic, loop_vars, rwmode, parse_opts, path
         )
-    if exp_mt != "MT" and int(exp_mt) != cur_mt:
-        raise UnexpectedControlRecordError(
-            f"Expected MT {exp_mt} but encountered {cur_mt}"
+    elif record_type == "LIST":
+        return _map_list(spec, record_dic, datadic, loop_vars, rwmode, parse_opts, path)
+    return map_record_fields(
+        spec.fields, record_dic, datadic, loop_vars, rwmode, parse_opts
+    )
+
+
+def _map_table(spec, tab_dic, datadic, loop_vars, rwmode, parse_opts, path):
+    main_ret = map_record_fields(
+        spec.fields, tab_dic, datadic, loop_vars, rwmode, parse_opts
+    )
+    # treat parsing of table body as additional action step,
+    # so don't parse list body if lookahead counter exhausted
+    if not should_proceed(datadic, loop_vars, "endf_action"):
+        return main_ret
+    # open section if desired
+    table_name = spec.table_name
+    if table_name is not None:
+        create_missing = rwmode == "read"
+        path = EndfPath(path)
+        datadic, path = open_section(
+            table_name, datadic, loop_vars, create_missing, path=path
+        )
+    tbl_dic = {} if rwmode != "read" else tab_dic["table"]
+    try:
+        tbl_ret = map_record_fields(
+            spec.table_fields, tbl_dic, datadic, loop_vars, rwmode, parse_opts
         )
+    except VariableNotFoundError as exc:
+        exc.varname = str(path + exc.varname)
+        raise exc
+    # close section if desired
+    if table_name is not None:
+        datadic = close_section(table_name, datadic, loop_vars)
+    if rwmode != "read":
+        main_ret["table"] = tbl_ret
+    return main_ret
+
+
+def create_list_exhausted_error_msg(numvals):
+    return (
+        f"All {numvals} values in the list body present in the ENDF file "
+        + "have already been consumed. "
+        + "You may check the index specifications of your list body. "
+    )
+
+
+def create_unconsumed_list_error_msg(val_idx, numvals):
+    return (
+        f"Not all values in the list_body were consumed and "
+        "associated with variables in datadic "
+        f"(read {val_idx} out of {numvals})"
+    )
+
+
+def _get_bulk_array(field, datadic, loop_vars):
+    # return the dictionary in datadic that contains the values of
+    # all iterations of the loop for the variable of the field,
+    # an empty tuple if it does not exist yet or None if the variable
+    # must be mapped by map_record_fields. Other mappings than dict,
+    # e.g., the TrackingDict used for writing, are indexed through
+    # so that the access to the values is still tracked
+    varname = field.varname
+    if varname in loop_vars:
+        return None
+    curdic = datadic.get(varname)
+    for idx in field.indices[:-1]:
+        if curdic is None:
+            return ()
+        if curdic.__class__ is not dict and not isinstance(curdic, Mapping):
+            return None
+        if idx.__class__ is str:
+            idx = loop_vars.get(idx)
+            if idx is None:
+                return None
+        curdic = curdic.get(idx)
+    if curdic is None:
+        return ()
+    if curdic.__class__ is not dict and not isinstance(curdic, Mapping):
+        return None
+    return curdic
+
+
+def map_list_loop_bulk(
+    item, start, stop, vals, val_idx, datadic, loop_vars, rwmode="read"
+):
+    """Map the values of all iterations of a loop in a LIST body at once.
+
+    The loop given by the :class:`ListLoopSpec` ``item`` must have
+    the ``bulk_fields`` attribute set. In ``read`` mode, the values
+    ``vals[val_idx:]`` are assigned to the array variables of the loop
+    body. In ``write`` mode, the values of the array variables are
+    appended to ``vals``. The values are only mapped if they can be
+    assigned without checking them against values already present in
+    ``datadic`` and, in ``write`` mode, if all of them are available.
+    The value of ``None`` is returned otherwise and the loop must be
+    mapped value by value so that the appropriate checks are performed
+    and errors reported. If the values were mapped, the index of the
+    next value in the list body is returned.
+    """
+    fields = item.bulk_fields
+    num_iters = stop - start + 1
+    if num_iters <= 0:
+        return val_idx
+    num_fields = len(fields)
+    num_items = num_iters * num_fields
+    arrays = []
+    for field in fields:
+        array = _get_bulk_array(field, datadic, loop_vars)
+        if array is None:
+            return None
+        arrays.append(array)
+    indices = range(start, stop + 1)
+    if rwmode == "read":
+        if val_idx + num_items > len(vals):
+            return None
+        for array in arrays:
+            if len(array) > 0 and any(i in array for i in indices):
+                return None
+        for j, field in enumerate(fields):
+            if "__journal" in loop_vars:
+                keys = (field.varname,) + tuple(
+                    loop_vars[idx] if idx.__class__ is str else idx
+                    for idx in field.indices[:-1]
+                )
+                for i in indices:
+                    journal_assignment(datadic, keys + (i,), loop_vars)
+            array = datadic.setdefault(field.varname, {})
+            for idx in field.indices[:-1]:
+                if idx.__class__ is str:
+                    idx = loop_vars[idx]
+                array = array.setdefault(idx, {})
+            array.update(
+                zip(indices, vals[val_idx + j : val_idx + num_items : num_fields])
+            )
+            log_record_variables((field.varname,), datadic)
+    else:
+        columns = []
+        for array in arrays:
+            if len(array) < num_iters or not all(i in array for i in indices):
+                return None
+            columns.append([array[i] for i in indices])
+        if num_fields == 1:
+            vals.extend(columns[0])
+        else:
+            for row in zip(*columns):
+                vals.extend(row)
+    return val_idx + num_items
+
+
+def _map_list(spec, list_dic, datadic, loop_vars, rwmode, parse_opts, path):
+    val_idx = 0
+
+    # we embed recurisve helper function here so that
+    # it can see the variables list_dic, datadic and loop_vars.
+    # helper function for map_list_dic to recursively parse the list_body
+    def parse_list_body(items):
+        nonlocal val_idx
+
+        for item in items:
+            if item.__class__ is RecordField:
+                if rwmode == "read":
+                    vals = list_dic["vals"]
+                    numvals = len(vals)
+                    if val_idx >= numvals:
+                        raise MoreListElementsExpectedError(
+                            create_list_exhausted_error_msg(numvals)
+                        )
+                    # maybe a bit hacky and clunky, but the method can do the job
+                    # of assigning a value of the list body to the appropriate variable in datadic
+                    map_record_fields(
+                        (item,),
+                        {"val": vals[val_idx]},
+                        datadic,
+                        loop_vars,
+                        rwmode,
+                        parse_opts,
+                    )
+                else:
+                    list_val = map_record_fields(
+                        (item,), {}, datadic, loop_vars, rwmode, parse_opts
+                    )
+                    list_dic["vals"].append(list_val["val"])
+                val_idx += 1
+
+            elif item.__class__ is ListLoopSpec:
+                varname = item.varname
+                start, stop = get_loop_bounds(
+                    varname, item.start, item.stop, datadic, loop_vars
+                )
+                if info_enabled():
+                    write_info(
+                        "Enter for loop (type list_loop) "
+                        + item.head_str
+                        + f" (for_start: {start} and for_stop {stop})"
+                    )
+                next_val_idx = None
+                if item.bulk_fields is not None:
+                    next_val_idx = map_list_loop_bulk(
+                        item,
+                        start,
+                        stop,
+                        list_dic["vals"],
+                        val_idx,
+                        datadic,
+                        loop_vars,
+                        rwmode,
+                    )
+                if next_val_idx is not None:
+                    val_idx = next_val_idx
+                else:
+                    for i in range(start, stop + 1):
+                        loop_vars[varname] = i
+                        parse_list_body(item.body)
+                    # if we don't enter the loop, then
+                    # the loop variable will not be set
+                    # and consequently we don't have to delete it
+                    if start <= stop:
+                        del loop_vars[varname]
+                if info_enabled():
+                    write_info(
+                        "Leave for loop (type list_loop) "
+                        + item.head_str
+                        + f" (for_start: {start} and for_stop: {stop})"
+                    )
+
+            # the padding of a line with zeros
+            else:
+                num_skip_elems = (6 - val_idx % 6) % 6
+                if rwmode != "read":
+                    list_dic["vals"].extend([0.0] * num_skip_elems)
+                # skip over the elements
+                val_idx = val_idx + num_skip_elems
+
+    map_record_fields(spec.fields, list_dic, datadic, loop_vars, rwmode, parse_opts)
+
+    # treat parsing of list_body as additional action step,
+    # so don't parse list body if lookahead counter exhausted
+    if not should_proceed(datadic, loop_vars, "endf_action"):
+        if rwmode != "read":
+            return list_dic
+        else:
+            return datadic
+
+    # enter subsection if demanded
+    list_name = spec.table_name
+    if list_name is not None:
+        create_missing = rwmode == "read"
+        path = EndfPath(path)
+        datadic, path = open_section(
+            list_name, datadic, loop_vars, create_missing, path=path
+        )
+    # parse the list body
+    if rwmode != "read":
+        list_dic["vals"] = []
+    try:
+        parse_list_body(spec.list_body)
+    except VariableNotFoundError as exc:
+        exc.varname = str(path + exc.varname)
+        raise exc
+    # close subsection if opened
+    if list_name is not None:
+        datadic = close_section(list_name, datadic, loop_vars)
+
+    numels_in_list = len(list_dic["vals"])
+    if val_idx < numels_in_list:
+        raise UnconsumedListElementsError(
+            create_unconsumed_list_error_msg(val_idx, numels_in_list)
+        )
+    if rwmode != "read":
+        return list_dic
+    else:
+        return datadic
 
 
 def map_text_dic(
@@ -63,16 +582,8 @@ def map_text_dic(
     text_dic = {} if text_dic is None else text_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(text_line_node, text_dic, datadic, rwmode)
-    textfields = get_child(text_line_node, "text_fields").children
-    expr_list = []
-    for textfield in textfields:
-        if get_name(textfield) == "textplaceholder":
-            expr_list.append(textfield)
-    cn = ("HL",)
-    return map_text_record_helper(
-        expr_list, cn, text_dic, datadic, loop_vars, rwmode, parse_opts
-    )
+    spec = compile_record(text_line_node)
+    return map_record(spec, text_dic, datadic, loop_vars, rwmode, parse_opts)
 
 
 def map_head_dic(
@@ -86,12 +597,8 @@ def map_head_dic(
     head_dic = {} if head_dic is None else head_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(head_line_node, head_dic, datadic, rwmode)
-    expr_list = get_child(head_line_node, "record_fields").children
-    cn = ("C1", "C2", "L1", "L2", "N1", "N2")
-    return map_record_helper(
-        expr_list, cn, head_dic, datadic, loop_vars, rwmode, parse_opts
-    )
+    spec = compile_record(head_line_node)
+    return map_record(spec, head_dic, datadic, loop_vars, rwmode, parse_opts)
 
 
 def map_cont_dic(
@@ -105,12 +612,8 @@ def map_cont_dic(
     cont_dic = {} if cont_dic is None else cont_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(cont_line_node, cont_dic, datadic, rwmode)
-    expr_list = get_child(cont_line_node, "record_fields").children
-    cn = ("C1", "C2", "L1", "L2", "N1", "N2")
-    return map_record_helper(
-        expr_list, cn, cont_dic, datadic, loop_vars, rwmode, parse_opts
-    )
+    spec = compile_record(cont_line_node)
+    return map_record(spec, cont_dic, datadic, loop_vars, rwmode, parse_opts)
 
 
 def map_dir_dic(
@@ -124,12 +627,8 @@ def map_dir_dic(
     dir_dic = {} if dir_dic is None else dir_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(dir_line_node, dir_dic, datadic, rwmode)
-    expr_list = get_child(dir_line_node, "dir_fields").children
-    cn = ("L1", "L2", "N1", "N2")
-    return map_record_helper(
-        expr_list, cn, dir_dic, datadic, loop_vars, rwmode, parse_opts
-    )
+    spec = compile_record(dir_line_node)
+    return map_record(spec, dir_dic, datadic, loop_vars, rwmode, parse_opts)
 
 
 def map_intg_dic(
@@ -143,12 +642,8 @@ def map_intg_dic(
     intg_dic = {} if intg_dic is None else intg_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(intg_line_node, intg_dic, datadic, rwmode)
-    expr_list = get_child(intg_line_node, "intg_fields").children
-    cn = ("II", "JJ", "KIJ")
-    return map_record_helper(
-        expr_list, cn, intg_dic, datadic, loop_vars, rwmode, parse_opts
-    )
+    spec = compile_record(intg_line_node)
+    return map_record(spec, intg_dic, datadic, loop_vars, rwmode, parse_opts)
 
 
 def map_tab2_dic(
@@ -163,51 +658,8 @@ def map_tab2_dic(
     tab2_dic = {} if tab2_dic is None else tab2_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(tab2_line_node, tab2_dic, datadic, rwmode)
-    tab2_fields = get_child(tab2_line_node, "tab2_fields")
-    tab2_cont_fields = get_child(tab2_fields, "record_fields")
-    # we remove NR because we can infer it from the length of the NBT array
-    # we keep NZ because it contains the number of following TAB1/LIST records
-    # NOTE: -(2+1) because a comma separates NR and NZ
-    expr_list = tab2_cont_fields.children[:-3] + tab2_cont_fields.children[-1:]
-    cn = ("C1", "C2", "L1", "L2", "N2")
-    main_ret = map_record_helper(
-        expr_list, cn, tab2_dic, datadic, loop_vars, rwmode, parse_opts
-    )
-    # treat parsing of table body as additional action step,
-    # so don't parse list body if lookahead counter exhausted
-    if not should_proceed(datadic, loop_vars, "endf_action"):
-        return main_ret
-    # tab2_def_fields contains the name of the Z variable
-    # we don't need it because the following TAB1/LIST records
-    # contain the name of this variable at position of C2
-    tab2_def_fields = get_child(tab2_fields, "tab2_def").children
-    tab2_name_node = get_child(tab2_line_node, "table_name", nofail=True)
-    # open section if desired
-    if tab2_name_node is not None:
-        create_missing = rwmode == "read"
-        path = EndfPath(path)
-        datadic, path = open_section(
-            tab2_name_node, datadic, loop_vars, create_missing, path=path
-        )
-    # deal with the mapping of the variable names in the table first
-    cn = ("NBT", "INT")
-    tab2_def_fields = get_child(tab2_fields, "tab2_def").children
-    expr_list = [Token("VARNAME", "NBT"), Token("VARNAME", "INT")]
-    tbl_dic = {} if rwmode != "read" else tab2_dic["table"]
-    try:
-        tbl_ret = map_record_helper(
-            expr_list, cn, tbl_dic, datadic, loop_vars, rwmode, parse_opts
-        )
-    except VariableNotFoundError as exc:
-        exc.varname = str(path + exc.varname)
-        raise exc
-    # close section if desired
-    if tab2_name_node is not None:
-        datadic = close_section(tab2_name_node, datadic)
-    if rwmode != "read":
-        main_ret["table"] = tbl_ret
-    return main_ret
+    spec = compile_record(tab2_line_node)
+    return map_record(spec, tab2_dic, datadic, loop_vars, rwmode, parse_opts, path)
 
 
 def map_tab1_dic(
@@ -222,51 +674,8 @@ def map_tab1_dic(
     tab1_dic = {} if tab1_dic is None else tab1_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    check_ctrl_spec(tab1_line_node, tab1_dic, datadic, rwmode)
-    tab1_fields = get_child(tab1_line_node, "tab1_fields")
-    tab1_cont_fields = get_child(tab1_fields, "record_fields")
-    tab1_def_fields = get_child(tab1_fields, "tab1_def").children
-    tab1_name_node = get_child(tab1_line_node, "table_name", nofail=True)
-    # we remove NR and NP (last two elements) because redundant information
-    # and not used by write_tab1 and read_tab1 (2+1 because a comma separates NR and NP)
-    expr_list = tab1_cont_fields.children[:-3]
-    cn = ("C1", "C2", "L1", "L2")
-    main_ret = map_record_helper(
-        expr_list, cn, tab1_dic, datadic, loop_vars, rwmode, parse_opts
-    )
-    # treat parsing of table body as additional action step,
-    # so don't parse list body if lookahead counter exhausted
-    if not should_proceed(datadic, loop_vars, "endf_action"):
-        return main_ret
-    # open section if desired
-    if tab1_name_node is not None:
-        create_missing = rwmode == "read"
-        path = EndfPath(path)
-        datadic, path = open_section(
-            tab1_name_node, datadic, loop_vars, create_missing, path=path
-        )
-    # deal with the mapping of the variable names in the table first
-    cn = ("NBT", "INT", "X", "Y")
-    tab1_def_fields = get_child(tab1_fields, "tab1_def").children
-    # remove the slash
-    tab1_def_fields = [field for field in tab1_def_fields if get_name(field) != "SLASH"]
-    expr_list = [Token("VARNAME", "NBT"), Token("VARNAME", "INT")] + list(
-        tab1_def_fields
-    )
-    tbl_dic = {} if rwmode != "read" else tab1_dic["table"]
-    try:
-        tbl_ret = map_record_helper(
-            expr_list, cn, tbl_dic, datadic, loop_vars, rwmode, parse_opts
-        )
-    except VariableNotFoundError as exc:
-        exc.varname = str(path + exc.varname)
-        raise exc
-    # close section if desired
-    if tab1_name_node is not None:
-        datadic = close_section(tab1_name_node, datadic)
-    if rwmode != "read":
-        main_ret["table"] = tbl_ret
-    return main_ret
+    spec = compile_record(tab1_line_node)
+    return map_record(spec, tab1_dic, datadic, loop_vars, rwmode, parse_opts, path)
 
 
 def map_list_dic(
@@ -282,125 +691,5 @@ def map_list_dic(
     list_dic = {} if list_dic is None else list_dic
     datadic = {} if datadic is None else datadic
     loop_vars = {} if loop_vars is None else loop_vars
-    val_idx = 0
-
-    # we embed recurisve helper function here so that
-    # it can see the variables list_dic, datadic and loop_vars.
-    # helper function for map_list_dic to recursively parse the list_body
-    def parse_list_body_node(node):
-        nonlocal val_idx
-        nonlocal list_dic
-        node_type = get_name(node)
-
-        if node_type == "expr":
-            if rwmode == "read":
-                vals = list_dic["vals"]
-                numvals = len(vals)
-                if val_idx >= numvals:
-                    raise MoreListElementsExpectedError(
-                        f"All {numvals} values in the list body present in the ENDF file "
-                        + "have already been consumed. "
-                        + "You may check the index specifications of your list body. "
-                    )
-                # maybe a bit hacky and clunky, but the method can do the job
-                # of assigning a value of the list body to the appropriate variable in datadic
-                map_record_helper(
-                    [node],
-                    ("val",),
-                    {"val": vals[val_idx]},
-                    datadic,
-                    loop_vars,
-                    rwmode,
-                    parse_opts,
-                )
-            else:
-                list_val = map_record_helper(
-                    [node], ("val",), {}, datadic, loop_vars, rwmode, parse_opts
-                )
-                list_dic.setdefault("vals", [])
-                list_dic["vals"].append(list_val["val"])
-
-            val_idx += 1
-            return
-
-        # sometimes the expectation is that within a list body (list in LIST record)
-        # a line must be padded with zeros until the end before a new subrecord
-        # starts on the next line
-        elif node_type == "LINEPADDING":
-            num_skip_elems = (6 - val_idx % 6) % 6
-            if rwmode == "read":
-                # we do nothing here because we only need to skip some
-                # elements, what we do afterwards
-                pass
-            else:
-                list_dic["vals"].extend([0.0] * num_skip_elems)
-            # skip over the elements
-            val_idx = val_idx + num_skip_elems
-            return
-
-        elif node_type == "list_loop":
-            cycle_for_loop(
-                node,
-                parse_list_body_node,
-                datadic,
-                loop_vars,
-                loop_name="list_loop",
-                head_name="list_for_head",
-                body_name="list_body",
-            )
-
-        elif is_tree(node) and node_type == "list_body":
-            for child in node.children:
-                parse_list_body_node(child)
-
-        # we are fine with a new line and a comma
-        elif node_type in ("NEWLINE", "COMMA"):
-            return
-        else:
-            raise ValueError(
-                f"A node of type {node_type} must not appear in a list_body"
-            )
-
-    check_ctrl_spec(list_line_node, list_dic, datadic, rwmode)
-    expr_list = get_child(list_line_node, "record_fields").children
-    cn = ("C1", "C2", "L1", "L2", "N1", "N2", "vals")
-    map_record_helper(expr_list, cn, list_dic, datadic, loop_vars, rwmode, parse_opts)
-
-    # treat parsing of list_body as additional action step,
-    # so don't parse list body if lookahead counter exhausted
-    if not should_proceed(datadic, loop_vars, "endf_action"):
-        if rwmode != "read":
-            return list_dic
-        else:
-            return datadic
-
-    # enter subsection if demanded
-    list_name_node = get_child(list_line_node, "list_name", nofail=True)
-    if list_name_node is not None:
-        create_missing = rwmode == "read"
-        path = EndfPath(path)
-        datadic, path = open_section(
-            list_name_node, datadic, loop_vars, create_missing, path=path
-        )
-    # parse the list body
-    list_body_node = get_child(list_line_node, "list_body")
-    try:
-        parse_list_body_node(list_body_node)
-    except VariableNotFoundError as exc:
-        exc.varname = str(path + exc.varname)
-        raise exc
-    # close subsection if opened
-    if list_name_node is not None:
-        datadic = close_section(list_name_node, datadic)
-
-    numels_in_list = len(list_dic["vals"])
-    if val_idx < numels_in_list:
-        raise UnconsumedListElementsError(
-            f"Not all values in the list_body were consumed and "
-            "associated with variables in datadic "
-            f"(read {val_idx} out of {numels_in_list})"
-        )
-    if rwmode != "read":
-        return list_dic
-    else:
-        return datadic
+    spec = compile_record(list_line_node)
+    return map_record(spec, list_dic, datadic, loop_vars, rwmode, parse_opts, path)
@@ -3,40 +3,42 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2024/02/17
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022-2024 International Atomic Energy Agency (IAEA)
 #
 ############################################################
 
 from collections.abc import Mapping
+import gc
 import logging
-import re
-from .logging_utils import write_info, RingBuffer
-from appdirs import user_cache_dir
+from .logging_utils import info_enabled, write_info, RingBuffer, MismatchDiagnostics
 from os.path import exists as file_exists
-from .tree_utils import is_tree, get_child, get_child_value, retrieve_value
-from .endf_mappings import (
-    map_cont_dic,
-    map_head_dic,
-    map_text_dic,
-    map_dir_dic,
-    map_intg_dic,
-    map_tab1_dic,
-    map_tab2_dic,
-    map_list_dic,
+from .endf_mappings import map_record
+from .endf_mapping_utils import (
+    eval_expr_without_unknown_var,
+    find_scope,
+    journal_assignment,
 )
-from .endf_mapping_utils import eval_expr_without_unknown_var, get_varname
 from .meta_control_utils import (
-    cycle_for_loop,
     evaluate_if_clause,
+    get_loop_bounds,
     open_section,
     close_section,
     should_proceed,
-    initialize_abbreviations,
     introduce_abbreviation,
     finalize_abbreviations,
 )
+from .endf_recipe_program import (
+    RECORD,
+    FOR_START,
+    FOR_NEXT,
+    IF,
+    JUMP,
+    SECTION_OPEN,
+    SECTION_CLOSE,
+    ABBREVIATION,
+)
 from .endf_utils import (
     read_cont,
     write_cont,
@@ -73,14 +75,16 @@ from .custom_exceptions import (
     MissingSectionError,
 )
 from .endf_recipe_utils import (
+    get_default_cache_dir,
     get_recipe_parsetree_dic,
-    get_responsible_recipe_parsetree,
 )
-from .endf_recipes import endf_recipe_dictionary
-from .debugging_utils import TrackingDict
 from .accessories import EndfDict, EndfPath
 
 
+# ways of executing the ENDF-6 recipes, see EndfParser
+backends = ("interpreter", "codegen")
+
+
 class EndfParser:
     """Class for parsing and writing ENDF-6 formatted data.
 
@@ -115,6 +119,9 @@ class EndfParser:
         cache_dir=None,
         print_cache_info=True,
         recipes=None,
+        recipe_compiler="lalr",
+        backend="interpreter",
+        log_mismatches=False,
     ):
         """Initializaton of options for parsing and writing ENDF-6 data.
 
@@ -203,8 +210,14 @@ class EndfParser:
             If `None`, the directory will be automatically determined
             relying on the `appdirs` package. If `false`, no cache directory
             will be used and ENDF-6 recipes will be compiled on the fly
-            whenever this class is instantiated. Finally, the user can
-            provide a custom directory as a string.
+            the first time they are needed to parse or write an MF/MT
+            section. Finally, the user can provide a custom directory
+            as a string. The default ENDF-6 recipes are taken from the
+            precompiled recipe bundle shipped with the package if
+            available, so the cache directory is then only used for
+            custom recipes passed via the `recipes` argument.
+            Entries created by other package versions can be removed with
+            :func:`~endf_parserpy.endf_recipe_utils.prune_recipe_cache`.
         print_cache_info : bool
             If `true`, print out a message regarding the location of the
             cache directory if it was automatically determined.
@@ -213,11 +226,38 @@ class EndfParser:
             nested dictionary with custom recipes. Inspect the default
             recipe dictionary to see the required structure
             (`from endf_parserpy.endf_recipes import endf_recipe_dictionary`)
+        recipe_compiler : str
+            Parsing algorithm used to compile ENDF-6 recipes, either
+            ``"lalr"`` or ``"earley"``. Both yield the same result but
+            the LALR compiler is much faster. Recipes that cannot be
+            handled by the LALR compiler are compiled with the
+            Earley compiler.
+        backend : str
+            Either ``"interpreter"`` or ``"codegen"``. The interpreter
+            executes the instruction programs compiled from the
+            ENDF-6 recipes (see :func:`run_program`). With ``"codegen"``,
+            a Python module with dedicated functions for reading and
+            writing is generated for each recipe and stored in the
+            cache directory. This speeds up the parsing of large MF/MT
+            sections, e.g., MF6, but not the writing. Both backends
+            yield the same results.
+        log_mismatches : bool
+            Log a warning with the offending line for each tolerated
+            mismatch. Otherwise, the tolerated mismatches are counted
+            and summarized in a single warning at the end of the parsing
+            process. The details are available in the
+            ``mismatch_diagnostics`` attribute, see :func:`parse`.
+            *(parsing)*
         """
+        if backend not in backends:
+            raise ValueError(
+                f"unknown backend `{backend}`, available are: {', '.join(backends)}"
+            )
+        self.backend = backend
         # obtain the parsing tree for the language
         # in which ENDF reading recipes are formulated
         if cache_dir is None:
-            cache_dir = user_cache_dir("endf_parserpy", "gschnabel")
+            cache_dir = get_default_cache_dir()
             if print_cache_info:
                 print(
                     f"Compiled ENDF recipes are cached in {cache_dir}\n"
@@ -227,34 +267,26 @@ class EndfParser:
                     + "To suppress this message, specify `print_cache_info=False`."
                 )
 
-        if recipes is None:
-            recipes = endf_recipe_dictionary
-        self.tree_dic = get_recipe_parsetree_dic(recipes, cache_dir)
+        self.tree_dic = get_recipe_parsetree_dic(recipes, cache_dir, recipe_compiler)
         # endf record treatment
-        endf_actions = {}
-        endf_actions["head_or_cont_line"] = self.process_head_or_cont_line
-        endf_actions["text_line"] = self.process_text_line
-        endf_actions["dir_line"] = self.process_dir_line
-        endf_actions["intg_line"] = self.process_intg_line
-        endf_actions["tab1_line"] = self.process_tab1_line
-        endf_actions["tab2_line"] = self.process_tab2_line
-        endf_actions["list_line"] = self.process_list_line
-        endf_actions["send_line"] = self.process_send_line
-        endf_actions["stop_line"] = self.process_stop_line
-        self.endf_actions = endf_actions
-        # program flow
-        meta_actions = {}
-        meta_actions["for_loop"] = self.process_for_loop
-        meta_actions["if_clause"] = self.process_if_clause
-        meta_actions["section"] = self.process_section
-        meta_actions["abbreviation"] = self.process_abbreviation
-        meta_actions["comment_block"] = self.process_comment_block
-        self.meta_actions = meta_actions
+        record_actions = {}
+        record_actions["HEAD"] = self.process_head_line
+        record_actions["CONT"] = self.process_cont_line
+        record_actions["TEXT"] = self.process_text_line
+        record_actions["DIR"] = self.process_dir_line
+        record_actions["INTG"] = self.process_intg_line
+        record_actions["TAB1"] = self.process_tab1_line
+        record_actions["TAB2"] = self.process_tab2_line
+        record_actions["LIST"] = self.process_list_line
+        record_actions["SEND"] = self.process_send_line
+        record_actions["STOP"] = self.process_stop_line
+        self.record_actions = record_actions
 
         self.parse_opts = {
             "ignore_zero_mismatch": ignore_zero_mismatch,
             "ignore_number_mismatch": ignore_number_mismatch,
             "ignore_varspec_mismatch": ignore_varspec_mismatch,
+            "log_mismatches": log_mismatches,
             "fuzzy_matching": fuzzy_matching,
         }
         self.write_opts = {
@@ -275,18 +307,17 @@ class EndfParser:
             "width": width,
         }
         self.explain_missing_variable = explain_missing_variable
-        self.variable_descriptions = EndfDict()
         self.current_path = None
+        self.mismatch_diagnostics = None
 
     def explain(self, varpath, stdout=True):
         """Explain the meaning of a variable.
 
         ENDF-6 recipes can contain the descriptions of variables,
-        which are automatically read while calling the
-        :func:`parsefile`, :func:`parse`, :func:`write`
-        and :func:`writefile` method. Given the path to a
-        variable, this function can output the associated
-        description.
+        which are extracted from the recipe of the MF/MT section
+        when they are requested for the first time. Given the
+        path to a variable, this function can output the
+        associated description.
 
         Parameters
         ----------
@@ -304,16 +335,21 @@ class EndfParser:
             otherwise the description as a ``str``.
         """
         varpath = EndfPath(varpath)
-        vardescr = self.variable_descriptions
+        # the descriptions are stored relative to the MF/MT section
+        mfmt = tuple(str(p) for p in varpath[:2])
+        vardescr = None
+        if len(varpath) > 2 and all(p.isdigit() for p in mfmt):
+            vardescr = self.tree_dic.get_variable_descriptions(*map(int, mfmt))
+        relpath = varpath[2:]
         search_state = [0]
-        search_dicts = [vardescr]
-        level = 0
+        search_dicts = [EndfDict(vardescr if vardescr is not None else {})]
+        level = 0 if vardescr is not None else -1
         while level >= 0:
             search_state[level] += 1
             ss = search_state[level]
             sd = search_dicts[level]
-            p = varpath[level]
-            if level == len(varpath) - 1:
+            p = relpath[level]
+            if level == len(relpath) - 1:
                 if sd.exists(p) and isinstance(sd[p], str):
                     if stdout:
                         print(sd[p])
@@ -338,64 +374,21 @@ class EndfParser:
             print(f"No description for `{str(varpath)}` available")
         return None
 
-    def process_comment_block(self, tree):
-        def extract_info(comment):
-            rex = r" *#(?P<indentstr>( *var *"
-            rex += r"(?P<varname>[a-zA-Z0-9/*]+) *(\[[^]]*\])?"
-            rex += " *:)?)?"
-            rex += "(?P<comment>.*)"
-            dic = re.match(rex, comment).groupdict()
-            return dic["varname"], dic["comment"], len(dic["indentstr"])
+    def process_stop_line(self, spec):
+        raise StopException(spec.stop_message)
 
-        idx = 0
-        comment_lines = get_child_value(tree, "COMMENT").splitlines()
-        while idx < len(comment_lines):
-            comment_line = comment_lines[idx]
-            varname, comment, indent = extract_info(comment_line)
-            if varname is not None:
-                if comment.strip() != "":
-                    firstindent = indent + len(comment) - len(comment.lstrip())
-                    curdescr = [comment.lstrip()]
-                else:
-                    idx += 1
-                    comment_line = comment_lines[idx]
-                    tmp, comment, indent = extract_info(comment_line)
-                    if tmp is not None:
-                        raise ValueError(f"empty explaination of {varname}")
-                    firstindent = len(comment) - len(comment.lstrip())
-                    curdescr = [comment[firstindent:]]
-                idx += 1
-                while idx < len(comment_lines):
-                    comment_line = comment_lines[idx]
-                    newvarname, comment, _ = extract_info(comment_line)
-                    if newvarname is not None:
-                        idx -= 1
-                        break
-                    curindent = len(comment) - len(comment.lstrip())
-                    maxindent = min(firstindent, curindent)
-                    curdescr.append(comment[maxindent:])
-                    idx += 1
-                vardescrs = self.variable_descriptions
-                vardescrs[self.current_path, varname] = "\n".join(curdescr).strip()
-            idx += 1
-
-    def process_stop_line(self, tree):
-        stop_message = retrieve_value(tree, "STOP_MESSAGE")
-        stop_message = stop_message if stop_message is not None else "stop instruction"
-        raise StopException(stop_message)
-
-    def process_text_line(self, tree):
+    def process_text_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             write_info("Reading a TEXT record", self.ofs)
             text_dic, self.ofs = read_text(
                 self.lines, self.ofs, with_ctrl=True, **self.read_opts
             )
-            text_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            map_text_dic(
-                tree,
+            text_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            map_record(
+                spec,
                 text_dic,
                 self.datadic,
                 self.loop_vars,
@@ -406,82 +399,81 @@ class EndfParser:
             # this line is introduced here to deal with the tape head (mf=0, mt=0)
             # which does not contain a head record as first item, which is the
             # only other place that adds this information.
-            self.datadic.update(get_ctrl(text_dic))
+            ctrl_dic = get_ctrl(text_dic)
+            for v in ctrl_dic:
+                journal_assignment(self.datadic, (v,), self.loop_vars)
+            self.datadic.update(ctrl_dic)
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            text_dic = map_text_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            text_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            text_dic.update(get_ctrl(self.datadic))
+            text_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_text(text_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_head_or_cont_line(self, tree):
-        line_type = get_child_value(tree, "CONT_SUBTYPE")
-        if line_type == "HEAD":
-            self.process_head_line(tree)
-        elif line_type == "CONT":
-            self.process_cont_line(tree)
-        else:
-            raise TypeError("parser code / grammar mismatch")
-
-    def process_head_line(self, tree):
+    def process_head_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
             write_info("Reading a HEAD record", self.ofs)
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             cont_dic, self.ofs = read_head(
                 self.lines,
                 self.ofs,
                 with_ctrl=True,
                 **self.read_opts,
             )
-            cont_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            write_info("Content of the HEAD record: " + str(cont_dic), self.ofs)
-            map_head_dic(
-                tree,
+            cont_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            if info_enabled():
+                write_info("Content of the HEAD record: " + str(cont_dic), self.ofs)
+            map_record(
+                spec,
                 cont_dic,
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            self.datadic.update(get_ctrl(cont_dic))
+            ctrl_dic = get_ctrl(cont_dic)
+            for v in ctrl_dic:
+                journal_assignment(self.datadic, (v,), self.loop_vars)
+            self.datadic.update(ctrl_dic)
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            head_dic = map_head_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            head_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            head_dic.update(get_ctrl(self.datadic))
+            head_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_head(head_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_cont_line(self, tree):
+    def process_cont_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
             write_info("Reading a CONT record", self.ofs)
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             cont_dic, self.ofs = read_cont(
                 self.lines,
                 self.ofs,
                 **self.read_opts,
             )
-            cont_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            write_info("Content of the CONT record: " + str(cont_dic))
-            map_cont_dic(
-                tree,
+            cont_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            if info_enabled():
+                write_info("Content of the CONT record: " + str(cont_dic))
+            map_record(
+                spec,
                 cont_dic,
                 self.datadic,
                 self.loop_vars,
@@ -489,32 +481,32 @@ class EndfParser:
                 parse_opts=self.parse_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            cont_dic = map_cont_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            cont_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            cont_dic.update(get_ctrl(self.datadic))
+            cont_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_cont(cont_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_dir_line(self, tree):
+    def process_dir_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             dir_dic, self.ofs = read_dir(
                 self.lines,
                 self.ofs,
                 **self.read_opts,
             )
-            dir_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            map_dir_dic(
-                tree,
+            dir_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            map_record(
+                spec,
                 dir_dic,
                 self.datadic,
                 self.loop_vars,
@@ -522,26 +514,26 @@ class EndfParser:
                 parse_opts=self.parse_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            dir_dic = map_dir_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            dir_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            dir_dic.update(get_ctrl(self.datadic))
+            dir_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_dir(dir_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_intg_line(self, tree):
+    def process_intg_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             ndigit = eval_expr_without_unknown_var(
-                get_child(tree, "ndigit_expr"), self.datadic, self.loop_vars
+                spec.ndigit_expr, self.datadic, self.loop_vars
             )
             intg_dic, self.ofs = read_intg(
                 self.lines,
@@ -549,9 +541,9 @@ class EndfParser:
                 ndigit=ndigit,
                 **self.read_opts,
             )
-            intg_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            map_intg_dic(
-                tree,
+            intg_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            map_record(
+                spec,
                 intg_dic,
                 self.datadic,
                 self.loop_vars,
@@ -559,38 +551,38 @@ class EndfParser:
                 parse_opts=self.parse_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            intg_dic = map_intg_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            intg_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            intg_dic.update(get_ctrl(self.datadic))
+            intg_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             ndigit = eval_expr_without_unknown_var(
-                get_child(tree, "ndigit_expr"), self.datadic, self.loop_vars
+                spec.ndigit_expr, self.datadic, self.loop_vars
             )
             newlines = write_intg(
                 intg_dic, with_ctrl=True, ndigit=ndigit, **self.write_opts
             )
             self.lines += newlines
 
-    def process_tab1_line(self, tree):
+    def process_tab1_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
             write_info("Reading a TAB1 record", self.ofs)
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             tab1_dic, self.ofs = read_tab1(
                 self.lines,
                 self.ofs,
                 **self.read_opts,
             )
-            tab1_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            map_tab1_dic(
-                tree,
+            tab1_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            map_record(
+                spec,
                 tab1_dic,
                 self.datadic,
                 self.loop_vars,
@@ -598,9 +590,9 @@ class EndfParser:
                 parse_opts=self.parse_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            tab1_dic = map_tab1_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            tab1_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
@@ -608,24 +600,24 @@ class EndfParser:
                 parse_opts=self.parse_opts,
                 path=self.current_path,
             )
-            tab1_dic.update(get_ctrl(self.datadic))
+            tab1_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_tab1(tab1_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_tab2_line(self, tree):
+    def process_tab2_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
             write_info("Reading a TAB2 record", self.ofs)
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             tab2_dic, self.ofs = read_tab2(
                 self.lines,
                 self.ofs,
                 **self.read_opts,
             )
-            tab2_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            map_tab2_dic(
-                tree,
+            tab2_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            map_record(
+                spec,
                 tab2_dic,
                 self.datadic,
                 self.loop_vars,
@@ -633,33 +625,33 @@ class EndfParser:
                 parse_opts=self.parse_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            tab2_dic = map_tab2_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            tab2_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            tab2_dic.update(get_ctrl(self.datadic))
+            tab2_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_tab2(tab2_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_list_line(self, tree):
+    def process_list_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
             self.loop_vars["__ofs"] = self.ofs
             write_info("Reading a LIST record", self.ofs)
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             list_dic, self.ofs = read_list(
                 self.lines,
                 self.ofs,
                 **self.read_opts,
             )
-            list_dic.update(self.logbuffer.get_last_entry(key_prefix="__"))
-            map_list_dic(
-                tree,
+            list_dic["__record_log"] = self.logbuffer.get_last_record_log()
+            map_record(
+                spec,
                 list_dic,
                 self.datadic,
                 self.loop_vars,
@@ -667,30 +659,30 @@ class EndfParser:
                 parse_opts=self.parse_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
-            list_dic = map_list_dic(
-                tree,
+            self.logbuffer.log_reduced_record(spec.record_str)
+            list_dic = map_record(
+                spec,
                 {},
                 self.datadic,
                 self.loop_vars,
                 self.rwmode,
                 parse_opts=self.parse_opts,
             )
-            list_dic.update(get_ctrl(self.datadic))
+            list_dic.update(get_ctrl(find_scope("MAT", self.datadic, self.loop_vars)))
             newlines = write_list(list_dic, with_ctrl=True, **self.write_opts)
             self.lines += newlines
 
-    def process_send_line(self, tree):
+    def process_send_line(self, spec):
         if self.rwmode == "read":
             self.ofs = skip_blank_lines(self.lines, self.ofs)
-            self.logbuffer.save_record_log(self.ofs, self.lines[self.ofs], tree)
+            self.logbuffer.log_record(self.ofs, self.lines[self.ofs], spec.record_str)
             read_send(
                 self.lines,
                 self.ofs,
                 **self.read_opts,
             )
         else:
-            self.logbuffer.save_reduced_record_log(tree)
+            self.logbuffer.log_reduced_record(spec.record_str)
             newlines = write_send(
                 self.datadic,
                 with_ctrl=True,
@@ -699,77 +691,137 @@ class EndfParser:
             )
             self.lines += newlines
 
-    def process_section(self, tree):
-        self.loop_vars["__ofs"] = self.ofs
-        section_head = get_child(tree, "section_head")
-        if self.rwmode == "write":
-            self.logbuffer.save_reduced_record_log(section_head)
-        section_tail = get_child(tree, "section_tail")
-        varname = get_varname(section_head)
-        varname2 = get_varname(section_tail)
-        if varname != varname2:
-            raise InconsistentSectionBracketsError(
-                "The section name in the tail does not correspond to "
-                + f"the one in the head (`{varname}` vs `{varname2}`)"
-            )
+    def run_program(self, program, start=0, stop=None, lookahead=False):
+        """Execute the instructions of a recipe program.
 
-        create_missing = self.rwmode == "read"
-        previous_path = self.current_path
-        self.datadic, self.current_path = open_section(
-            section_head,
-            self.datadic,
-            self.loop_vars,
-            create_missing,
-            path=self.current_path,
-        )
-        section_body = get_child(tree, "section_body")
-        initialize_abbreviations(self.datadic)
-        self.run_instruction(section_body)
-        finalize_abbreviations(self.datadic)
-        self.datadic = close_section(section_head, self.datadic)
-        self.current_path = previous_path
-
-    def process_for_loop(self, tree):
-        if self.rwmode == "write":
-            for_head = get_child(tree, "for_head")
-            self.logbuffer.save_reduced_record_log(for_head)
-        return cycle_for_loop(tree, self.run_instruction, self.datadic, self.loop_vars)
+        The instructions from index `start` up to, but not including,
+        `stop` are executed. If `lookahead` is ``True``, the instructions
+        are executed as part of a lookahead and execution ends as soon as
+        the lookahead counter is exhausted.
+        """
+        instructions = program.instructions
+        stop = len(instructions) if stop is None else stop
+        record_actions = self.record_actions
+        # state of the loops and sections entered during this run
+        loops = []
+        sections = []
+        pc = start
+        while pc < stop:
+            instr = instructions[pc]
+            op = instr[0]
+            if lookahead and op not in (FOR_NEXT, JUMP, SECTION_CLOSE):
+                action_type = "endf_action" if op == RECORD else "meta_action"
+                if not should_proceed(self.datadic, self.loop_vars, action_type):
+                    break
+            if op == RECORD:
+                spec = instr[1]
+                record_actions[spec.record_type](spec)
+                pc += 1
+            elif op == FOR_NEXT:
+                loop = loops[-1]
+                counter = loop[0] + 1
+                if counter <= loop[1]:
+                    loop[0] = counter
+                    self.loop_vars[instr[1]] = counter
+                    pc = instr[2]
+                else:
+                    loops.pop()
+                    del self.loop_vars[instr[1]]
+                    if info_enabled():
+                        write_info(
+                            "Leave for loop (type for_loop) "
+                            + instr[3]
+                            + f" (for_start: {loop[2]} and for_stop: {loop[1]})"
+                        )
+                    pc += 1
+            elif op == FOR_START:
+                _, varname, start_field, stop_field, head_str, exit_pc = instr
+                if self.rwmode == "write":
+                    self.logbuffer.log_reduced_record(head_str)
+                loop_start, loop_stop = get_loop_bounds(
+                    varname, start_field, stop_field, self.datadic, self.loop_vars
+                )
+                if info_enabled():
+                    write_info(
+                        "Enter for loop (type for_loop) "
+                        + head_str
+                        + f" (for_start: {loop_start} and for_stop {loop_stop})"
+                    )
+                if loop_start <= loop_stop:
+                    loops.append([loop_start, loop_stop, loop_start, varname])
+                    self.loop_vars[varname] = loop_start
+                    pc += 1
+                else:
+                    if info_enabled():
+                        write_info(
+                            "Leave for loop (type for_loop) "
+                            + head_str
+                            + f" (for_start: {loop_start} and for_stop: {loop_stop})"
+                        )
+                    pc = exit_pc
+            elif op == IF:
+                _, if_clause, bodies, end_pc = instr
 
-    def process_if_clause(self, tree):
-        evaluate_if_clause(
-            tree,
-            self.datadic,
-            self.loop_vars,
-            self.run_instruction,
-            set_parser_state=self.set_parser_state,
-            get_parser_state=self.get_parser_state,
-        )
+                def run_lookahead(if_body):
+                    self.run_program(program, *bodies[if_body], lookahead=True)
 
-    def process_abbreviation(self, tree):
-        introduce_abbreviation(tree, self.datadic)
+                if_body = evaluate_if_clause(
+                    if_clause,
+                    self.datadic,
+                    self.loop_vars,
+                    run_lookahead,
+                    set_parser_state=self.set_parser_state,
+                    get_parser_state=self.get_parser_state,
+                    eval_body=False,
+                    header_peeks=program.header_peeks,
+                )
+                pc = end_pc if if_body is None else bodies[if_body][0]
+            elif op == JUMP:
+                pc = instr[1]
+            elif op == SECTION_OPEN:
+                _, section_head, head_str, errmsg = instr
+                self.loop_vars["__ofs"] = self.ofs
+                if self.rwmode == "write":
+                    self.logbuffer.log_reduced_record(head_str)
+                if errmsg is not None:
+                    raise InconsistentSectionBracketsError(errmsg)
+                create_missing = self.rwmode == "read"
+                sections.append((section_head, self.current_path))
+                self.datadic, self.current_path = open_section(
+                    section_head,
+                    self.datadic,
+                    self.loop_vars,
+                    create_missing,
+                    path=self.current_path,
+                )
+                pc += 1
+            elif op == SECTION_CLOSE:
+                section_head, previous_path = sections.pop()
+                finalize_abbreviations(self.datadic, self.loop_vars)
+                self.datadic = close_section(section_head, self.datadic, self.loop_vars)
+                self.current_path = previous_path
+                pc += 1
+            elif op == ABBREVIATION:
+                introduce_abbreviation(instr[1], self.datadic, self.loop_vars)
+                pc += 1
+            else:
+                raise ValueError(f"invalid operation code {op}")
 
-    def run_instruction(self, tree):
-        if tree.data in self.endf_actions:
-            if should_proceed(self.datadic, self.loop_vars, action_type="endf_action"):
-                self.endf_actions[tree.data](tree)
-        elif tree.data in self.meta_actions:
-            if should_proceed(self.datadic, self.loop_vars, action_type="meta_action"):
-                self.meta_actions[tree.data](tree)
-        else:
-            for child in tree.children:
-                if is_tree(child):
-                    if should_proceed(
-                        self.datadic, self.loop_vars, action_type="unspecified"
-                    ):
-                        self.run_instruction(child)
-                    else:
-                        break
+        # leave the loops and sections if the lookahead ended early
+        for loop in loops:
+            del self.loop_vars[loop[3]]
+        while len(sections) > 0:
+            section_head, previous_path = sections.pop()
+            finalize_abbreviations(self.datadic, self.loop_vars)
+            self.datadic = close_section(section_head, self.datadic, self.loop_vars)
+            self.current_path = previous_path
 
     def reset_parser_state(self, rwmode="read", lines=None, datadic=None):
-        self.loop_vars = {}
         datadic = datadic if datadic is not None else {}
         lines = lines if lines is not None else []
-        self.loop_vars = {"__ofs": 0}
+        # the scope stack contains the dictionaries of the open sections
+        # and the abbreviations are kept apart from the dictionaries
+        self.loop_vars = {"__ofs": 0, "__scopes": [datadic], "__abbrevs": {}}
         self.datadic = datadic
         self.lines = lines
         self.rwmode = rwmode
@@ -786,6 +838,7 @@ class EndfParser:
             "ofs": self.ofs,
             "logbuffer_state": self.logbuffer.dump_state(),
             "parse_opts": self.parse_opts,
+            "read_opts": self.read_opts,
             "current_path": self.current_path,
         }
 
@@ -821,7 +874,7 @@ class EndfParser:
                 return True
         return False
 
-    def parse(self, lines, exclude=None, include=None, nofail=False):
+    def parse(self, lines, exclude=None, include=None, nofail=False, diagnostics=None):
         """Parse ENDF-6 formatted data.
 
         Parameters
@@ -840,11 +893,35 @@ class EndfParser:
         nofail : bool
             See explanation of parameter ``nofail`` in
             :func:`parsefile` for details.
+        diagnostics : Union[None, MismatchDiagnostics]
+            See explanation of parameter ``diagnostics`` in
+            :func:`parsefile` for details.
         """
         if isinstance(lines, str):
             lines = lines.split("\n")
+        if diagnostics is None:
+            diagnostics = MismatchDiagnostics()
+        self.mismatch_diagnostics = diagnostics
+        # the diagnostics may already contain mismatches of earlier calls
+        prior_counts = diagnostics.counts.copy()
+        num_prior_mismatches = diagnostics.num_mismatches
+        self.parse_opts["diagnostics"] = diagnostics
+        try:
+            mfmt_dic = self._parse_sections(lines, exclude, include, nofail)
+        finally:
+            del self.parse_opts["diagnostics"]
+        num_mismatches = diagnostics.num_mismatches - num_prior_mismatches
+        if num_mismatches > 0 and not self.parse_opts["log_mismatches"]:
+            logging.warning(
+                f"{num_mismatches} mismatches tolerated during parsing "
+                + f"({diagnostics.describe(since=prior_counts)}), "
+                + "see `mismatch_diagnostics.summary()` of the parser "
+                + "or specify `log_mismatches=True` for the details"
+            )
+        return mfmt_dic
+
+    def _parse_sections(self, lines, exclude, include, nofail):
         tree_dic = self.tree_dic
-        self.variable_descriptions = EndfDict()
         mfmt_dic = split_sections(lines, **self.read_opts)
         for mf in mfmt_dic:
             write_info(f"Parsing section MF{mf}")
@@ -852,18 +929,22 @@ class EndfParser:
                 curmat = read_ctrl(mfmt_dic[mf][mt][0], **self.read_opts)
                 write_info(f"Parsing subsection MF/MT {mf}/{mt}")
                 curlines = mfmt_dic[mf][mt]
-                cur_tree = get_responsible_recipe_parsetree(tree_dic, mf, mt)
-                should_skip = self.should_skip_section(mf, mt, exclude, include)
-                if cur_tree is not None and not should_skip:
+                # excluded sections are neither parsed nor is their recipe compiled
+                if self.should_skip_section(mf, mt, exclude, include):
+                    continue
+                program = tree_dic.get_recipe_program(mf, mt)
+                if program is not None:
                     # we add the SEND line so that parsing fails
                     # if the MT section cannot be completely parsed
                     curlines += write_send(curmat, with_ctrl=True, **self.write_opts)
                     self.reset_parser_state(rwmode="read", lines=curlines)
                     self.current_path = EndfPath((mf, mt))
                     try:
-                        initialize_abbreviations(self.datadic)
-                        self.run_instruction(cur_tree)
-                        finalize_abbreviations(self.datadic)
+                        if self.backend == "codegen":
+                            read_section = tree_dic.get_recipe_functions(mf, mt)[0]
+                            read_section(self)
+                        else:
+                            self.run_program(program)
                         mfmt_dic[mf][mt] = self.datadic
                     except ParserException as exc:
                         if not nofail:
@@ -889,9 +970,10 @@ class EndfParser:
         """
         self.zero_as_blank = zero_as_blank
         self.reset_parser_state(rwmode="write", datadic={})
-        self.variable_descriptions = EndfDict()
         should_check_arrays = self.write_opts["check_arrays"]
         if should_check_arrays:
+            from .debugging_utils import TrackingDict
+
             endf_dic = TrackingDict(endf_dic)
         tree_dic = self.tree_dic
         lines = []
@@ -901,9 +983,9 @@ class EndfParser:
                 should_skip = self.should_skip_section(mf, mt, exclude, include)
                 if should_skip:
                     continue
-                cur_tree = get_responsible_recipe_parsetree(tree_dic, mf, mt)
                 is_parsed = isinstance(endf_dic[mf][mt], Mapping)
-                if cur_tree is not None and is_parsed:
+                program = tree_dic.get_recipe_program(mf, mt) if is_parsed else None
+                if program is not None:
                     datadic = endf_dic[mf][mt]
                     self.reset_parser_state(rwmode="write", datadic=datadic)
                     self.current_path = EndfPath((mf, mt))
@@ -918,9 +1000,11 @@ class EndfParser:
                             f"expected MT={mt} but found MT={datadic['MT']}"
                         )
                     try:
-                        initialize_abbreviations(self.datadic)
-                        self.run_instruction(cur_tree)
-                        finalize_abbreviations(self.datadic)
+                        if self.backend == "codegen":
+                            write_section = tree_dic.get_recipe_functions(mf, mt)[1]
+                            write_section(self)
+                        else:
+                            self.run_program(program)
                     except Exception as exc:
                         logstr = self.logbuffer.display_reduced_record_logs()
                         errmsg = (
@@ -1033,7 +1117,9 @@ class EndfParser:
             endf_dic.verify_complete_retrieval()
         return lines
 
-    def parsefile(self, filename, exclude=None, include=None, nofail=False):
+    def parsefile(
+        self, filename, exclude=None, include=None, nofail=False, diagnostics=None
+    ):
         """Parse ENDF-6 formatted data stored in a file.
 
         Parameters
@@ -1066,6 +1152,13 @@ class EndfParser:
             parsing failed will only be available as list of strings.
             On the other hand, ``nofail=false`` instructs the parser
             to abort immediately upon the first parsing failure.
+        diagnostics : Union[None, MismatchDiagnostics]
+            Object collecting the mismatches tolerated while parsing,
+            see :class:`~endf_parserpy.logging_utils.MismatchDiagnostics`.
+            If `None`, a new object is created. The object is
+            available as ``mismatch_diagnostics`` attribute of the parser
+            after parsing. An object can be passed to several calls
+            to collect the mismatches in several files.
 
         Returns
         -------
@@ -1078,7 +1171,9 @@ class EndfParser:
         """
         with open(filename, "r") as fin:
             lines = fin.readlines()
-        return self.parse(lines, exclude, include, nofail=nofail)
+        return self.parse(
+            lines, exclude, include, nofail=nofail, diagnostics=diagnostics
+        )
 
     def writefile(
         self,
@@ -1128,6 +1223,50 @@ class EndfParser:
                 fout.write("\n".join(lines))
 
 
+def preload(**kwargs):
+    """Load all parser state before forking worker processes.
+
+    All compiled ENDF-6 recipes, their analyses, instruction programs,
+    the generated code if ``backend="codegen"``, and the descriptions
+    of their variables are loaded, the modules needed for parsing and
+    writing imported and an :class:`EndfParser` instance created.
+    Afterwards, all objects created so far are moved to a permanent
+    generation of the garbage collector (``gc.freeze``), so that the
+    garbage collector of processes forked afterwards does not write to
+    the memory pages of these objects and the pages remain shared
+    between the processes.
+
+    Parameters
+    ----------
+    **kwargs
+        Arguments passed to the constructor of :class:`EndfParser`.
+        The message about the cache directory is not printed unless
+        `print_cache_info` is given explicitly.
+
+    Returns
+    -------
+    EndfParser
+        The parser instance, which can be used in the forked processes.
+    """
+    kwargs.setdefault("print_cache_info", False)
+    parser = EndfParser(**kwargs)
+    tree_dic = parser.tree_dic
+    for mf, mt in tree_dic.iter_mfmt():
+        tree_dic.get_tree(mf, mt)
+        tree_dic.get_variable_descriptions(mf, mt)
+        tree_dic.get_recipe_analysis(mf, mt)
+        tree_dic.get_recipe_program(mf, mt)
+        if parser.backend == "codegen":
+            tree_dic.get_recipe_functions(mf, mt)
+    # imported on demand during writing
+    from . import debugging_utils  # noqa: F401
+
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    return parser
+
+
 # DEPRECATED NAME
 
 
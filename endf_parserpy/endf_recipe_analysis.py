@@ -0,0 +1,413 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+from copy import deepcopy
+from .tree_utils import is_tree, get_name, get_child, get_child_value
+
+
+# names of the fields in the records as used in endf_mappings
+record_field_names = {
+    "head_or_cont_line": ("C1", "C2", "L1", "L2", "N1", "N2"),
+    "list_line": ("C1", "C2", "L1", "L2", "N1", "N2"),
+    "tab1_line": ("C1", "C2", "L1", "L2"),
+    "tab2_line": ("C1", "C2", "L1", "L2", "N2"),
+    "dir_line": ("L1", "L2", "N1", "N2"),
+    "intg_line": ("II", "JJ", "KIJ"),
+}
+
+record_types = {
+    "text_line": "TEXT",
+    "dir_line": "DIR",
+    "intg_line": "INTG",
+    "tab1_line": "TAB1",
+    "tab2_line": "TAB2",
+    "list_line": "LIST",
+}
+
+
+class RecipeAnalysis:
+    """Static information about a compiled ENDF-6 recipe.
+
+    The information is gathered by :func:`analyze_recipe` in a single
+    pass over the parse tree of a recipe and stored along with the parse
+    tree in the recipe cache. It has the following attribute:
+
+    ``lookaheads``
+        Maps the nodes of ``if`` and ``elif`` statements with a
+        lookahead option to a ``dict`` with the lookahead expression
+        (``lookahead``), the variables in the condition
+        (``condition_vars``) and the ones among them that are not bound
+        before the statement is evaluated (``unbound_vars``), the first
+        record in the body of the statement (``first_record``) and
+        a ``dict`` mapping the unbound variables to the names of the
+        fields in this record (``peek_fields``) if they all appear as
+        plain fields in the header of this record, otherwise ``None``.
+        Variables are represented by tuples ``(varname, indices)``,
+        with ``indices`` being a tuple with the names of the loop
+        variables or numbers in the index specification.
+    """
+
+    def __init__(self):
+        self.lookaheads = {}
+
+
+class _Scope:
+    # the variables bound in a section are stored along with the indices
+    # and the ids of the enclosing loop nodes at the time of binding
+    def __init__(self):
+        self.bound = {}
+        self.maybe = set()
+        self.abbrevs = set()
+        self.sections = {}
+
+
+def _merge_scopes(scopes):
+    # scope containing the variables bound in all scopes for sure
+    # and the ones only bound in some of them as possibly bound
+    merged = _Scope()
+    all_names = set().union(*(s.bound for s in scopes))
+    for varname in all_names:
+        if all(varname in s.bound for s in scopes):
+            entries = set.intersection(*(s.bound[varname] for s in scopes))
+            merged.bound[varname] = entries
+        else:
+            merged.maybe.add(varname)
+    merged.maybe.update(*(s.maybe for s in scopes))
+    merged.abbrevs = set.intersection(*(s.abbrevs for s in scopes))
+    merged.maybe.update(set().union(*(s.abbrevs for s in scopes)) - merged.abbrevs)
+    section_keys = set().union(*(s.sections for s in scopes))
+    for key in section_keys:
+        subscopes = [s.sections.get(key, _Scope()) for s in scopes]
+        merged.sections[key] = _merge_scopes(subscopes)
+    return merged
+
+
+def get_variable_ref(extvarname):
+    """Return the tuple ``(varname, indices)`` of a variable node."""
+    varname = get_child_value(extvarname, "VARNAME")
+    indices = tuple(
+        ch.children[0].value for ch in extvarname.subtrees if ch.data == "indexquant"
+    )
+    return varname, indices
+
+
+def get_extvarnames(node):
+    """Return all variable nodes in an expression in the order of appearance."""
+    if not is_tree(node):
+        return []
+    if node.data == "extvarname":
+        return [node]
+    extvarnames = []
+    for ch in node.subtrees:
+        extvarnames.extend(get_extvarnames(ch))
+    return extvarnames
+
+
+def get_plain_extvarname(expr):
+    """Return the variable node if an expression only consists of a variable."""
+    node = expr
+    while (
+        is_tree(node)
+        and node.data in ("expr", "addpart", "mulpart")
+        and len(node.children) == 1
+    ):
+        node = node.children[0]
+    if is_tree(node) and node.data == "extvarname":
+        return node
+    return None
+
+
+def _without_commas(children):
+    return [ch for ch in children if get_name(ch) != "COMMA"]
+
+
+def _get_header_exprs(record_node):
+    # the expressions of the fields mapped in the first call
+    # of map_record_helper in the functions of endf_mappings
+    name = record_node.data
+    if name in ("head_or_cont_line", "list_line"):
+        return _without_commas(get_child(record_node, "record_fields").children)
+    elif name == "dir_line":
+        return _without_commas(get_child(record_node, "dir_fields").children)
+    elif name == "intg_line":
+        return _without_commas(get_child(record_node, "intg_fields").children)
+    elif name == "tab1_line":
+        tab1_fields = get_child(record_node, "tab1_fields")
+        children = get_child(tab1_fields, "record_fields").children
+        return _without_commas(children[:-3])
+    elif name == "tab2_line":
+        tab2_fields = get_child(record_node, "tab2_fields")
+        children = get_child(tab2_fields, "record_fields").children
+        return _without_commas(children[:-3] + children[-1:])
+    raise TypeError(f"unsupported record node `{name}`")
+
+
+class _RecipeAnalyzer:
+
+    def __init__(self):
+        self.analysis = RecipeAnalysis()
+        self.root = _Scope()
+        self.path = []
+        self.loop_vars = {}
+        self.loop_ctx = ()
+
+    @property
+    def scope(self):
+        scope = self.root
+        for key in self.path:
+            scope = scope.sections[key]
+        return scope
+
+    def scope_chain(self):
+        # scopes from the innermost to the outermost one
+        scopes = [self.root]
+        for key in self.path:
+            scopes.append(scopes[-1].sections[key])
+        return scopes[::-1]
+
+    def enter_section(self, extvarname):
+        key = get_variable_ref(extvarname)
+        self.scope.sections.setdefault(key, _Scope())
+        self.path.append(key)
+
+    def leave_section(self, clear_abbrevs=False):
+        if clear_abbrevs:
+            # abbreviations are removed at the end of a section
+            self.scope.abbrevs.clear()
+        self.path.pop()
+
+    def enter_loop(self, varname, loop_node):
+        # a loop variable already in use makes the recipe fail when
+        # executed but should not prevent the analysis of the recipe
+        prev_loop_node = self.loop_vars.get(varname, None)
+        self.loop_vars[varname] = loop_node
+        self.loop_ctx += (id(loop_node),)
+        return prev_loop_node
+
+    def leave_loop(self, varname, prev_loop_node=None):
+        if prev_loop_node is None:
+            del self.loop_vars[varname]
+        else:
+            self.loop_vars[varname] = prev_loop_node
+        self.loop_ctx = self.loop_ctx[:-1]
+
+    def local_status(self, ref):
+        varname, indices = ref
+        if varname in self.loop_vars:
+            return "loop"
+        scope = self.scope
+        if varname in scope.abbrevs:
+            return "abbreviation"
+        entries = scope.bound.get(varname, None)
+        if entries is not None:
+            loop_ctx = self.loop_ctx
+            for bound_indices, bound_ctx in entries:
+                if bound_indices == indices and loop_ctx[: len(bound_ctx)] == bound_ctx:
+                    return "read"
+            return "maybe"
+        if varname in scope.maybe:
+            return "maybe"
+        return "bind"
+
+    def bind(self, ref):
+        varname, indices = ref
+        entries = self.scope.bound.setdefault(varname, set())
+        entries.add((indices, self.loop_ctx))
+
+    def is_known(self, ref):
+        # variables in conditions are looked up
+        # in the enclosing sections as well
+        varname = ref[0]
+        if varname in self.loop_vars:
+            return True
+        for scope in self.scope_chain():
+            if varname in scope.abbrevs:
+                return True
+            if varname in scope.maybe:
+                return False
+            if varname in scope.bound:
+                return True
+        return False
+
+    def analyze_block(self, node):
+        for child in node.subtrees:
+            name = child.data
+            if name in ("code_token", "endf_line"):
+                self.analyze_block(child)
+            elif name in record_types or name == "head_or_cont_line":
+                self.analyze_record(child)
+            elif name == "section":
+                self.analyze_section(child)
+            elif name == "for_loop":
+                self.analyze_for_loop(child)
+            elif name == "if_clause":
+                self.analyze_if_clause(child)
+            elif name == "abbreviation":
+                self.scope.abbrevs.add(get_child_value(child, "VARNAME"))
+
+    def analyze_section(self, node):
+        self.enter_section(get_child(get_child(node, "section_head"), "extvarname"))
+        self.analyze_block(get_child(node, "section_body"))
+        self.leave_section(clear_abbrevs=True)
+
+    def analyze_for_loop(self, node):
+        for_head = get_child(node, "for_head")
+        varname = get_child_value(for_head, "VARNAME")
+        prev_loop_node = self.enter_loop(varname, node)
+        self.analyze_block(get_child(node, "for_body"))
+        self.leave_loop(varname, prev_loop_node)
+
+    def analyze_if_clause(self, node):
+        statements = [
+            ch
+            for ch in node.subtrees
+            if ch.data in ("if_statement", "elif_statement", "else_statement")
+        ]
+        # each branch starts from the state before the if clause
+        # and only variables bound in all branches are bound for sure
+        orig_root = self.root
+        branch_roots = []
+        for statement in statements:
+            self.root = deepcopy(orig_root)
+            if statement.data != "else_statement":
+                self.analyze_if_statement(statement)
+            self.analyze_block(get_child(statement, "if_body"))
+            branch_roots.append(self.root)
+        if statements[-1].data != "else_statement":
+            branch_roots.append(orig_root)
+        self.root = _merge_scopes(branch_roots)
+
+    def analyze_if_statement(self, node):
+        lookahead_option = get_child(node, "lookahead_option", nofail=True)
+        if lookahead_option is None:
+            return
+        if_head = get_child(node, "if_head")
+        condition_vars = []
+        unbound_vars = []
+        for extvarname in get_extvarnames(if_head):
+            ref = get_variable_ref(extvarname)
+            condition_vars.append(ref)
+            if not self.is_known(ref):
+                unbound_vars.append(ref)
+        first_record = self.get_first_record(get_child(node, "if_body"))
+        peek_fields = None
+        if first_record is not None and first_record.data != "text_line":
+            peek_fields = {}
+            field_names = record_field_names[first_record.data]
+            exprs = _get_header_exprs(first_record)
+            for key, expr in zip(field_names, exprs):
+                extvarname = get_plain_extvarname(expr)
+                if extvarname is not None:
+                    ref = get_variable_ref(extvarname)
+                    if ref in unbound_vars:
+                        peek_fields.setdefault(ref, key)
+            if len(peek_fields) < len(set(unbound_vars)):
+                peek_fields = None
+        self.analysis.lookaheads[node] = {
+            "lookahead": get_child(lookahead_option, "expr"),
+            "condition_vars": tuple(condition_vars),
+            "unbound_vars": tuple(unbound_vars),
+            "first_record": first_record,
+            "peek_fields": peek_fields,
+        }
+
+    def get_first_record(self, body):
+        # first record read in the body unless a section, loop
+        # or if clause needs to be entered before
+        for child in body.subtrees:
+            name = child.data
+            if name == "code_token":
+                child = child.subtrees[0]
+                name = child.data
+            if name in ("comment_block", "abbreviation"):
+                continue
+            if name == "endf_line":
+                record_node = child.subtrees[0]
+                if record_node.data in record_types or (
+                    record_node.data == "head_or_cont_line"
+                ):
+                    return record_node
+            return None
+        return None
+
+    def bind_unknown(self, expr):
+        # variables in a field not known before are bound
+        # in the current section when the field is mapped
+        for extvarname in get_extvarnames(expr):
+            ref = get_variable_ref(extvarname)
+            if self.local_status(ref) == "bind":
+                self.bind(ref)
+
+    def analyze_record(self, node):
+        name = node.data
+        if name == "text_line":
+            for placeholder in get_child(node, "text_fields").subtrees:
+                self.bind_unknown(placeholder)
+        else:
+            for expr in _get_header_exprs(node):
+                self.bind_unknown(expr)
+        # MAT, MF and MT are added to the current section
+        # while reading HEAD and TEXT records
+        if name == "text_line" or (
+            name == "head_or_cont_line"
+            and get_child_value(node, "CONT_SUBTYPE") != "CONT"
+        ):
+            for varname in ("MAT", "MF", "MT"):
+                self.bind((varname, ()))
+        if name in ("tab1_line", "tab2_line"):
+            self.analyze_table(node)
+        elif name == "list_line":
+            self.analyze_list_body(node)
+
+    def analyze_table(self, node):
+        table_name = get_child(node, "table_name", nofail=True)
+        if table_name is not None:
+            self.enter_section(get_child(table_name, "extvarname"))
+        for key in ("NBT", "INT"):
+            self.bind((key, ()))
+        if node.data == "tab1_line":
+            tab1_def = get_child(get_child(node, "tab1_fields"), "tab1_def")
+            for extvarname in tab1_def.subtrees:
+                if extvarname.data == "extvarname":
+                    self.bind_unknown(extvarname)
+        if table_name is not None:
+            self.leave_section()
+
+    def analyze_list_body(self, node):
+        list_name = get_child(node, "list_name", nofail=True)
+        if list_name is not None:
+            self.enter_section(get_child(list_name, "extvarname"))
+        self.analyze_list_body_node(get_child(node, "list_body"))
+        if list_name is not None:
+            self.leave_section()
+
+    def analyze_list_body_node(self, node):
+        for child in node.subtrees:
+            if child.data == "expr":
+                self.bind_unknown(child)
+            elif child.data == "list_loop":
+                for_head = get_child(child, "list_for_head")
+                varname = get_child_value(for_head, "VARNAME")
+                prev_loop_node = self.enter_loop(varname, child)
+                self.analyze_list_body_node(get_child(child, "list_body"))
+                self.leave_loop(varname, prev_loop_node)
+
+
+def analyze_recipe(tree):
+    """Analyze the parse tree of a recipe.
+
+    Returns a :class:`RecipeAnalysis` object with information
+    about the if statements with a lookahead option of the recipe,
+    so that it does not need to be determined when a recipe is executed.
+    """
+    analyzer = _RecipeAnalyzer()
+    analyzer.analyze_block(tree)
+    return analyzer.analysis
@@ -0,0 +1,687 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+from hashlib import md5
+from threading import get_ident
+import importlib.util
+import os
+import py_compile
+from .endf_recipe_program import (
+    RECORD,
+    FOR_START,
+    IF,
+    SECTION_OPEN,
+    SECTION_CLOSE,
+    ABBREVIATION,
+)
+from .endf_mapping_core import (
+    RecordField,
+    get_field_value,
+    log_record_variables,
+    map_record_fields,
+)
+from .endf_mapping_utils import find_scope
+from .endf_recipe_utils import RECIPE_CODEGEN_FORMAT_VERSION
+from .endf_mappings import (
+    ListLoopSpec,
+    check_ctrl,
+    create_list_exhausted_error_msg,
+    create_unconsumed_list_error_msg,
+    map_list_loop_bulk,
+)
+from .meta_control_utils import (
+    get_loop_bounds,
+    evaluate_if_clause,
+    open_section,
+    close_section,
+    introduce_abbreviation,
+    finalize_abbreviations,
+)
+from .endf_utils import (
+    get_ctrl,
+    skip_blank_lines,
+    read_cont,
+    write_cont,
+    read_dir,
+    write_dir,
+    read_list,
+    write_list,
+)
+from .logging_utils import info_enabled, write_info
+from .tree_utils import get_child_value
+from .custom_exceptions import (
+    InconsistentSectionBracketsError,
+    MoreListElementsExpectedError,
+    UnconsumedListElementsError,
+    VariableNotFoundError,
+)
+from .accessories import EndfPath
+
+
+# functions and classes available to the generated code
+runtime = {
+    "get_field_value": get_field_value,
+    "log_record_variables": log_record_variables,
+    "map_record_fields": map_record_fields,
+    "check_ctrl": check_ctrl,
+    "create_list_exhausted_error_msg": create_list_exhausted_error_msg,
+    "create_unconsumed_list_error_msg": create_unconsumed_list_error_msg,
+    "map_list_loop_bulk": map_list_loop_bulk,
+    "get_loop_bounds": get_loop_bounds,
+    "evaluate_if_clause": evaluate_if_clause,
+    "open_section": open_section,
+    "close_section": close_section,
+    "introduce_abbreviation": introduce_abbreviation,
+    "finalize_abbreviations": finalize_abbreviations,
+    "get_ctrl": get_ctrl,
+    "find_scope": find_scope,
+    "skip_blank_lines": skip_blank_lines,
+    "read_cont": read_cont,
+    "write_cont": write_cont,
+    "read_dir": read_dir,
+    "write_dir": write_dir,
+    "read_list": read_list,
+    "write_list": write_list,
+    "write_info": write_info,
+    "info_enabled": info_enabled,
+    "InconsistentSectionBracketsError": InconsistentSectionBracketsError,
+    "MoreListElementsExpectedError": MoreListElementsExpectedError,
+    "UnconsumedListElementsError": UnconsumedListElementsError,
+    "VariableNotFoundError": VariableNotFoundError,
+    "EndfPath": EndfPath,
+}
+
+# records read and written by code generated for the record type,
+# the others are delegated to the process_*_line methods of the parser
+inline_record_types = ("HEAD", "CONT", "DIR", "LIST")
+
+delegated_record_methods = {
+    "TEXT": "process_text_line",
+    "INTG": "process_intg_line",
+    "TAB1": "process_tab1_line",
+    "TAB2": "process_tab2_line",
+    "SEND": "process_send_line",
+    "STOP": "process_stop_line",
+}
+
+
+class _SourceWriter:
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+
+    def __call__(self, line):
+        self.lines.append("    " * self.level + line)
+
+    def indent(self):
+        self.level += 1
+
+    def dedent(self):
+        self.level -= 1
+
+
+class _RecipeCodeGenerator:
+    """Translate the instructions of a recipe program into Python code.
+
+    The functions to read and write an MF/MT section are generated
+    separately. Objects of the program needed by the generated code,
+    such as record specifications and parse tree nodes, are bound
+    to variables named ``c<pc>...`` when the generated module is
+    bound to the program, see :func:`generate_recipe_source`.
+    """
+
+    def __init__(self, program):
+        self.instructions = program.instructions
+        self.consts = {}
+        loop_varnames = set()
+        abbrev_varnames = set()
+        for instr in self.instructions:
+            if instr[0] == FOR_START:
+                loop_varnames.add(instr[1])
+            elif instr[0] == ABBREVIATION:
+                abbrev_varnames.add(get_child_value(instr[1], "VARNAME"))
+            elif instr[0] == RECORD:
+                loop_varnames.update(self._get_list_loop_varnames(instr[1].list_body))
+        self.loop_varnames = loop_varnames
+        self.abbrev_varnames = abbrev_varnames
+
+    def _get_list_loop_varnames(self, items):
+        varnames = set()
+        for item in items:
+            if item.__class__ is ListLoopSpec:
+                varnames.add(item.varname)
+                varnames.update(self._get_list_loop_varnames(item.body))
+        return varnames
+
+    def const(self, name, expr):
+        self.consts[name] = expr
+        return name
+
+    def generate(self, rwmode):
+        self.rwmode = rwmode
+        # Python variables of the loop variables in the enclosing loops
+        self.scope = {}
+        self.sections = []
+        w = self.w = _SourceWriter()
+        w.level = 1
+        w(f"def {rwmode}_section(parser):")
+        w.indent()
+        w("lines = parser.lines")
+        w("loop_vars = parser.loop_vars")
+        w("logbuffer = parser.logbuffer")
+        w("datadic = parser.datadic")
+        if rwmode == "read":
+            w("read_opts = parser.read_opts")
+            w("parse_opts = parser.parse_opts")
+        else:
+            w("write_opts = parser.write_opts")
+        for method in sorted(set(delegated_record_methods.values())):
+            w(f"{method} = parser.{method}")
+        self.emit_block(0, len(self.instructions))
+        w("return")
+        w.dedent()
+        return w.lines
+
+    def emit_block(self, pc, stop):
+        instructions = self.instructions
+        while pc < stop:
+            instr = instructions[pc]
+            op = instr[0]
+            if op == RECORD:
+                self.emit_record(pc, instr[1])
+                pc += 1
+            elif op == FOR_START:
+                self.emit_for_loop(pc, instr)
+                pc = instr[5]
+            elif op == IF:
+                self.emit_if_clause(pc, instr)
+                pc = instr[3]
+            elif op == SECTION_OPEN:
+                self.emit_section_open(pc, instr)
+                pc += 1
+            elif op == SECTION_CLOSE:
+                self.emit_section_close(pc)
+                pc += 1
+            elif op == ABBREVIATION:
+                node = self.const(f"c{pc}", f"instructions[{pc}][1]")
+                self.w(f"introduce_abbreviation({node}, datadic, loop_vars)")
+                pc += 1
+            else:
+                raise ValueError(f"unexpected operation code {op} at {pc}")
+
+    def emit_for_loop(self, pc, instr):
+        w = self.w
+        _, varname, _, _, head_str, exit_pc = instr
+        start = self.const(f"c{pc}_start", f"instructions[{pc}][2]")
+        stop = self.const(f"c{pc}_stop", f"instructions[{pc}][3]")
+        head = self.const(f"c{pc}_head", f"instructions[{pc}][4]")
+        lo, hi, var = f"lo{pc}", f"hi{pc}", f"i{pc}"
+        if self.rwmode == "write":
+            w(f"logbuffer.log_reduced_record({head})")
+        w(
+            f"{lo}, {hi} = get_loop_bounds("
+            f"{varname!r}, {start}, {stop}, datadic, loop_vars)"
+        )
+        self.emit_loop_info("Enter", "for_loop", head, lo, hi)
+        w(f"for {var} in range({lo}, {hi} + 1):")
+        w.indent()
+        w(f"loop_vars[{varname!r}] = {var}")
+        outer_var = self.scope.get(varname)
+        self.scope[varname] = var
+        # the last instruction of the body is the FOR_NEXT instruction
+        self.emit_block(pc + 1, exit_pc - 1)
+        self.restore_scope(varname, outer_var)
+        w.dedent()
+        w(f"if {lo} <= {hi}:")
+        w(f"    del loop_vars[{varname!r}]")
+        self.emit_loop_info("Leave", "for_loop", head, lo, hi)
+
+    def emit_loop_info(self, action, loop_type, head, lo, hi):
+        sep = "" if action == "Enter" else ":"
+        self.w("if info_enabled():")
+        self.w(
+            f'    write_info("{action} for loop (type {loop_type}) " + {head} + '
+            f'f" (for_start: {{{lo}}} and for_stop{sep} {{{hi}}})")'
+        )
+
+    def restore_scope(self, varname, outer_var):
+        if outer_var is None:
+            del self.scope[varname]
+        else:
+            self.scope[varname] = outer_var
+
+    def emit_if_clause(self, pc, instr):
+        w = self.w
+        _, _, bodies, _ = instr
+        node = self.const(f"c{pc}", f"instructions[{pc}][1]")
+        body_ranges = self.const(f"c{pc}_bodies", f"instructions[{pc}][2]")
+        header_peeks = self.const("header_peeks", "program.header_peeks")
+        w(
+            f"if_body = evaluate_if_clause({node}, datadic, loop_vars, "
+            f"lambda b: parser.run_program(program, *{body_ranges}[b], "
+            "lookahead=True), set_parser_state=parser.set_parser_state, "
+            "get_parser_state=parser.get_parser_state, eval_body=False, "
+            f"header_peeks={header_peeks})"
+        )
+        keyword = "if"
+        for i, (start_pc, stop_pc) in enumerate(bodies.values()):
+            body = self.const(f"c{pc}_{i}", f"tuple(instructions[{pc}][2])[{i}]")
+            w(f"{keyword} if_body is {body}:")
+            w.indent()
+            if start_pc == stop_pc:
+                w("pass")
+            self.emit_block(start_pc, stop_pc)
+            w.dedent()
+            keyword = "elif"
+
+    def emit_section_open(self, pc, instr):
+        w = self.w
+        _, _, _, errmsg = instr
+        node = self.const(f"c{pc}", f"instructions[{pc}][1]")
+        w("loop_vars['__ofs'] = parser.ofs")
+        if self.rwmode == "write":
+            head = self.const(f"c{pc}_head", f"instructions[{pc}][2]")
+            w(f"logbuffer.log_reduced_record({head})")
+        if errmsg is not None:
+            w(f"raise InconsistentSectionBracketsError({errmsg!r})")
+        w(f"path{pc} = parser.current_path")
+        create_missing = self.rwmode == "read"
+        w(
+            f"datadic, parser.current_path = open_section({node}, datadic, "
+            f"loop_vars, {create_missing}, path=path{pc})"
+        )
+        w("parser.datadic = datadic")
+        self.sections.append(pc)
+
+    def emit_section_close(self, pc):
+        w = self.w
+        open_pc = self.sections.pop()
+        w("finalize_abbreviations(datadic, loop_vars)")
+        w(f"datadic = close_section(c{open_pc}, datadic, loop_vars)")
+        w("parser.datadic = datadic")
+        w(f"parser.current_path = path{open_pc}")
+
+    def emit_record(self, pc, spec):
+        w = self.w
+        spec_name = self.const(f"c{pc}", f"instructions[{pc}][1]")
+        record_type = spec.record_type
+        if record_type not in inline_record_types:
+            w(f"{delegated_record_methods[record_type]}({spec_name})")
+            return
+        if self.rwmode == "read":
+            self.emit_read_record(pc, spec, spec_name)
+        else:
+            self.emit_write_record(pc, spec, spec_name)
+
+    def emit_read_record(self, pc, spec, spec_name):
+        w = self.w
+        record_type = spec.record_type
+        read_fun = "read_dir" if record_type == "DIR" else "read_cont"
+        read_fun = "read_list" if record_type == "LIST" else read_fun
+        w("ofs = skip_blank_lines(lines, parser.ofs)")
+        w("loop_vars['__ofs'] = ofs")
+        if record_type != "DIR":
+            w(f'write_info("Reading a {record_type} record", ofs)')
+        w(f"logbuffer.log_record(ofs, lines[ofs], {spec_name}.record_str)")
+        with_ctrl = ", with_ctrl=True" if record_type == "HEAD" else ""
+        w(f"rec, parser.ofs = {read_fun}(lines, ofs{with_ctrl}, **read_opts)")
+        w('rec["__record_log"] = logbuffer.get_last_record_log()')
+        if record_type == "HEAD":
+            w("if info_enabled():")
+            w('    write_info("Content of the HEAD record: " + str(rec), parser.ofs)')
+        elif record_type == "CONT":
+            w("if info_enabled():")
+            w('    write_info("Content of the CONT record: " + str(rec))')
+        w(f"check_ctrl({spec_name}.ctrl_spec, rec, datadic, 'read')")
+        self.emit_read_fields(pc, spec, spec_name)
+        if record_type == "LIST":
+            self.emit_list_body(pc, spec, spec_name)
+        if record_type == "HEAD":
+            w("datadic.update(get_ctrl(rec))")
+
+    def emit_read_fields(self, pc, spec, spec_name):
+        # the values are assigned directly to the variables if all
+        # fields contain numbers or variables without index and the
+        # values are consistent with the numbers and the variables
+        # not yet defined, otherwise the generic mapping function is used
+        w = self.w
+        fields = spec.fields
+        generic_call = (
+            f"map_record_fields({spec_name}.fields, rec, datadic, "
+            "loop_vars, 'read', parse_opts)"
+        )
+        varnames = [f.varname for f in fields if f.varname is not None]
+        is_plain = len(varnames) == len(set(varnames)) and all(
+            (f.is_const and f.value.__class__ in (int, float))
+            or (f.varname is not None and f.indices == () and self.is_bindable(f))
+            for f in fields
+        )
+        if not is_plain:
+            w(generic_call)
+            return
+        conds = [f"rec[{f.key!r}] == {f.value!r}" for f in fields if f.is_const]
+        conds += [f"{v!r} not in datadic" for v in varnames]
+        if len(conds) == 0:
+            return
+        w(f"if {' and '.join(conds)}:")
+        w.indent()
+        for f in fields:
+            if not f.is_const:
+                w(f"datadic[{f.varname!r}] = rec[{f.key!r}]")
+        if len(varnames) > 0:
+            w(f"log_record_variables({tuple(varnames)!r}, datadic)")
+        else:
+            w("pass")
+        w.dedent()
+        w("else:")
+        w(f"    {generic_call}")
+
+    def is_bindable(self, field):
+        varname = field.varname
+        return (
+            varname not in self.loop_varnames
+            and varname not in self.abbrev_varnames
+            and all(idx.__class__ is int or idx in self.scope for idx in field.indices)
+        )
+
+    def emit_list_body(self, pc, spec, spec_name):
+        w = self.w
+        rwmode = self.rwmode
+        if rwmode == "read":
+            w("vals = rec['vals']")
+            w("numvals = len(vals)")
+        else:
+            w("vals = rec['vals'] = []")
+        w("vi = 0")
+        dicname = "datadic"
+        if spec.table_name is not None:
+            dicname = "ldic"
+            w(
+                f"ldic, lpath = open_section({spec_name}.table_name, datadic, "
+                f"loop_vars, {rwmode == 'read'}, path=EndfPath(''))"
+            )
+        w("try:")
+        w.indent()
+        if len(spec.list_body) == 0:
+            w("pass")
+        self.emit_list_items(spec.list_body, f"{spec_name}.list_body", dicname)
+        w.dedent()
+        w("except VariableNotFoundError as exc:")
+        lpath = "lpath" if spec.table_name is not None else "EndfPath('')"
+        w(f"    exc.varname = str({lpath} + exc.varname)")
+        w("    raise exc")
+        if spec.table_name is not None:
+            w(f"close_section({spec_name}.table_name, ldic, loop_vars)")
+        if rwmode == "read":
+            w("if vi < numvals:")
+            w(
+                "    raise UnconsumedListElementsError("
+                "create_unconsumed_list_error_msg(vi, numvals))"
+            )
+
+    def emit_list_items(self, items, items_expr, dicname):
+        w = self.w
+        for i, item in enumerate(items):
+            item_name = self.const(
+                items_expr.replace(".", "_").replace("[", "_").replace("]", "")
+                + f"_{i}",
+                f"{items_expr}[{i}]",
+            )
+            if item.__class__ is RecordField:
+                if self.rwmode == "read":
+                    w("if vi >= numvals:")
+                    w(
+                        "    raise MoreListElementsExpectedError("
+                        "create_list_exhausted_error_msg(numvals))"
+                    )
+                    self.emit_read_value(item, item_name, dicname)
+                else:
+                    self.emit_write_value(item, item_name, dicname)
+                w("vi += 1")
+            elif item.__class__ is ListLoopSpec:
+                self.emit_list_loop(item, item_name, dicname)
+            else:
+                w("npad = (6 - vi % 6) % 6")
+                if self.rwmode != "read":
+                    w("vals.extend([0.0] * npad)")
+                w("vi += npad")
+
+    def emit_list_loop(self, item, item_name, dicname):
+        w = self.w
+        varname = item.varname
+        suffix = item_name[1:]
+        lo, hi, var = f"lo{suffix}", f"hi{suffix}", f"i{suffix}"
+        w(
+            f"{lo}, {hi} = get_loop_bounds({varname!r}, {item_name}.start, "
+            f"{item_name}.stop, {dicname}, loop_vars)"
+        )
+        head = f"{item_name}.head_str"
+        self.emit_loop_info("Enter", "list_loop", head, lo, hi)
+        bulk = item.bulk_fields is not None
+        if bulk:
+            w(
+                f"nvi = map_list_loop_bulk({item_name}, {lo}, {hi}, vals, vi, "
+                f"{dicname}, loop_vars, {self.rwmode!r})"
+            )
+            w("if nvi is not None:")
+            w("    vi = nvi")
+            w("else:")
+            w.indent()
+        w(f"for {var} in range({lo}, {hi} + 1):")
+        w.indent()
+        w(f"loop_vars[{varname!r}] = {var}")
+        outer_var = self.scope.get(varname)
+        self.scope[varname] = var
+        self.emit_list_items(item.body, f"{item_name}.body", dicname)
+        self.restore_scope(varname, outer_var)
+        w.dedent()
+        w(f"if {lo} <= {hi}:")
+        w(f"    del loop_vars[{varname!r}]")
+        if bulk:
+            w.dedent()
+        self.emit_loop_info("Leave", "list_loop", head, lo, hi)
+
+    def emit_read_value(self, item, item_name, dicname):
+        w = self.w
+        generic_call = (
+            f"map_record_fields(({item_name},), {{'val': vals[vi]}}, "
+            f"{dicname}, loop_vars, 'read', parse_opts)"
+        )
+        if item.varname is None or not self.is_bindable(item):
+            w(generic_call)
+            return
+        varname = repr(item.varname)
+        indices = [
+            self.scope[idx] if idx.__class__ is str else repr(idx)
+            for idx in item.indices
+        ]
+        if len(indices) == 0:
+            w(f"if {varname} not in {dicname}:")
+            w(f"    {dicname}[{varname}] = vals[vi]")
+            w(f"    log_record_variables(({varname},), {dicname})")
+            w("else:")
+            w(f"    {generic_call}")
+            return
+        # descend into the nested dictionaries of the array and
+        # create the missing ones before the value is assigned
+        w(f"a0 = {dicname}.get({varname})")
+        w("if a0 is None:")
+        w(f"    a0 = {dicname}[{varname}] = {{}}")
+        levels = 0
+        for level, idx in enumerate(indices[:-1]):
+            w(f"if a{level}.__class__ is dict:")
+            w.indent()
+            w(f"a{level+1} = a{level}.get({idx})")
+            w(f"if a{level+1} is None:")
+            w(f"    a{level+1} = a{level}[{idx}] = {{}}")
+            levels += 1
+        last = f"a{len(indices)-1}"
+        w(f"if {last}.__class__ is dict and {indices[-1]} not in {last}:")
+        w(f"    {last}[{indices[-1]}] = vals[vi]")
+        w("    if len(a0) <= 1:")
+        w(f"        log_record_variables(({varname},), {dicname})")
+        w("else:")
+        w(f"    {generic_call}")
+        for _ in range(levels):
+            w.dedent()
+            w("else:")
+            w(f"    {generic_call}")
+
+    def emit_write_record(self, pc, spec, spec_name):
+        w = self.w
+        record_type = spec.record_type
+        w(f"logbuffer.log_reduced_record({spec_name}.record_str)")
+        w(f"check_ctrl({spec_name}.ctrl_spec, None, datadic, 'write', loop_vars)")
+        w("rec = {}")
+        for j, field in enumerate(spec.fields):
+            value = self.get_write_value(field, f"{spec_name}.fields[{j}]", "datadic")
+            w(f"rec[{field.key!r}] = {value}")
+        if record_type == "LIST":
+            self.emit_list_body(pc, spec, spec_name)
+        w("rec.update(get_ctrl(find_scope('MAT', datadic, loop_vars)))")
+        write_fun = "write_dir" if record_type == "DIR" else "write_cont"
+        write_fun = "write_list" if record_type == "LIST" else write_fun
+        w(f"lines += {write_fun}(rec, with_ctrl=True, **write_opts)")
+
+    def get_write_value(self, field, field_expr, dicname):
+        if field.is_const and field.value.__class__ in (int, float):
+            return repr(field.value)
+        field_name = self.const(
+            field_expr.replace(".", "_").replace("[", "_").replace("]", ""),
+            field_expr,
+        )
+        return f"get_field_value({field_name}, {dicname}, loop_vars)"
+
+    def emit_write_value(self, item, item_name, dicname):
+        if item.is_const and item.value.__class__ in (int, float):
+            value = repr(item.value)
+        else:
+            value = f"get_field_value({item_name}, {dicname}, loop_vars)"
+        self.w(f"vals.append({value})")
+
+
+def generate_recipe_source(program):
+    """Generate the source code of a Python module for a recipe program.
+
+    The module contains a function ``bind(program, runtime)``, which
+    returns a tuple with a function to read an MF/MT section and
+    another one to write it. Both functions take an
+    :class:`~endf_parserpy.EndfParser` instance as argument
+    and are equivalent to its :func:`~endf_parserpy.EndfParser.run_program`
+    method, but the loops of the recipe are translated into Python loops,
+    the if clauses into Python if statements and the values of the
+    records are assigned directly to the variables whenever possible.
+    Lookaheads are performed by the ``run_program`` method.
+
+    Parameters
+    ----------
+    program : RecipeProgram
+        The program compiled from a recipe with
+        :func:`~endf_parserpy.endf_recipe_program.compile_recipe_program`.
+
+    Returns
+    -------
+    str
+        The source code of the module.
+    """
+    generator = _RecipeCodeGenerator(program)
+    read_lines = generator.generate("read")
+    write_lines = generator.generate("write")
+    lines = [
+        "# Module generated by endf_parserpy from an ENDF-6 recipe, do not edit.",
+        "",
+        "",
+        "def bind(program, runtime):",
+        "    instructions = program.instructions",
+    ]
+    lines += [f"    {name} = runtime[{name!r}]" for name in runtime]
+    lines += [f"    {name} = {expr}" for name, expr in generator.consts.items()]
+    lines.append("")
+    lines += read_lines
+    lines.append("")
+    lines += write_lines
+    lines.append("")
+    lines.append("    return read_section, write_section")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def get_codegen_cache_filename(source):
+    source_hash = md5(source.encode()).hexdigest()
+    return f"recipe_code_{source_hash}_v{RECIPE_CODEGEN_FORMAT_VERSION}.py"
+
+
+def _write_source(source, filepath):
+    # write to a temporary file first so that other processes
+    # never import a partially written module
+    tmppath = filepath + f".{os.getpid()}.{get_ident()}.tmp"
+    try:
+        with open(tmppath, "w") as fw:
+            fw.write(source)
+        os.replace(tmppath, filepath)
+    finally:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+
+def load_recipe_module(source, cache_dir=False):
+    """Load a module generated by :func:`generate_recipe_source`.
+
+    If `cache_dir` is ``False``, the source code is compiled in memory.
+    Otherwise, the module is stored in the ``codegen`` subdirectory of
+    `cache_dir` under a name derived from the hash of the source code
+    and imported from there so that the bytecode compiled by Python
+    is cached as well.
+    """
+    if cache_dir is False:
+        namespace = {}
+        exec(compile(source, "<endf recipe code>", "exec"), namespace)
+        return namespace
+    codegen_dir = os.path.join(cache_dir, "codegen")
+    filename = get_codegen_cache_filename(source)
+    filepath = os.path.join(codegen_dir, filename)
+    try:
+        with open(filepath, "r") as fr:
+            is_cached = fr.read() == source
+    except FileNotFoundError:
+        is_cached = False
+    if not is_cached:
+        os.makedirs(codegen_dir, exist_ok=True)
+        _write_source(source, filepath)
+        # the bytecode is written explicitly as the automatic
+        # creation of bytecode files may be disabled
+        py_compile.compile(filepath, doraise=True)
+    module_name = "endf_parserpy_" + filename[:-3]
+    spec = importlib.util.spec_from_file_location(module_name, filepath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return vars(module)
+
+
+def compile_recipe_functions(program, cache_dir=False):
+    """Generate the functions to read and write an MF/MT section.
+
+    Parameters
+    ----------
+    program : RecipeProgram
+        The program compiled from a recipe.
+    cache_dir : Union[bool, str]
+        Directory to cache the generated modules, see :func:`load_recipe_module`.
+
+    Returns
+    -------
+    tuple
+        The functions ``read_section(parser)`` and ``write_section(parser)``,
+        see :func:`generate_recipe_source`.
+    """
+    source = generate_recipe_source(program)
+    namespace = load_recipe_module(source, cache_dir)
+    return namespace["bind"](program, runtime)
@@ -0,0 +1,265 @@
+############################################################
+#
+# Author(s):       Georg Schnabel
+# Email:           g.schnabel@iaea.org
+# Creation date:   2026/10/16
+# Last modified:   2026/10/17
+# License:         MIT
+# Copyright (c) 2026 International Atomic Energy Agency (IAEA)
+#
+############################################################
+
+from .tree_utils import (
+    is_tree,
+    get_name,
+    get_child,
+    get_child_value,
+    reconstruct_tree_str,
+)
+from .endf_mapping_utils import get_varname
+from .endf_mapping_core import RecordField
+from .endf_mappings import compile_record
+from .endf_recipe_analysis import analyze_recipe
+
+
+# operation codes of the instructions
+RECORD = 0
+FOR_START = 1
+FOR_NEXT = 2
+IF = 3
+JUMP = 4
+SECTION_OPEN = 5
+SECTION_CLOSE = 6
+ABBREVIATION = 7
+
+record_nodes = (
+    "head_or_cont_line",
+    "text_line",
+    "dir_line",
+    "intg_line",
+    "tab1_line",
+    "tab2_line",
+    "list_line",
+    "send_line",
+    "stop_line",
+)
+
+
+class RecipeProgram:
+    """Linear instruction program compiled from an ENDF-6 recipe.
+
+    The parse tree of a recipe is translated by
+    :func:`compile_recipe_program` into a flat list of instructions,
+    which is executed by the :func:`~endf_parserpy.EndfParser.run_program`
+    method of the parser both for reading and writing. Each instruction
+    is a tuple with an operation code as first element followed by
+    the operands:
+
+    ``(RECORD, spec)``
+        Read or write a record, ``spec`` is a
+        :class:`~endf_parserpy.endf_mappings.RecordSpec` object.
+    ``(FOR_START, varname, start_field, stop_field, head_str, exit_pc)``
+        Determine the range of the loop counter ``varname`` from the
+        loop bounds given as :class:`~endf_parserpy.endf_mapping_core.RecordField`
+        objects and continue at ``exit_pc`` if the loop body is not executed.
+    ``(FOR_NEXT, varname, body_pc, head_str)``
+        Increment the loop counter and continue at ``body_pc``
+        as long as the counter does not exceed the upper bound.
+    ``(IF, if_clause_node, bodies, end_pc)``
+        Evaluate the conditions of an if clause and continue at the
+        first instruction of the selected body, or at ``end_pc`` if
+        no body is selected. ``bodies`` maps the nodes of the bodies
+        (``if_body``) to tuples ``(start_pc, stop_pc)`` delimiting
+        the instructions of the body, which are executed separately
+        for a lookahead.
+    ``(JUMP, pc)``
+        Continue at instruction ``pc``.
+    ``(SECTION_OPEN, section_head, head_str, errmsg)``
+        Enter a section. If ``errmsg`` is not ``None``, the
+        names in the head and tail of the section do not match.
+    ``(SECTION_CLOSE, section_head)``
+        Leave the section.
+    ``(ABBREVIATION, abbreviation_node)``
+        Introduce an abbreviation.
+
+    The strings ``head_str`` are the specifications in the recipe
+    used in the logs.
+
+    The attribute ``header_peeks`` maps the nodes of the ``if`` and
+    ``elif`` statements whose lookahead condition can be decided
+    from the header of the next record to :class:`HeaderPeek` objects.
+    """
+
+    def __init__(self):
+        self.instructions = []
+        self.header_peeks = {}
+
+
+class HeaderPeek:
+    """Fields in the header of a record needed to decide a lookahead.
+
+    If all variables in the condition of an ``if`` or ``elif`` statement
+    with a lookahead option that are not known beforehand appear as plain
+    variables in the header line of the first record of the body, the
+    condition can be evaluated by decoding only these fields instead of
+    executing the body. ``ctrl_spec`` is the specification of the
+    control fields of the record and ``fields`` contains the
+    :class:`~endf_parserpy.endf_mapping_core.RecordField` objects
+    of the fields with variables in the condition.
+    """
+
+    __slots__ = ("ctrl_spec", "fields", "keys")
+
+    def __init__(self, ctrl_spec, fields):
+        self.ctrl_spec = ctrl_spec
+        self.fields = fields
+        self.keys = tuple(field.key for field in fields)
+
+
+# records whose header line has the layout of a CONT record
+peek_record_nodes = ("head_or_cont_line", "list_line", "tab1_line", "tab2_line")
+
+
+def compile_header_peek(lookahead_info):
+    """Prepare the peek at the header for a statement with a lookahead option.
+
+    `lookahead_info` is the entry of the statement in the ``lookaheads``
+    attribute of a :class:`~endf_parserpy.endf_recipe_analysis.RecipeAnalysis`
+    object. Returns a :class:`HeaderPeek` object or ``None`` if the
+    body of the statement needs to be executed to decide the condition.
+    """
+    first_record = lookahead_info["first_record"]
+    if (
+        lookahead_info["peek_fields"] is None
+        or first_record is None
+        or first_record.data not in peek_record_nodes
+    ):
+        return None
+    # the first record must be read during the lookahead
+    lookahead = RecordField(None, lookahead_info["lookahead"])
+    if not lookahead.is_const or lookahead.value < 1:
+        return None
+    spec = compile_record(first_record)
+    condition_vars = frozenset(lookahead_info["condition_vars"])
+    # the variables known beforehand are included because a
+    # record binds them in the current section if they are
+    # only present in an enclosing one
+    fields = tuple(
+        field
+        for field in spec.fields
+        if field.varname is not None and field.variables <= condition_vars
+    )
+    return HeaderPeek(spec.ctrl_spec, fields)
+
+
+def _emit(node, instructions):
+    name = get_name(node)
+    if name in record_nodes:
+        instructions.append((RECORD, compile_record(node)))
+    elif name == "for_loop":
+        _emit_for_loop(node, instructions)
+    elif name == "if_clause":
+        _emit_if_clause(node, instructions)
+    elif name == "section":
+        _emit_section(node, instructions)
+    elif name == "abbreviation":
+        instructions.append((ABBREVIATION, node))
+    elif name == "comment_block":
+        # the variable descriptions in comments are extracted
+        # from the recipe once, see EndfParser.explain
+        pass
+    else:
+        for child in node.children:
+            if is_tree(child):
+                _emit(child, instructions)
+
+
+def _emit_for_loop(node, instructions):
+    for_head = get_child(node, "for_head")
+    varname = get_child_value(for_head, "VARNAME")
+    start_field = RecordField(None, get_child(for_head, "for_start"))
+    stop_field = RecordField(None, get_child(for_head, "for_stop"))
+    head_str = reconstruct_tree_str(for_head)
+    start_pc = len(instructions)
+    instructions.append(None)
+    _emit(get_child(node, "for_body"), instructions)
+    instructions.append((FOR_NEXT, varname, start_pc + 1, head_str))
+    exit_pc = len(instructions)
+    instructions[start_pc] = (
+        FOR_START,
+        varname,
+        start_field,
+        stop_field,
+        head_str,
+        exit_pc,
+    )
+
+
+def _emit_if_clause(node, instructions):
+    if_pc = len(instructions)
+    instructions.append(None)
+    bodies = {}
+    jump_pcs = []
+    for statement in node.children:
+        if get_name(statement) not in (
+            "if_statement",
+            "elif_statement",
+            "else_statement",
+        ):
+            continue
+        if_body = get_child(statement, "if_body")
+        start_pc = len(instructions)
+        _emit(if_body, instructions)
+        bodies[if_body] = (start_pc, len(instructions))
+        jump_pcs.append(len(instructions))
+        instructions.append(None)
+    end_pc = len(instructions)
+    for jump_pc in jump_pcs:
+        instructions[jump_pc] = (JUMP, end_pc)
+    instructions[if_pc] = (IF, node, bodies, end_pc)
+
+
+def _emit_section(node, instructions):
+    section_head = get_child(node, "section_head")
+    section_tail = get_child(node, "section_tail")
+    varname = get_varname(section_head)
+    varname2 = get_varname(section_tail)
+    errmsg = None
+    if varname != varname2:
+        errmsg = (
+            "The section name in the tail does not correspond to "
+            + f"the one in the head (`{varname}` vs `{varname2}`)"
+        )
+    head_str = reconstruct_tree_str(section_head)
+    instructions.append((SECTION_OPEN, section_head, head_str, errmsg))
+    _emit(get_child(node, "section_body"), instructions)
+    instructions.append((SECTION_CLOSE, section_head))
+
+
+def compile_recipe_program(tree, analysis=None):
+    """Compile the parse tree of a recipe into an instruction program.
+
+    Parameters
+    ----------
+    tree : RecipeNode
+        The parse tree of an ENDF-6 recipe.
+    analysis : RecipeAnalysis
+        The analysis of the recipe as returned by
+        :func:`~endf_parserpy.endf_recipe_analysis.analyze_recipe`.
+        It is created if not provided.
+
+    Returns
+    -------
+    RecipeProgram
+        The program with the instructions to read or write
+        an MF/MT section according to the recipe.
+    """
+    program = RecipeProgram()
+    _emit(tree, program.instructions)
+    if analysis is None:
+        analysis = analyze_recipe(tree)
+    for statement, lookahead_info in analysis.lookaheads.items():
+        header_peek = compile_header_peek(lookahead_info)
+        if header_peek is not None:
+            program.header_peeks[statement] = header_peek
+    return program
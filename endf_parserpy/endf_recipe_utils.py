@@ -1,60 +1,907 @@
-from lark import Lark
-from .endf_lark import endf_recipe_grammar
-from .tree_utils import is_tree
+from .endf_lark import (
+    endf_recipe_grammar,
+    endf_recipe_grammar_lalr,
+    endf_record_start_rules,
+)
+from .tree_utils import (
+    compact_tree,
+    is_tree,
+    get_child,
+    get_child_value,
+    get_name,
+)
+from .endf_mapping_utils import get_varname, get_indexquants
+from .endf_recipe_analysis import analyze_recipe, RecipeAnalysis
+from .endf_recipe_program import compile_recipe_program
+from .accessories import EndfPath
+from contextlib import contextmanager
 from hashlib import md5
+from threading import RLock, get_ident
+import gc
 import os
 import pickle
+import re
+import time
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(fh):
+        fh.seek(0)
+        while True:
+            try:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass
+
+    def _unlock_file(fh):
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock_file(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+# process-wide registry of compiled recipes shared by all
+# EndfParser instances. The parse tree of a recipe only depends
+# on the recipe grammar and the recipe text, hence it is keyed by
+# (grammar_hash, recipe_hash). The recipe parsers are keyed by
+# (grammar_hash, compiler) as both compilers yield the same parse trees.
+_recipe_parsers = {}
+_recipe_registry = {}
+_recipe_hashes = {}
+_registry_lock = RLock()
+
+# descriptions of the variables in the recipes, the results
+# of the static analysis of the recipes (see endf_recipe_analysis),
+# the instruction programs (see endf_recipe_program) and the
+# generated functions to read and write sections (see endf_recipe_codegen),
+# keyed in the same way as the compiled recipes
+_recipe_descriptions = {}
+_recipe_analyses = {}
+_recipe_programs = {}
+_recipe_functions = {}
+
+# version of the representation of compiled recipes in the cache,
+# to be increased whenever the structure of compiled recipes changes
+RECIPE_CACHE_FORMAT_VERSION = 4
+
+# version of the modules generated by endf_recipe_codegen in the
+# `codegen` subdirectory of the cache, to be increased whenever the
+# code generator changes so that the outdated modules become stale
+RECIPE_CODEGEN_FORMAT_VERSION = 1
+
+# single-file bundle with the precompiled default recipes,
+# created with `create_recipe_bundle` when the package is built
+RECIPE_BUNDLE_FORMAT_VERSION = 6
+default_recipe_bundle_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "endf_recipes_bundle.pkl"
+)
+_recipe_bundle = None
+_recipe_bundle_loaded = False
+
+# directory with the source files of the default recipes and
+# their hash, which is stored in a bundle when it is created, so that
+# a bundle created from other recipes can be recognized without
+# reading the source files. The hash needs to be updated whenever
+# one of the default recipes is modified, see `get_recipe_sources_hash`
+default_recipe_sources_dir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "endf_recipes"
+)
+DEFAULT_RECIPE_SOURCES_HASH = "dce7de84ce06370d7927e5daa31a43e8"
+
+# compilers available for the default recipe grammar. The LALR
+# compiler falls back to the Earley compiler for recipes it cannot parse.
+RECIPE_COMPILERS = ("lalr", "earley")
+default_recipe_compiler = "lalr"
+
+
+def get_default_cache_dir():
+    from appdirs import user_cache_dir
+
+    return user_cache_dir("endf_parserpy", "gschnabel")
 
 
 def get_string_hash(inpstr):
     return md5(inpstr.encode()).hexdigest()
 
 
-def get_recipe_parser(recipe_grammar):
+def get_recipe_hash(recipe):
+    recipe_hash = _recipe_hashes.get(recipe, None)
+    if recipe_hash is None:
+        recipe_hash = get_string_hash(recipe)
+        _recipe_hashes[recipe] = recipe_hash
+    return recipe_hash
+
+
+class LalrRecipeParser:
+    """Parser for ENDF-6 recipes based on the LALR version of the recipe grammar.
+
+    Record lines are matched as a whole in the first pass and
+    parsed with the start rule of the respective record type afterwards.
+    The resulting parse trees are identical to those obtained with the
+    Earley parser. Recipes that cannot be parsed with the LALR grammar
+    are handed over to the Earley parser.
+    """
+
+    # lark is only imported in this module if recipes need to be
+    # compiled, so that precompiled recipes can be used without it
+
+    _record_type_regex = re.compile(r"\] *([A-Z0-9]+) *(?:\([^()]*\))?$")
+
+    def __init__(self):
+        from lark import Lark
+
+        start_rules = set(endf_record_start_rules.values())
+        self.lalr_parser = Lark(
+            endf_recipe_grammar_lalr,
+            parser="lalr",
+            start=["endf_recipe"] + sorted(start_rules),
+            keep_all_tokens=True,
+        )
+
+    @property
+    def earley_parser(self):
+        return get_registered_recipe_parser(endf_recipe_grammar, "earley")
+
+    def parse(self, recipe):
+        from lark.exceptions import LarkError
+
+        try:
+            return self.parse_lalr(recipe)
+        except LarkError:
+            return self.earley_parser.parse(recipe)
+
+    def parse_lalr(self, recipe):
+        tree = self.lalr_parser.parse(recipe, start="endf_recipe")
+        self._expand_tree(tree)
+        return tree
+
+    def _parse_record_line(self, token):
+        from lark.exceptions import LarkError
+
+        match = self._record_type_regex.search(token.value)
+        start = None if match is None else endf_record_start_rules.get(match[1])
+        if start is None:
+            raise LarkError(f"unknown record type in `{token.value}`")
+        return self.lalr_parser.parse(token.value, start=start)
+
+    def _expand_tree(self, tree):
+        from lark import Token
+
+        children = tree.children
+        for i, child in enumerate(children):
+            if type(child) is not Token:
+                self._expand_tree(child)
+            elif child.type == "RECORD_LINE":
+                children[i] = self._parse_record_line(child)
+            elif child.type == "LOOKAHEAD_BRACKET":
+                # name given by Lark to the "[" token of the original grammar
+                children[i] = Token("LSQB", child.value)
+
+
+def check_recipe_compiler(compiler):
+    if compiler not in RECIPE_COMPILERS:
+        raise ValueError(
+            f"unknown recipe compiler `{compiler}`, "
+            f"available are: {', '.join(RECIPE_COMPILERS)}"
+        )
+
+
+def get_recipe_parser(recipe_grammar, compiler=None):
+    """Create a parser for ENDF-6 recipes.
+
+    The `compiler` can be ``"lalr"`` or ``"earley"``, and the
+    ``default_recipe_compiler`` is used if it is ``None``.
+    An LALR version only exists for the default recipe grammar,
+    hence the Earley parser is returned for other grammars.
+    """
+    compiler = default_recipe_compiler if compiler is None else compiler
+    check_recipe_compiler(compiler)
+    if compiler == "lalr" and recipe_grammar == endf_recipe_grammar:
+        return LalrRecipeParser()
+    from lark import Lark
+
     return Lark(recipe_grammar, start="endf_recipe", keep_all_tokens=True)
 
 
-def get_recipe_parsetree(recipe, recipe_parser, grammar_hash, cache_dir):
+def get_registered_recipe_parser(recipe_grammar, compiler=None):
+    compiler = default_recipe_compiler if compiler is None else compiler
+    key = (get_recipe_hash(recipe_grammar), compiler)
+    with _registry_lock:
+        recipe_parser = _recipe_parsers.get(key, None)
+        if recipe_parser is None:
+            recipe_parser = get_recipe_parser(recipe_grammar, compiler)
+            _recipe_parsers[key] = recipe_parser
+    return recipe_parser
+
+
+def compile_recipe(recipe, recipe_parser):
+    return compact_tree(recipe_parser.parse(recipe))
+
+
+def load_pickle(content):
+    # the cyclic garbage collector is paused while the many
+    # small objects of the compiled recipes are created
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(content)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _parse_comment_line(comment_line):
+    rex = r" *#(?P<indentstr>( *var *"
+    rex += r"(?P<varname>[a-zA-Z0-9/*]+) *(\[[^]]*\])?"
+    rex += " *:)?)?"
+    rex += "(?P<comment>.*)"
+    dic = re.match(rex, comment_line).groupdict()
+    return dic["varname"], dic["comment"], len(dic["indentstr"])
+
+
+def _extract_comment_descriptions(comment_lines):
+    idx = 0
+    while idx < len(comment_lines):
+        comment_line = comment_lines[idx]
+        varname, comment, indent = _parse_comment_line(comment_line)
+        if varname is not None:
+            if comment.strip() != "":
+                firstindent = indent + len(comment) - len(comment.lstrip())
+                curdescr = [comment.lstrip()]
+            else:
+                idx += 1
+                comment_line = comment_lines[idx]
+                tmp, comment, indent = _parse_comment_line(comment_line)
+                if tmp is not None:
+                    raise ValueError(f"empty explaination of {varname}")
+                firstindent = len(comment) - len(comment.lstrip())
+                curdescr = [comment[firstindent:]]
+            idx += 1
+            while idx < len(comment_lines):
+                comment_line = comment_lines[idx]
+                newvarname, comment, _ = _parse_comment_line(comment_line)
+                if newvarname is not None:
+                    idx -= 1
+                    break
+                curindent = len(comment) - len(comment.lstrip())
+                maxindent = min(firstindent, curindent)
+                curdescr.append(comment[maxindent:])
+                idx += 1
+            yield varname, "\n".join(curdescr).strip()
+        idx += 1
+
+
+def extract_variable_descriptions(tree):
+    """Extract the descriptions of variables from the comments in a recipe.
+
+    Returns a nested ``dict`` with the descriptions stored at the
+    locations of the variables relative to the MF/MT section.
+    Indices of sections are represented by the ``*`` wildcard.
+    """
+    descriptions = {}
+
+    def recfun(node, path):
+        for child in node.subtrees:
+            name = get_name(child)
+            if name == "comment_block":
+                comment_lines = get_child_value(child, "COMMENT").splitlines()
+                for varname, descr in _extract_comment_descriptions(comment_lines):
+                    (EndfPath(path) + varname).set(descriptions, descr)
+            elif name == "section":
+                section_head = get_child(child, "section_head")
+                indexquants = get_indexquants(section_head) or ()
+                subpath = path + (get_varname(section_head),)
+                for idxquant in indexquants:
+                    is_num = get_name(idxquant) == "INDEXNUM"
+                    subpath += (idxquant.value if is_num else "*",)
+                recfun(get_child(child, "section_body"), subpath)
+            else:
+                recfun(child, path)
+
+    recfun(tree, ())
+    return descriptions
+
+
+def write_pickle(obj, filepath):
+    # the content is written to a temporary file first and renamed
+    # afterwards so that other processes never see partial files
+    tmppath = filepath + f".{os.getpid()}.{get_ident()}.tmp"
+    try:
+        with open(tmppath, "wb") as fw:
+            pickle.dump(obj, fw, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, filepath)
+    finally:
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+
+@contextmanager
+def locked_file(lockpath):
+    """Hold an exclusive lock on a lock file shared among processes."""
+    with open(lockpath, "a+b") as fh:
+        _lock_file(fh)
+        try:
+            yield
+        finally:
+            _unlock_file(fh)
+
+
+def get_recipe_cache_filename(grammar_hash, recipe_hash):
+    return f"recipe_{grammar_hash}_{recipe_hash}_v{RECIPE_CACHE_FORMAT_VERSION}.pkl"
+
+
+def load_cached_recipe(filepath):
+    """Load a compiled recipe from the cache directory.
+
+    Returns a ``dict`` with the parse tree (``tree``) and the
+    analysis (``analysis``) of the recipe or ``None`` if the
+    file does not exist or does not contain a valid compiled recipe.
+    """
+    try:
+        with open(filepath, "rb") as fr:
+            content = fr.read()
+    except FileNotFoundError:
+        return None
+    try:
+        cache_entry = load_pickle(content)
+    except Exception:
+        return None
+    if (
+        not isinstance(cache_entry, dict)
+        or not is_tree(cache_entry.get("tree", None))
+        or not isinstance(cache_entry.get("analysis", None), RecipeAnalysis)
+    ):
+        return None
+    return cache_entry
+
+
+def compile_and_analyze_recipe(recipe, recipe_grammar, compiler=None):
+    recipe_parser = get_registered_recipe_parser(recipe_grammar, compiler)
+    recipe_parsetree = compile_recipe(recipe, recipe_parser)
+    return {"tree": recipe_parsetree, "analysis": analyze_recipe(recipe_parsetree)}
+
+
+def get_recipe_parsetree(
+    recipe, recipe_grammar, cache_dir, compiler=None, with_analysis=False
+):
+    """Compile a recipe or load it from the cache directory.
+
+    The compilation of a recipe for the cache directory is guarded by
+    a file lock so that it only takes place in one process even if
+    several processes request the same recipe at the same time.
+    Corrupted cache entries are compiled anew and replaced.
+    The analysis of the recipe (see :func:`analyze_recipe`) is stored
+    along with the parse tree in the cache directory.
+    If `with_analysis` is ``True``, a tuple with the parse tree and
+    the analysis is returned, otherwise only the parse tree.
+    """
     if cache_dir is False:
-        return recipe_parser.parse(recipe)
-    recipe_hash = get_string_hash(recipe)
-    filename = get_string_hash(grammar_hash + recipe_hash) + ".pkl"
-    os.makedirs(cache_dir, exist_ok=True)
-    filepath = os.path.join(cache_dir, filename)
-    if not os.path.exists(filepath):
-        recipe_parsetree = recipe_parser.parse(recipe)
-        with open(filepath, "wb") as fw:
-            pickle.dump(recipe_parsetree, fw)
+        cache_entry = compile_and_analyze_recipe(recipe, recipe_grammar, compiler)
     else:
-        with open(filepath, "rb") as fr:
-            recipe_parsetree = pickle.load(fr)
-    return recipe_parsetree
+        grammar_hash = get_recipe_hash(recipe_grammar)
+        filename = get_recipe_cache_filename(grammar_hash, get_recipe_hash(recipe))
+        filepath = os.path.join(cache_dir, filename)
+        cache_entry = load_cached_recipe(filepath)
+    if cache_entry is None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with locked_file(filepath + ".lock"):
+            # another process may have compiled the recipe in the meantime
+            cache_entry = load_cached_recipe(filepath)
+            if cache_entry is None:
+                cache_entry = compile_and_analyze_recipe(
+                    recipe, recipe_grammar, compiler
+                )
+                write_pickle(cache_entry, filepath)
+    if with_analysis:
+        return cache_entry["tree"], cache_entry["analysis"]
+    return cache_entry["tree"]
 
 
-def get_recipe_parsetree_dic(recipe_dic, cache_dir):
-    recipe_parser = get_recipe_parser(endf_recipe_grammar)
-    grammar_hash = get_string_hash(endf_recipe_grammar)
-    tree_dic = {}
-    for mf in recipe_dic:
-        tree_dic.setdefault(mf, {})
-        if isinstance(recipe_dic[mf], str):
-            tree_dic[mf] = get_recipe_parsetree(
-                recipe_dic[mf], recipe_parser, grammar_hash, cache_dir
+_cache_file_regex = re.compile(
+    r"^recipe_([0-9a-f]{32})_[0-9a-f]{32}_v([0-9]+)\.pkl"
+    r"(\.lock|\.[0-9]+\.[0-9]+\.tmp)?$"
+)
+_legacy_cache_file_regex = re.compile(r"^[0-9a-f]{32}\.pkl$")
+_codegen_file_regex = re.compile(
+    r"^recipe_code_[0-9a-f]{32}(?:_v([0-9]+))?\.py(\.[0-9]+\.[0-9]+\.tmp)?$"
+)
+_codegen_bytecode_regex = re.compile(
+    r"^(recipe_code_[0-9a-f]{32}(?:_v[0-9]+)?)\.[^.]+(?:\.opt-[12])?\.pyc$"
+)
+
+
+def _is_stale_cache_file(filepath, grammar_hashes, tmp_max_age):
+    filename = os.path.basename(filepath)
+    if _legacy_cache_file_regex.match(filename):
+        return True
+    match = _cache_file_regex.match(filename)
+    if match is None:
+        return None
+    grammar_hash, format_version, suffix = match.groups()
+    if (
+        grammar_hash not in grammar_hashes
+        or int(format_version) != RECIPE_CACHE_FORMAT_VERSION
+    ):
+        return True
+    # temporary files left behind by interrupted processes
+    if suffix is not None and suffix.endswith(".tmp"):
+        return os.path.getmtime(filepath) < time.time() - tmp_max_age
+    return False
+
+
+def _is_stale_codegen_file(filepath, tmp_max_age):
+    filename = os.path.basename(filepath)
+    match = _codegen_file_regex.match(filename)
+    if match is None:
+        return None
+    format_version, suffix = match.groups()
+    if format_version is None or int(format_version) != RECIPE_CODEGEN_FORMAT_VERSION:
+        return True
+    if suffix is not None:
+        return os.path.getmtime(filepath) < time.time() - tmp_max_age
+    return False
+
+
+def _is_stale_codegen_bytecode_file(filepath, tmp_max_age):
+    # the bytecode is stale along with its module
+    # and if the module does not exist anymore
+    match = _codegen_bytecode_regex.match(os.path.basename(filepath))
+    if match is None:
+        return None
+    codegen_dir = os.path.dirname(os.path.dirname(filepath))
+    module_path = os.path.join(codegen_dir, match.group(1) + ".py")
+    if not os.path.exists(module_path):
+        return True
+    return _is_stale_codegen_file(module_path, tmp_max_age)
+
+
+def _scan_cache_subdir(cache_subdir, is_stale_file, tmp_max_age):
+    if not os.path.isdir(cache_subdir):
+        return
+    for filename in sorted(os.listdir(cache_subdir)):
+        filepath = os.path.join(cache_subdir, filename)
+        try:
+            is_stale = is_stale_file(filepath, tmp_max_age)
+        except FileNotFoundError:
+            continue
+        if is_stale is not None:
+            yield filepath, is_stale
+
+
+def _scan_recipe_cache(cache_dir, recipe_grammars, tmp_max_age=3600):
+    # yield the paths of all files belonging to the recipe cache
+    # along with a flag indicating whether they are stale
+    if recipe_grammars is None:
+        recipe_grammars = (endf_recipe_grammar,)
+    grammar_hashes = set(get_recipe_hash(g) for g in recipe_grammars)
+
+    def is_stale_cache_file(filepath, tmp_max_age):
+        return _is_stale_cache_file(filepath, grammar_hashes, tmp_max_age)
+
+    yield from _scan_cache_subdir(cache_dir, is_stale_cache_file, tmp_max_age)
+    # modules generated by the code generator and their bytecode
+    codegen_dir = os.path.join(cache_dir, "codegen")
+    yield from _scan_cache_subdir(codegen_dir, _is_stale_codegen_file, tmp_max_age)
+    yield from _scan_cache_subdir(
+        os.path.join(codegen_dir, "__pycache__"),
+        _is_stale_codegen_bytecode_file,
+        tmp_max_age,
+    )
+
+
+def get_recipe_cache_info(cache_dir=None, recipe_grammars=None):
+    """Summarize the content of the recipe cache directory.
+
+    Cache entries are stale if they have been created for
+    another recipe grammar than the ones in `recipe_grammars`
+    (by default only the grammar of the ENDF-6 recipes) or
+    another format of the compiled recipes. The modules generated
+    for the ``codegen`` backend in the ``codegen`` subdirectory and
+    their bytecode are stale if they have been created by another
+    version of the code generator. Temporary files left behind by
+    interrupted processes are stale after an hour. The returned ``dict``
+    contains the number of files and their size in bytes,
+    both in total and for stale files only.
+    """
+    cache_dir = get_default_cache_dir() if cache_dir is None else cache_dir
+    info = {
+        "cache_dir": cache_dir,
+        "num_files": 0,
+        "size": 0,
+        "num_stale_files": 0,
+        "stale_size": 0,
+    }
+    for filepath, is_stale in _scan_recipe_cache(cache_dir, recipe_grammars):
+        try:
+            size = os.path.getsize(filepath)
+        except FileNotFoundError:
+            continue
+        info["num_files"] += 1
+        info["size"] += size
+        if is_stale:
+            info["num_stale_files"] += 1
+            info["stale_size"] += size
+    return info
+
+
+def prune_recipe_cache(cache_dir=None, recipe_grammars=None):
+    """Remove stale entries from the recipe cache directory.
+
+    See :func:`get_recipe_cache_info` for the meaning of the
+    arguments and which entries are considered stale.
+    Returns the list of the removed files.
+    """
+    cache_dir = get_default_cache_dir() if cache_dir is None else cache_dir
+    removed_files = []
+    for filepath, is_stale in _scan_recipe_cache(cache_dir, recipe_grammars):
+        if not is_stale:
+            continue
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
+            continue
+        removed_files.append(filepath)
+    return removed_files
+
+
+def get_registered_recipe_parsetree(
+    recipe, cache_dir, recipe_grammar=None, compiler=None
+):
+    """Retrieve the parse tree of a recipe from the process-wide registry.
+
+    If the recipe has not been registered yet, it is loaded from the
+    cache directory or compiled with the given `compiler`, and the
+    result added to the registry.
+    """
+    recipe_grammar = endf_recipe_grammar if recipe_grammar is None else recipe_grammar
+    grammar_hash = get_recipe_hash(recipe_grammar)
+    key = (grammar_hash, get_recipe_hash(recipe))
+    tree = _recipe_registry.get(key, None)
+    if tree is not None:
+        return tree
+    with _registry_lock:
+        # the recipe may be one of the precompiled default recipes
+        # or may have been registered by another thread meanwhile
+        get_default_recipe_bundle()
+        tree = _recipe_registry.get(key, None)
+        if tree is None:
+            tree, analysis = get_recipe_parsetree(
+                recipe, recipe_grammar, cache_dir, compiler, with_analysis=True
             )
-        else:
-            for mt in recipe_dic[mf]:
-                tree_dic[mf][mt] = get_recipe_parsetree(
-                    recipe_dic[mf][mt], recipe_parser, grammar_hash, cache_dir
-                )
-    return tree_dic
+            _recipe_registry[key] = tree
+            _recipe_analyses[key] = analysis
+    return tree
 
 
-def get_responsible_recipe_parsetree(tree_dic, mf, mt):
-    if mf in tree_dic:
-        if is_tree(tree_dic[mf]):
-            return tree_dic[mf]
-        elif mt in tree_dic[mf] and is_tree(tree_dic[mf][mt]):
-            return tree_dic[mf][mt]
-        elif (-1) in tree_dic[mf] and is_tree(tree_dic[mf][-1]):
-            return tree_dic[mf][-1]
+def clear_recipe_registry(recipe_grammar=None):
+    """Remove compiled recipes from the process-wide registry.
+
+    If `recipe_grammar` is ``None``, all compiled recipes and recipe
+    parsers are discarded. Otherwise, only the ones associated with the
+    given recipe grammar. Recipes requested afterwards are loaded from
+    the cache directory or compiled anew.
+    """
+    global _recipe_bundle, _recipe_bundle_loaded
+    with _registry_lock:
+        _recipe_bundle = None
+        _recipe_bundle_loaded = False
+        if recipe_grammar is None:
+            _recipe_parsers.clear()
+            _recipe_registry.clear()
+            _recipe_descriptions.clear()
+            _recipe_analyses.clear()
+            _recipe_programs.clear()
+            _recipe_functions.clear()
+            return
+        grammar_hash = get_recipe_hash(recipe_grammar)
+        registries = (
+            _recipe_parsers,
+            _recipe_registry,
+            _recipe_descriptions,
+            _recipe_analyses,
+            _recipe_programs,
+            _recipe_functions,
+        )
+        for registry in registries:
+            for key in tuple(registry):
+                if key[0] == grammar_hash:
+                    del registry[key]
+
+
+def get_default_recipe_dictionary():
+    from .endf_recipes import endf_recipe_dictionary
+
+    return endf_recipe_dictionary
+
+
+def get_recipe_sources_hash():
+    """Compute the hash of the source files of the default recipes.
+
+    The hash is computed from the files in the `endf_recipes` package
+    without importing them. It must agree with
+    ``DEFAULT_RECIPE_SOURCES_HASH``, which is compared with the hash
+    stored in a recipe bundle when the bundle is loaded.
+    """
+    sources_hash = md5()
+    for filename in sorted(os.listdir(default_recipe_sources_dir)):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(default_recipe_sources_dir, filename), "rb") as fr:
+            content = fr.read().replace(b"\r\n", b"\n")
+        sources_hash.update(filename.encode() + b"\0" + content)
+    return sources_hash.hexdigest()
+
+
+def create_recipe_bundle(filepath=None, recipe_dic=None):
+    """Precompile recipes and store them in a single bundle file.
+
+    This function is invoked during the build of the package
+    to ship the compiled default recipes. The bundle contains the
+    parse trees of all distinct recipes along with an index that
+    mirrors the structure of the recipe dictionary but contains
+    recipe hashes instead of recipes. The descriptions of the
+    variables and the analyses of the recipes are included as well.
+    The hash of the source files of the default recipes is stored
+    to recognize a bundle that is outdated because of changed recipes.
+    """
+    filepath = default_recipe_bundle_path if filepath is None else filepath
+    recipe_dic = get_default_recipe_dictionary() if recipe_dic is None else recipe_dic
+    recipe_parser = get_recipe_parser(endf_recipe_grammar)
+    grammar_hash = get_recipe_hash(endf_recipe_grammar)
+    recipe_index = {}
+    trees = {}
+    descriptions = {}
+    analyses = {}
+    for mf, mf_recipes in recipe_dic.items():
+        if isinstance(mf_recipes, str):
+            mf_recipes = {None: mf_recipes}
+        for mt, recipe in mf_recipes.items():
+            recipe_hash = get_recipe_hash(recipe)
+            if recipe_hash not in trees:
+                tree = compile_recipe(recipe, recipe_parser)
+                trees[recipe_hash] = tree
+                descriptions[recipe_hash] = extract_variable_descriptions(tree)
+                analyses[recipe_hash] = analyze_recipe(tree)
+            if mt is None:
+                recipe_index[mf] = recipe_hash
+            else:
+                recipe_index.setdefault(mf, {})[mt] = recipe_hash
+    bundle = {
+        "format_version": RECIPE_BUNDLE_FORMAT_VERSION,
+        "grammar_hash": grammar_hash,
+        "recipe_sources_hash": get_recipe_sources_hash(),
+        "recipe_index": recipe_index,
+        "trees": trees,
+        "descriptions": descriptions,
+        "analyses": analyses,
+    }
+    write_pickle(bundle, filepath)
+    return filepath
+
+
+def load_recipe_bundle(filepath=None):
+    """Load a recipe bundle and add its recipes to the registry.
+
+    Returns ``None`` if the bundle does not exist or has been
+    created for another bundle format, recipe grammar or version
+    of the default recipes.
+    """
+    filepath = default_recipe_bundle_path if filepath is None else filepath
+    try:
+        with open(filepath, "rb") as fr:
+            content = fr.read()
+        bundle = load_pickle(content)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if (
+        not isinstance(bundle, dict)
+        or bundle.get("format_version", None) != RECIPE_BUNDLE_FORMAT_VERSION
+        or bundle.get("grammar_hash", None) != get_recipe_hash(endf_recipe_grammar)
+        or bundle.get("recipe_sources_hash", None) != DEFAULT_RECIPE_SOURCES_HASH
+    ):
+        return None
+    grammar_hash = bundle["grammar_hash"]
+    with _registry_lock:
+        for recipe_hash, tree in bundle["trees"].items():
+            _recipe_registry.setdefault((grammar_hash, recipe_hash), tree)
+        for recipe_hash, descriptions in bundle["descriptions"].items():
+            _recipe_descriptions.setdefault((grammar_hash, recipe_hash), descriptions)
+        for recipe_hash, analysis in bundle["analyses"].items():
+            _recipe_analyses.setdefault((grammar_hash, recipe_hash), analysis)
+    return bundle
+
+
+def get_default_recipe_bundle():
+    global _recipe_bundle, _recipe_bundle_loaded
+    if not _recipe_bundle_loaded:
+        with _registry_lock:
+            if not _recipe_bundle_loaded:
+                _recipe_bundle = load_recipe_bundle()
+                _recipe_bundle_loaded = True
+    return _recipe_bundle
+
+
+def _lookup_recipe_entry(recipe_dic, mf, mt):
+    if mf in recipe_dic:
+        mf_recipes = recipe_dic[mf]
+        if isinstance(mf_recipes, str):
+            return mf_recipes
+        elif mt in mf_recipes and isinstance(mf_recipes[mt], str):
+            return mf_recipes[mt]
+        elif (-1) in mf_recipes and isinstance(mf_recipes[-1], str):
+            return mf_recipes[-1]
     return None
+
+
+class RecipeTreeDict:
+    """Lazy mapping from MF/MT numbers to recipe parse trees.
+
+    A recipe is only compiled (or loaded from the cache directory)
+    the first time a parse tree for a specific MF/MT combination
+    is requested. Parse trees are retrieved from a process-wide
+    registry so that they are shared between all instances of this
+    class, including the ones of recipes with identical content,
+    such as the MF31 recipe registered for several MT numbers.
+    If `recipe_dic` is ``None``, the default recipes are used and
+    taken from the precompiled recipe bundle if available.
+    The `compiler` determines how recipes are compiled,
+    see :func:`get_recipe_parser`.
+    """
+
+    def __init__(self, recipe_dic, cache_dir, compiler=None):
+        if compiler is not None:
+            check_recipe_compiler(compiler)
+        self._recipe_dic = recipe_dic
+        self.cache_dir = cache_dir
+        self.compiler = compiler
+
+    @property
+    def recipe_dic(self):
+        if self._recipe_dic is None:
+            return get_default_recipe_dictionary()
+        return self._recipe_dic
+
+    def get_recipe(self, mf, mt):
+        return _lookup_recipe_entry(self.recipe_dic, mf, mt)
+
+    def get_tree(self, mf, mt):
+        if self._recipe_dic is None:
+            bundle = get_default_recipe_bundle()
+            if bundle is not None:
+                recipe_hash = _lookup_recipe_entry(bundle["recipe_index"], mf, mt)
+                if recipe_hash is None:
+                    return None
+                key = (bundle["grammar_hash"], recipe_hash)
+                tree = _recipe_registry.get(key, None)
+                if tree is not None:
+                    return tree
+        recipe = self.get_recipe(mf, mt)
+        if recipe is None:
+            return None
+        return get_registered_recipe_parsetree(
+            recipe, self.cache_dir, compiler=self.compiler
+        )
+
+    def get_recipe_hash(self, mf, mt):
+        if self._recipe_dic is None:
+            bundle = get_default_recipe_bundle()
+            if bundle is not None:
+                return _lookup_recipe_entry(bundle["recipe_index"], mf, mt)
+        recipe = self.get_recipe(mf, mt)
+        return None if recipe is None else get_recipe_hash(recipe)
+
+    def get_variable_descriptions(self, mf, mt):
+        """Retrieve the descriptions of the variables in the recipe of an MF/MT section.
+
+        The descriptions are extracted from the parse tree of the
+        recipe on the first request and kept in a process-wide registry.
+        See :func:`extract_variable_descriptions` for the structure.
+        """
+        recipe_hash = self.get_recipe_hash(mf, mt)
+        if recipe_hash is None:
+            return None
+        key = (get_recipe_hash(endf_recipe_grammar), recipe_hash)
+        descriptions = _recipe_descriptions.get(key, None)
+        if descriptions is None:
+            descriptions = extract_variable_descriptions(self.get_tree(mf, mt))
+            _recipe_descriptions[key] = descriptions
+        return descriptions
+
+    def get_recipe_analysis(self, mf, mt):
+        """Retrieve the analysis of the recipe of an MF/MT section.
+
+        The analysis is created along with the parse tree of the recipe
+        and kept in a process-wide registry, see :func:`analyze_recipe`
+        for the available information.
+        """
+        tree = self.get_tree(mf, mt)
+        if tree is None:
+            return None
+        key = (get_recipe_hash(endf_recipe_grammar), self.get_recipe_hash(mf, mt))
+        analysis = _recipe_analyses.get(key, None)
+        if analysis is None:
+            with _registry_lock:
+                analysis = _recipe_analyses.get(key, None)
+                if analysis is None:
+                    analysis = analyze_recipe(tree)
+                    _recipe_analyses[key] = analysis
+        return analysis
+
+    def get_recipe_program(self, mf, mt):
+        """Retrieve the instruction program for the recipe of an MF/MT section.
+
+        The program is compiled from the parse tree of the recipe
+        on the first request and kept in a process-wide registry,
+        see :func:`compile_recipe_program`.
+        """
+        tree = self.get_tree(mf, mt)
+        if tree is None:
+            return None
+        key = (get_recipe_hash(endf_recipe_grammar), self.get_recipe_hash(mf, mt))
+        program = _recipe_programs.get(key, None)
+        if program is None:
+            with _registry_lock:
+                program = _recipe_programs.get(key, None)
+                if program is None:
+                    analysis = self.get_recipe_analysis(mf, mt)
+                    program = compile_recipe_program(tree, analysis)
+                    _recipe_programs[key] = program
+        return program
+
+    def get_recipe_functions(self, mf, mt):
+        """Retrieve the generated functions to read and write an MF/MT section.
+
+        The Python code of the functions is generated from the instruction
+        program of the recipe on the first request (see
+        :func:`~endf_parserpy.endf_recipe_codegen.compile_recipe_functions`)
+        and the functions are kept in a process-wide registry. The generated
+        modules are stored in the cache directory if one is used.
+        """
+        program = self.get_recipe_program(mf, mt)
+        if program is None:
+            return None
+        key = (get_recipe_hash(endf_recipe_grammar), self.get_recipe_hash(mf, mt))
+        functions = _recipe_functions.get(key, None)
+        if functions is None:
+            from .endf_recipe_codegen import compile_recipe_functions
+
+            with _registry_lock:
+                functions = _recipe_functions.get(key, None)
+                if functions is None:
+                    functions = compile_recipe_functions(program, self.cache_dir)
+                    _recipe_functions[key] = functions
+        return functions
+
+    def iter_mfmt(self):
+        recipe_dic = self._recipe_dic
+        if recipe_dic is None:
+            bundle = get_default_recipe_bundle()
+            recipe_dic = self.recipe_dic if bundle is None else bundle["recipe_index"]
+        for mf, mf_recipes in recipe_dic.items():
+            if isinstance(mf_recipes, str):
+                yield mf, None
+            else:
+                for mt in mf_recipes:
+                    yield mf, mt
+
+    def compile_all(self):
+        for mf, mt in self.iter_mfmt():
+            self.get_tree(mf, mt)
+
+
+def get_recipe_parsetree_dic(recipe_dic, cache_dir, compiler=None):
+    return RecipeTreeDict(recipe_dic, cache_dir, compiler)
+
+
+def get_responsible_recipe_parsetree(tree_dic, mf, mt):
+    return tree_dic.get_tree(mf, mt)
@@ -3,7 +3,7 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2024/02/12
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022 International Atomic Energy Agency (IAEA)
 #
@@ -13,7 +13,8 @@ from .fortran_utils import (
     float2fortstr,
     fortstr2float,
     read_fort_floats,
-    write_fort_floats,
+    read_fort_float_block,
+    write_fort_float_block,
     read_fort_int,
 )
 from .custom_exceptions import (
@@ -56,8 +57,6 @@ def write_ctrl(dic, ns=None):
 
 
 def get_ctrl(dic, nofail=False):
-    while "MAT" not in dic and "__up" in dic:
-        dic = dic["__up"]
     if nofail:
         mat = 0 if "MAT" not in dic else dic["MAT"]
         mf = 0 if "MF" not in dic else dic["MF"]
@@ -174,6 +173,30 @@ def read_cont(lines, ofs=0, with_ctrl=True, **read_opts):
     return dic, ofs + 1
 
 
+# positions of the fields in a CONT-like line
+cont_field_positions = {"C1": 0, "C2": 1, "L1": 2, "L2": 3, "N1": 4, "N2": 5}
+
+
+def peek_cont(lines, ofs, keys, **read_opts):
+    # decode only the given fields of a CONT-like line
+    # (HEAD, CONT, LIST, TAB1, TAB2) and the control fields
+    blank_as_zero = read_opts.get("blank_as_zero", False)
+    width = read_opts.get("width", 11)
+    line = lines[ofs]
+    dic = read_ctrl(line, **read_opts)
+    for key in keys:
+        pos = cont_field_positions[key] * width
+        if key[0] == "C":
+            dic[key] = fortstr2float(
+                line[pos : pos + width],
+                blank=0.0 if blank_as_zero else None,
+                **read_opts,
+            )
+        else:
+            dic[key] = read_fort_int(line[pos : pos + width], blank_as_zero)
+    return dic
+
+
 def write_cont(dic, with_ctrl=True, **write_opts):
     width = write_opts.get("width", 11)
     for varname in ("L1", "L2", "N1", "N2"):
@@ -395,6 +418,12 @@ def read_endf_numbers(lines, num, ofs, to_int=False, **read_opts):
     blank_as_zero = read_opts.get("blank_as_zero", False)
     vals = []
     blank_symb = 0.0 if blank_as_zero else None
+    nlines = (num + 5) // 6
+    if ofs + nlines <= len(lines):
+        block = lines[ofs : ofs + nlines]
+        vals = read_fort_float_block(block, num, blank=blank_symb, **read_opts)
+        ofs += nlines
+        num = 0
     while num > 0:
         l = lines[ofs]
         m = min(6, num)
@@ -412,13 +441,13 @@ def read_endf_numbers(lines, num, ofs, to_int=False, **read_opts):
 
 def write_endf_numbers(vals, to_int=False, **write_opts):
     width = write_opts.get("width", 11)
-    lines = []
-    for i in range(0, len(vals), 6):
-        m = min(i + 6, len(vals))
-        if to_int:
+    if to_int:
+        lines = []
+        for i in range(0, len(vals), 6):
+            m = min(i + 6, len(vals))
             lines.append("".join([str(v).rjust(width) for v in vals[i:m]]))
-        else:
-            lines.append(write_fort_floats(vals[i:m], **write_opts))
+    else:
+        lines = write_fort_float_block(vals, **write_opts)
     lines[-1] = lines[-1].ljust(width * 6)
     return lines
 
@@ -3,13 +3,14 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2022/11/25
+# Last modified:   2026/10/17
 # License:         MIT
-# Copyright (c) 2022 International Atomic Energy Agency (IAEA)
+# Copyright (c) 2022-2026 International Atomic Energy Agency (IAEA)
 #
 ############################################################
 
 from .custom_exceptions import InvalidIntegerError, InvalidFloatError
+from .math_utils import get_numpy
 from math import log10, floor
 
 
@@ -172,8 +173,347 @@ def read_fort_floats(line, n=6, blank=None, **read_opts):
     return vals
 
 
+# Blocks with fewer numbers are read line by line because
+# the setup of the NumPy arrays would cost more than it saves.
+block_min_numbers = 60
+
+# Powers of ten that are exactly representable as floats. A number
+# with an integer mantissa below 2**53 and an exponent of ten within
+# this range is obtained by a single multiplication or division
+# of two exact floats and therefore correctly rounded, as by float().
+_exact_powers_of_ten = tuple(float(10**k) for k in range(23))
+
+
+def read_fort_float_block(lines, num, blank=None, **read_opts):
+    """Read ``num`` numbers from lines with six fields each.
+
+    The result is the same as the one obtained by calling
+    :func:`read_fort_floats` for each line. The fields in common
+    notation, e.g., ``-1.234567+5``, are converted all at once
+    with NumPy. Fields in other notation, blank fields and fields
+    beyond the end of a line are converted by :func:`read_fort_floats`.
+    """
+    accept_spaces = read_opts.get("accept_spaces", True)
+    width = read_opts.get("width", 11)
+    np = get_numpy()
+    if not np or num < block_min_numbers or width > 15 or 6 * len(lines) < num:
+        vals = []
+        for ofs in range(0, num, 6):
+            m = min(6, num - ofs)
+            vals += read_fort_floats(lines[ofs // 6], m, blank=blank, **read_opts)
+        return vals
+    linewidth = 6 * width
+    # fields beyond the end of a line are filled with zero bytes,
+    # which makes them irregular
+    block = "".join(l[:linewidth].ljust(linewidth, "\0") for l in lines)
+    try:
+        data = block.encode("latin-1")
+    except UnicodeEncodeError:
+        data = block.encode("ascii", errors="replace")
+    chars = np.frombuffer(data, dtype=np.uint8)[: num * width]
+    # the characters of a field are stored in a column so that
+    # the reductions over the characters of the fields are fast
+    chars = np.ascontiguousarray(chars.reshape(num, width).T)
+    vals, regular = _decode_fort_floats(np, chars)
+    vals = vals.tolist()
+    for i in np.flatnonzero(~regular).tolist():
+        pos = (i % 6) * width
+        valstr = lines[i // 6][pos : pos + width]
+        vals[i] = read_fort_floats(valstr, 1, blank=blank, **read_opts)[0]
+    return vals
+
+
+def _decode_fort_floats(np, chars):
+    # Each column of chars contains a field of the form [sign] mantissa
+    # [sign exponent], optionally surrounded by spaces, with the mantissa
+    # made up of digits and an optional decimal point. Fields not matching
+    # this form or whose value may not be correctly rounded are marked
+    # as irregular.
+    width = chars.shape[0]
+    cols = np.arange(chars.shape[1])
+    pos = np.arange(width)
+    digits = chars - 48  # other characters than digits wrap around
+    is_digit = digits < 10
+    is_space = chars == 32
+    is_dot = chars == 46
+    is_sign = (chars == 43) | (chars == 45)
+    regular = (is_digit | is_space | is_dot | is_sign).all(axis=0)
+    # no spaces between the first and last character
+    not_space = ~is_space
+    first = not_space.argmax(axis=0)
+    num_trailing = not_space[::-1].argmax(axis=0)
+    num_spaces = is_space.sum(axis=0)
+    regular &= (num_spaces < width) & (num_spaces == first + num_trailing)
+    last = width - 1 - num_trailing
+    # the exponent is introduced by a sign after a digit
+    is_sign[first, cols] = False
+    num_signs = is_sign.sum(axis=0)
+    has_exp = num_signs == 1
+    exppos = np.where(has_exp, pos @ is_sign, last + 1)
+    regular &= (num_signs <= 1) & (~has_exp | (exppos < last))
+    regular &= ~has_exp | is_digit[exppos - 1, cols]
+    num_expdigits = np.where(has_exp, last - exppos, 0)
+    num_dots = is_dot.sum(axis=0)
+    has_dot = num_dots == 1
+    dotpos = np.where(has_dot, pos @ is_dot, exppos - 1)
+    regular &= (num_dots <= 1) & (dotpos < exppos)
+    regular &= is_digit.sum(axis=0) > num_expdigits
+    # All digits are combined to an integer with zeros in place of the
+    # decimal point and the exponent sign, which is exact as float due
+    # to the limited width. The mantissa and the exponent are extracted
+    # from this integer by integer divisions by powers of ten.
+    powers = 10 ** np.arange(width + 1, dtype=np.int64)
+    number = powers[width - 1 :: -1].astype(float) @ (digits * is_digit)
+    number = number.astype(np.int64) // powers[num_trailing]
+    exponent = number % powers[num_expdigits]
+    number //= powers[num_expdigits + has_exp]
+    expsign = chars[np.minimum(exppos, width - 1), cols]
+    exponent = np.where(has_exp & (expsign == 45), -exponent, exponent)
+    num_decimals = np.where(has_dot, exppos - 1 - dotpos, 0)
+    decimals = number % powers[num_decimals]
+    number = np.where(has_dot, (number - decimals) // 10 + decimals, number)
+    exponent -= num_decimals
+    # a single multiplication or division of exact numbers
+    # yields the correctly rounded value
+    exponent_limit = len(_exact_powers_of_ten) - 1
+    regular &= np.abs(exponent) <= exponent_limit
+    exponent = np.clip(exponent, -exponent_limit, exponent_limit)
+    float_powers = np.array(_exact_powers_of_ten)
+    number = number.astype(float)
+    number = np.where(
+        exponent >= 0,
+        number * float_powers[np.maximum(exponent, 0)],
+        number / float_powers[np.maximum(-exponent, 0)],
+    )
+    number = np.where(chars[first, cols] == 45, -number, number)
+    return number, regular
+
+
 def write_fort_floats(vals, **write_opts):
     line = ""
     for i, v in enumerate(vals):
         line += float2fortstr(v, **write_opts)
     return line
+
+
+# Blocks with fewer numbers are written line by line. The setup of
+# the NumPy arrays costs more for writing than for reading numbers.
+write_block_min_numbers = 120
+
+# The divisors 10**exponent used by float2expformstr for
+# the exponents that are formatted with NumPy
+_max_block_exponent = 99
+_powers_of_ten_divisors = tuple(
+    float(10**k) if k >= 0 else 10**k
+    for k in range(-_max_block_exponent, _max_block_exponent + 1)
+)
+
+
+def write_fort_float_block(vals, **write_opts):
+    """Write numbers into lines with six fields each.
+
+    The result is the same as the one obtained by calling
+    :func:`write_fort_floats` for each group of six numbers.
+    The numbers are formatted all at once with NumPy. Numbers whose
+    representation cannot be determined reliably in this way, e.g.,
+    because they are close to a rounding boundary, are formatted
+    by :func:`float2fortstr`.
+    """
+    width = write_opts.get("width", 11)
+    num = len(vals)
+    np = get_numpy()
+    if (
+        not np
+        or num < write_block_min_numbers
+        or width > 15
+        or not set(map(type, vals)) <= {float, int}
+    ):
+        return _write_line_by_line(vals, **write_opts)
+    # ints that cannot be converted exactly to floats become irregular
+    arr = np.array(
+        [v if type(v) is float or -(2**53) < v < 2**53 else np.nan for v in vals],
+        dtype=float,
+    )
+    chars, regular = _encode_fort_floats(np, arr, **write_opts)
+    for i in np.flatnonzero(~regular).tolist():
+        valstr = float2fortstr(vals[i], **write_opts)
+        if len(valstr) != width:
+            return _write_line_by_line(vals, **write_opts)
+        chars[:, i] = np.frombuffer(valstr.encode("ascii"), dtype=np.uint8)
+    text = chars.T.tobytes().decode("ascii")
+    linewidth = 6 * width
+    return [text[i : i + linewidth] for i in range(0, len(text), linewidth)]
+
+
+def _write_line_by_line(vals, **write_opts):
+    num = len(vals)
+    return [write_fort_floats(vals[i : i + 6], **write_opts) for i in range(0, num, 6)]
+
+
+def _round_scaled(np, vals, num_decimals):
+    # The product may deviate by half a unit in the last place from the
+    # exact product, which can only change the rounded value if the
+    # fractional part of the product is close to one half.
+    scaled = vals * np.array(_exact_powers_of_ten)[num_decimals]
+    rounded = np.rint(scaled)
+    ambiguous = np.abs(np.abs(scaled - rounded) - 0.5) <= scaled * 2.0**-50
+    return rounded.astype(np.int64), ambiguous
+
+
+def _encode_fort_floats(np, vals, **write_opts):
+    # Column i of the returned character matrix contains the field
+    # produced by float2fortstr for vals[i]. The numbers are formatted
+    # as the functions float2expformstr and float2basicnumstr do but
+    # with the rounding to decimals done on integers. Columns whose
+    # content may differ from the result of float2fortstr are marked
+    # as irregular.
+    width = write_opts.get("width", 11)
+    abuse_signpos = write_opts.get("abuse_signpos", False)
+    skip_intzero = write_opts.get("skip_intzero", False)
+    prefer_noexp = write_opts.get("prefer_noexp", False)
+    keep_E = write_opts.get("keep_E", False)
+    int_powers = 10 ** np.arange(19, dtype=np.int64)
+    regular = np.isfinite(vals)
+    vals = np.where(regular, vals, 1.0)
+    av = np.abs(vals)
+    is_zero = av == 0.0
+    is_pos = vals >= 0
+    # exponential form as produced by float2expformstr
+    nexp = np.where(
+        (av >= 1e-9) & (av < 1e10) | is_zero,
+        1,
+        np.where((av >= 1e-99) & (av < 1e100), 2, 3),
+    )
+    sign_dec = np.where(is_pos & abuse_signpos, 0, 1)
+    with np.errstate(divide="ignore"):
+        logvals = np.log10(np.where(is_zero, 1.0, av))
+    exponent = np.floor(logvals)
+    # log10 of NumPy and of the math module may round differently,
+    # which matters for the floor close to integers
+    close_to_int = np.abs(logvals - np.rint(logvals)) < 1e-9
+    for i in np.flatnonzero(close_to_int & ~is_zero).tolist():
+        exponent[i] = floor(log10(av[i]))
+    exponent = exponent.astype(np.int64)
+    regular &= np.abs(exponent) <= _max_block_exponent
+    exponent = np.maximum(
+        np.minimum(exponent, _max_block_exponent), -_max_block_exponent
+    )
+    divisors = np.array(_powers_of_ten_divisors)
+    mantissa = av / divisors[exponent + _max_block_exponent]
+    mantissa = np.where(regular, mantissa, 1.0)
+    num_decimals = width - 3 - nexp - sign_dec - keep_E
+    regular &= num_decimals >= 1
+    num_decimals = np.maximum(num_decimals, 0)
+    mantissa_digits, ambiguous = _round_scaled(np, mantissa, num_decimals)
+    # a mantissa rounded up to ten is subject to a second formatting step
+    leading_digit = mantissa_digits // int_powers[num_decimals]
+    regular &= ~ambiguous & (is_zero | (leading_digit >= 1) & (leading_digit <= 9))
+    abs_exponent = np.abs(exponent)
+    regular &= abs_exponent < int_powers[nexp]
+    use_exp = np.ones(len(vals), dtype=bool)
+    digits = mantissa_digits
+    num_intdigits = np.ones(len(vals), dtype=np.int64)
+    signs = np.where(is_pos, 32, 45)
+    if prefer_noexp:
+        # form without exponent as produced by float2basicnumstr
+        # and stripped of trailing zeros by float2fortstr
+        regular &= av < 1e15
+        basic_input = np.where(regular, vals, 0.0)
+        intpart = np.trunc(basic_input)
+        abs_intpart = np.abs(intpart).astype(np.int64)
+        len_intpart = np.searchsorted(int_powers, abs_intpart, side="right")
+        len_intpart = np.maximum(len_intpart, 1)
+        is_integer = intpart == basic_input
+        skip_zero = skip_intzero & (abs_intpart == 0)
+        waste_space = 2 - (abuse_signpos & (vals > 0)) - is_integer
+        floatwidth = width + skip_zero - waste_space - len_intpart
+        is_fixed = (floatwidth > 0) & ~is_integer
+        floatwidth = np.where(is_fixed, floatwidth, 0)
+        fixed_vals = np.where(is_fixed, np.abs(basic_input), 0.0)
+        fixed_digits, ambiguous = _round_scaled(np, fixed_vals, floatwidth)
+        # a carry into the integer part would change the layout
+        # of the fixed-point notation
+        regular &= ~is_fixed | (
+            ~ambiguous & (fixed_digits // int_powers[floatwidth] == abs_intpart)
+        )
+        basic_digits = np.where(is_fixed, fixed_digits, abs_intpart)
+        basic_decimals = floatwidth
+        for _ in range(width):
+            strip = (basic_decimals > 0) & (basic_digits % 10 == 0)
+            if not strip.any():
+                break
+            basic_digits = np.where(strip, basic_digits // 10, basic_digits)
+            basic_decimals = basic_decimals - strip
+        basic_intdigits = np.where(is_fixed & skip_zero, 0, len_intpart)
+        basic_neg = ~is_pos & (is_fixed | (abs_intpart > 0))
+        # the integer part of numbers with too many digits
+        # does not fit into the field
+        numstr_len = len_intpart + basic_neg + ((vals > 0) & (not abuse_signpos))
+        too_long = ~is_fixed & (numstr_len > width)
+        # the form that reproduces the number more accurately is selected
+        float_powers = np.array(_exact_powers_of_ten)
+        exponent_limit = len(_exact_powers_of_ten) - 1
+        expo = exponent - num_decimals
+        regular &= np.abs(expo) <= exponent_limit
+        expo = np.maximum(np.minimum(expo, exponent_limit), -exponent_limit)
+        mantissa_digits = mantissa_digits.astype(float)
+        exp_vals = np.where(
+            expo >= 0,
+            mantissa_digits * float_powers[np.maximum(expo, 0)],
+            mantissa_digits / float_powers[np.maximum(-expo, 0)],
+        )
+        basic_vals = np.where(
+            is_fixed, fixed_digits / float_powers[floatwidth], np.abs(intpart)
+        )
+        delta1 = np.abs(basic_vals - av)
+        delta2 = np.abs(exp_vals - av)
+        use_exp = ~is_zero & (too_long | (delta2 < delta1))
+        # The fixed-point notation of numbers rounded to zero is only
+        # handled if it is not used. If the integer zero is skipped and
+        # a space remains in place of the sign, its conversion fails.
+        rounded_to_zero = is_fixed & (fixed_digits == 0)
+        conversion_fails = skip_zero & (vals > 0) & (not abuse_signpos)
+        regular &= ~rounded_to_zero | use_exp & ~conversion_fails
+        digits = np.where(use_exp, digits, basic_digits)
+        num_decimals = np.where(use_exp, num_decimals, basic_decimals)
+        num_intdigits = np.where(use_exp, 1, basic_intdigits)
+        signs = np.where(use_exp | basic_neg, signs, 32)
+    # The fields are filled from the right with the exponent part if the
+    # exponential form is used, the decimals, the decimal point, the
+    # digits of the integer part and the sign. The digits are shifted to
+    # their positions counted from the right in an integer, which leaves
+    # zeros in place of the exponent part and the decimal point.
+    cols = np.arange(len(vals))
+    exp_len = np.where(use_exp, nexp + 1 + keep_E, 0)
+    dotpos = exp_len + num_decimals
+    has_dot = use_exp | (num_decimals > 0)
+    digits *= int_powers[exp_len]
+    digits = np.where(
+        has_dot,
+        digits // int_powers[dotpos] * int_powers[dotpos + 1]
+        + digits % int_powers[dotpos],
+        digits,
+    )
+    digit_chars = np.empty((width, len(vals)), dtype=np.uint8)
+    for k in range(width):
+        digits, digit_chars[k] = np.divmod(digits, 10)
+    digit_chars += 48
+    signpos = dotpos + has_dot + num_intdigits
+    pos = np.arange(width)[:, None]
+    chars = np.where(pos < signpos, digit_chars, np.uint8(32))
+    is_signed = signpos < width
+    chars[signpos[is_signed], cols[is_signed]] = signs[is_signed]
+    chars[dotpos[has_dot], cols[has_dot]] = 46
+    for k in range(min(3, width)):
+        exp_digit_chars = np.where(
+            (abs_exponent >= int_powers[k]) | (k == 0),
+            abs_exponent // int_powers[k] % 10 + 48,
+            32,
+        )
+        chars[k] = np.where(use_exp & (k < nexp), exp_digit_chars, chars[k])
+    exp_cols = cols[use_exp]
+    chars[nexp[use_exp], exp_cols] = np.where(exponent[use_exp] >= 0, 43, 45)
+    if keep_E:
+        chars[nexp[use_exp] + 1, exp_cols] = 69
+    chars = chars[::-1]
+    return chars, regular
@@ -3,7 +3,7 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2022/05/30
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022 International Atomic Energy Agency (IAEA)
 #
@@ -13,9 +13,15 @@ import logging
 from .tree_utils import reconstruct_tree_str
 
 
+def info_enabled():
+    # messages are only assembled if they are going to be logged
+    return logging.root.isEnabledFor(logging.INFO)
+
+
 def write_info(message, ofs=None):
-    prefix = f"Line #{ofs}: " if ofs is not None else ""
-    logging.info(prefix + message)
+    if logging.root.isEnabledFor(logging.INFO):
+        prefix = f"Line #{ofs}: " if ofs is not None else ""
+        logging.info(prefix + message)
 
 
 def abbreviate_valstr(val):
@@ -86,15 +92,18 @@ class RingBuffer:
         self.tail = state_info["tail"]
         self.num_enqueued = state_info["num_enqueued"]
 
+    # the entries of the record log are tuples (ofs, line, record_spec,
+    # onlyfirst) with the record specification being a string or a node
+    # of the recipe tree, which are only rendered if the log is displayed
     def save_record_log(self, ofs, line, record_tree, onlyfirst=False):
-        recon_str = reconstruct_tree_str(record_tree)
-        if onlyfirst:
-            recon_str = recon_str.split("\n")[0]
-        self.enqueue({"ofs": ofs, "line": line.rstrip(), "record_spec": recon_str})
+        self.enqueue((ofs, line, record_tree, onlyfirst))
+
+    def log_record(self, ofs, line, record_str):
+        self.enqueue((ofs, line, record_str, False))
 
     def display_record_logs(self):
         outstr = ""
-        for curentry in self.get_queue():
+        for curentry in map(render_record_log, self.get_queue()):
             outstr += f'-------- Line {curentry["ofs"]} -----------\n'
             outstr += "Template:  {}\n".format(curentry["record_spec"])
             outstr += 'Line:     "{}"\n\n'.format(curentry["line"])
@@ -103,12 +112,101 @@ class RingBuffer:
     def save_reduced_record_log(self, record_tree, onlyfirst=False):
         self.save_record_log(0, "", record_tree, onlyfirst)
 
+    def log_reduced_record(self, record_str):
+        self.enqueue((0, "", record_str, False))
+
     def display_reduced_record_logs(self):
         outstr = ""
-        for curentry in self.get_queue():
+        for curentry in map(render_record_log, self.get_queue()):
             outstr += "Template:  {}\n".format(curentry["record_spec"])
         return outstr
 
+    def get_last_record_log(self):
+        return self.buffer[self.tail]
+
     def get_last_entry(self, key_prefix=""):
-        last_entry = self.buffer[self.tail]
+        last_entry = render_record_log(self.buffer[self.tail])
         return {f"{key_prefix}{k}": v for k, v in last_entry.items()}
+
+
+def render_record_log(entry):
+    ofs, line, record_spec, onlyfirst = entry
+    if not isinstance(record_spec, str):
+        record_spec = reconstruct_tree_str(record_spec)
+    if onlyfirst:
+        record_spec = record_spec.split("\n")[0]
+    return {"ofs": ofs, "line": line.rstrip(), "record_spec": record_spec}
+
+
+class MismatchDiagnostics:
+    """Collector of the mismatches tolerated while parsing ENDF-6 data.
+
+    Mismatches between the numbers in the ENDF-6 formatted data and
+    the ones expected according to the ENDF-6 recipes that are tolerated
+    due to the options of the parser (e.g., ``ignore_zero_mismatch``)
+    are counted by type (``"zero"``, ``"number"``, ``"varspec"``) and
+    MF/MT section. The messages and offending lines of the first
+    ``max_samples`` mismatches are kept. An object of this class is
+    attached to each call of :func:`~endf_parserpy.EndfParser.parse`.
+    """
+
+    def __init__(self, max_samples=20):
+        self.max_samples = max_samples
+        self.counts = {}
+        self.samples = []
+
+    def count_mismatch(self, mismatch_type, section):
+        """Count a mismatch and return whether a sample should be added."""
+        key = (mismatch_type, section)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return len(self.samples) < self.max_samples
+
+    def add_sample(self, mismatch_type, section, message, record_log=None):
+        self.samples.append((mismatch_type, section, message, record_log))
+
+    @property
+    def num_mismatches(self):
+        return sum(self.counts.values())
+
+    def summary(self):
+        """Return a summary of the tolerated mismatches.
+
+        Returns
+        -------
+        dict
+            The total number of mismatches (``total``), the counts
+            of the mismatches by type and MF/MT section (``counts``)
+            and a list with the samples (``samples``). Each sample is a
+            ``dict`` with the type of the mismatch (``type``), the MF/MT
+            section (``section``), the message (``message``) and,
+            if available, the record specification (``record_spec``)
+            and the offending line (``line``) along with its index (``ofs``)
+            in the section.
+        """
+        counts = {}
+        for (mismatch_type, section), count in self.counts.items():
+            counts.setdefault(mismatch_type, {})[section] = count
+        samples = []
+        for mismatch_type, section, message, record_log in self.samples:
+            sample = {"type": mismatch_type, "section": section, "message": message}
+            if record_log is not None:
+                sample.update(render_record_log(record_log))
+            samples.append(sample)
+        return {"total": self.num_mismatches, "counts": counts, "samples": samples}
+
+    def describe(self, since=None):
+        """Describe the number of mismatches by type.
+
+        If a copy of the ``counts`` attribute taken earlier is passed
+        as ``since``, only the mismatches counted afterwards are included.
+        """
+        since = since or {}
+        counts_by_type = {}
+        for key, count in self.counts.items():
+            count -= since.get(key, 0)
+            if count > 0:
+                mismatch_type = key[0]
+                counts_by_type[mismatch_type] = (
+                    counts_by_type.get(mismatch_type, 0) + count
+                )
+        return ", ".join(f"{t}: {c}" for t, c in counts_by_type.items())
@@ -3,14 +3,76 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/11/15
-# Last modified:   2022/11/15
+# Last modified:   2026/10/17
 # License:         MIT
-# Copyright (c) 2022 International Atomic Energy Agency (IAEA)
+# Copyright (c) 2022-2026 International Atomic Energy Agency (IAEA)
 #
 ############################################################
+import operator
 from .custom_exceptions import InvalidIntegerError
 
 
+_scalar_types = frozenset((int, float))
+_sequence_types = frozenset((list, tuple))
+
+# Sequences with fewer elements are processed element by element
+# because the conversion to NumPy arrays would cost more than it saves.
+numpy_min_length = 32
+
+# NumPy is an optional dependency and only imported when first needed
+_numpy = None
+
+
+def get_numpy():
+    """Return the NumPy module or `False` if it is not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy
+
+
+def _is_numpy_compatible(z, elem_types):
+    return (
+        type(z) in _sequence_types
+        and len(z) >= numpy_min_length
+        and set(map(type, z)) <= elem_types
+    )
+
+
+def _as_arrays(x, y, elem_types=frozenset((float,))):
+    """Convert x and y to NumPy arrays if the result does not change.
+
+    Sequences are only converted if all their elements are of one of
+    the types in ``elem_types``. The default restriction to floats
+    ensures that ints in sequences remain ints in arithmetic operations.
+    If a conversion is not possible or not worthwhile, `None` is returned.
+    """
+    if type(x) in _scalar_types:
+        if not _is_numpy_compatible(y, elem_types):
+            return None
+    elif _is_numpy_compatible(x, elem_types):
+        if type(y) not in _scalar_types and (
+            len(x) != len(y) or not _is_numpy_compatible(y, elem_types)
+        ):
+            return None
+    else:
+        return None
+    np = get_numpy()
+    if not np:
+        return None
+    return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+
+def _from_array(res, x, y):
+    seqtype = type(x) if type(x) in _sequence_types else type(y)
+    res = res.tolist()
+    return res if seqtype is list else seqtype(res)
+
+
 def math_isclose(x, y, rtol=1e-5, atol=1e-8):
     return abs(x - y) <= (atol + rtol * abs(y))
 
@@ -31,20 +93,55 @@ def math_op(x, y, op, **kwargs):
         return op(x, y, **kwargs)
 
 
+def _array_op(x, y, op, check_divisor=False):
+    # op must work element-wise on NumPy arrays as well
+    arrays = _as_arrays(x, y)
+    if arrays is None:
+        return math_op(x, y, op)
+    np = get_numpy()
+    if check_divisor and not np.all(arrays[1]):
+        # the division by zero raises a ZeroDivisionError element-wise
+        return math_op(x, y, op)
+    # overflows yield inf as for Python floats, without warning
+    with np.errstate(all="ignore"):
+        res = op(*arrays)
+    return _from_array(res, x, y)
+
+
 def math_neg(x):
-    if hasattr(x, "__iter__"):
+    if type(x) in _scalar_types:
+        return -x
+    elif hasattr(x, "__iter__"):
+        arrays = _as_arrays(x, 0.0)
+        if arrays is not None:
+            return _from_array(-arrays[0], x, None)
         return type(x)(-z for z in x)
     else:
         return -x
 
 
 def math_mul(x, y):
-    return math_op(x, y, lambda a, b: a * b)
+    if type(x) in _scalar_types and type(y) in _scalar_types:
+        return x * y
+    return _array_op(x, y, operator.mul)
 
 
 def math_div(x, y, cast_int=False):
-    res = math_op(x, y, lambda a, b: a / b)
+    if type(x) is int and type(y) is int:
+        quotient, remainder = divmod(x, y)
+        if remainder == 0:
+            return quotient
+        if cast_int:
+            raise InvalidIntegerError(
+                f"both x and y are int so {x}/{y} must "
+                + f"evaluate to integer (got {x/y})"
+            )
+        return x / y
+    elif type(x) in _scalar_types and type(y) in _scalar_types:
+        return x / y
+    res = _array_op(x, y, operator.truediv, check_divisor=True)
     if isinstance(x, int) and isinstance(y, int):
+        # subclasses of int, such as bool
         if int(res) != res:
             if cast_int:
                 raise InvalidIntegerError(
@@ -57,25 +154,39 @@ def math_div(x, y, cast_int=False):
 
 
 def math_mod(x, y, cast_int=False):
-    res = math_op(x, y, lambda a, b: a % b)
-    if isinstance(x, int) and isinstance(y, int) and cast_int:
-        if int(res) != res:
-            raise InvalidIntegerError(
-                f"both x and y are int so {x}%{y} must "
-                + f"evaluate to integer (got {x%y})"
-            )
-        return int(res)
-    else:
-        return res
+    # the remainder of a division of two ints is always an int
+    # so that the value of cast_int does not matter
+    if type(x) in _scalar_types and type(y) in _scalar_types:
+        return x % y
+    return _array_op(x, y, operator.mod, check_divisor=True)
 
 
 def math_add(x, y):
-    return math_op(x, y, lambda a, b: a + b)
+    if type(x) in _scalar_types and type(y) in _scalar_types:
+        return x + y
+    return _array_op(x, y, operator.add)
 
 
 def math_sub(x, y):
-    return math_op(x, y, lambda a, b: a - b)
+    if type(x) in _scalar_types and type(y) in _scalar_types:
+        return x - y
+    return _array_op(x, y, operator.sub)
 
 
 def math_allclose(x, y, rtol=1e-5, atol=1e-8):
-    return math_op(x, y, math_isclose, rtol=rtol, atol=atol)
+    """Check whether all elements of x and y are close.
+
+    The same criterion as in :func:`math_isclose` is applied to each
+    pair of elements, which also works if x or y is a scalar.
+    """
+    if type(x) in _scalar_types and type(y) in _scalar_types:
+        return abs(x - y) <= (atol + rtol * abs(y))
+    arrays = _as_arrays(x, y, _scalar_types)
+    if arrays is not None:
+        np = get_numpy()
+        xarr, yarr = arrays
+        with np.errstate(all="ignore"):
+            isclose = np.abs(xarr - yarr) <= (atol + rtol * np.abs(yarr))
+        return bool(np.all(isclose))
+    res = math_op(x, y, math_isclose, rtol=rtol, atol=atol)
+    return all(res) if hasattr(res, "__iter__") else res
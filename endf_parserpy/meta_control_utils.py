@@ -3,7 +3,7 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2024/02/18
+# Last modified:   2026/10/17
 # License:         MIT
 # Copyright (c) 2022-2024 International Atomic Energy Agency (IAEA)
 #
@@ -22,8 +22,18 @@ from .endf_mapping_utils import (
     get_indexvalue,
     get_indexquants,
     get_varname,
+    journal_assignment,
+    undo_journal,
+    Abbreviation,
 )
-from .logging_utils import write_info
+from .endf_mapping_core import (
+    RecordField,
+    get_field_value,
+    get_field_vv,
+    set_field_value,
+)
+from .endf_utils import peek_cont, skip_blank_lines
+from .logging_utils import info_enabled, write_info
 from .custom_exceptions import (
     LoopVariableError,
     AbbreviationNameCollisionError,
@@ -31,31 +41,38 @@ from .custom_exceptions import (
     UnexpectedControlRecordError,
     MissingSectionError,
 )
-from copy import deepcopy
-
-
-def initialize_abbreviations(datadic):
-    datadic["__abbrevs"] = set()
 
 
-def introduce_abbreviation(tree, datadic):
-    abbrevs = datadic.setdefault("__abbrevs", set())
+def introduce_abbreviation(tree, datadic, loop_vars):
+    abbrevs = loop_vars.setdefault("__abbrevs", {})
     varname = get_child_value(tree, "VARNAME")
-    if varname not in abbrevs and varname in datadic:
+    prev_abbrev = abbrevs.get(varname)
+    # abbreviations may be introduced again, e.g., in a loop body
+    reintroduced = prev_abbrev is not None and prev_abbrev.datadic is datadic
+    if not reintroduced and varname in datadic:
         raise AbbreviationNameCollisionError(
             f"Abbreviation `{varname}` collides with "
             "an equally named variable defined earlier"
         )
+    shadowed = prev_abbrev.shadowed if reintroduced else prev_abbrev
+    # the other abbreviations may depend on this one
+    for abbrev in abbrevs.values():
+        abbrev.invalidate()
     expr = get_child(tree, "expr")
-    abbrevs.add(varname)
-    datadic[varname] = expr
+    abbrevs[varname] = Abbreviation(varname, expr, datadic, shadowed, abbrevs)
 
 
-def finalize_abbreviations(datadic):
-    assert "__abbrevs" in datadic
-    for abbrev in datadic["__abbrevs"]:
-        del datadic[abbrev]
-    del datadic["__abbrevs"]
+def finalize_abbreviations(datadic, loop_vars):
+    # remove the abbreviations introduced in the section
+    abbrevs = loop_vars.get("__abbrevs")
+    if not abbrevs:
+        return
+    for varname, abbrev in tuple(abbrevs.items()):
+        if abbrev.datadic is datadic:
+            if abbrev.shadowed is None:
+                del abbrevs[varname]
+            else:
+                abbrevs[varname] = abbrev.shadowed
 
 
 def open_section(extvarname, datadic, loop_vars, create_missing, path=None):
@@ -65,6 +82,7 @@ def open_section(extvarname, datadic, loop_vars, create_missing, path=None):
     indexquants = get_indexquants(extvarname)
     curdatadic = datadic
     if create_missing:
+        journal_assignment(datadic, (varname,), loop_vars)
         datadic.setdefault(varname, {})
     try:
         datadic = datadic[varname]
@@ -78,17 +96,18 @@ def open_section(extvarname, datadic, loop_vars, create_missing, path=None):
         msg += f"`{varname}` is missing in dictionary"
         raise MissingSectionError(msg, section_name=varname, section_type=section_type)
 
-    idcsstr_list = []
+    idcs = []
     if indexquants is not None:
         for idxquant in indexquants:
             idx = get_indexvalue(idxquant, loop_vars)
-            idcsstr_list.append(str(idx))
+            idcs.append(idx)
             if create_missing:
+                journal_assignment(datadic, (idx,), loop_vars)
                 datadic.setdefault(idx, {})
             try:
                 datadic = datadic[idx]
             except KeyError:
-                ext_secname = f"{varname}[" + ",".join(idcsstr_list) + "]"
+                ext_secname = f"{varname}[" + ",".join(map(str, idcs)) + "]"
                 raise MissingSectionError(
                     f"Section `{ext_secname}` is missing in dictionary",
                     section_name=ext_secname,
@@ -96,23 +115,42 @@ def open_section(extvarname, datadic, loop_vars, create_missing, path=None):
                 )
             if path is not None:
                 path += (idx,)
-    # provide a pointer so that functions
-    # can look for variable names in the outer scope
-    datadic["__up"] = curdatadic
-    write_info(f"Open section {varname}[" + ",".join(idcsstr_list) + "]")
+    # put the section on the scope stack so that functions
+    # can look for variable names in the outer scopes
+    scopes = loop_vars.get("__scopes")
+    if scopes is None:
+        scopes = loop_vars["__scopes"] = [curdatadic]
+    scopes.append(datadic)
+    if info_enabled():
+        write_info(f"Open section {varname}[" + ",".join(map(str, idcs)) + "]")
     if path is None:
         return datadic
     else:
         return datadic, path
 
 
-def close_section(extvarname, datadic):
-    varname = get_varname(extvarname)
-    write_info(f"Close section {varname}")
-    curdatadic = datadic
-    datadic = datadic["__up"]
-    del curdatadic["__up"]
-    return datadic
+def close_section(extvarname, datadic, loop_vars):
+    if info_enabled():
+        write_info(f"Close section {get_varname(extvarname)}")
+    scopes = loop_vars["__scopes"]
+    assert scopes[-1] is datadic
+    scopes.pop()
+    return scopes[-1]
+
+
+def get_loop_bounds(varname, start_field, stop_field, datadic, loop_vars):
+    # the loop bounds are given as RecordField objects
+    start = get_field_value(start_field, datadic, loop_vars, True, True)
+    stop = get_field_value(stop_field, datadic, loop_vars, True, True)
+    if float(start) != int(start):
+        raise LoopVariableError("Loop start index must evaluate to an integer")
+    if float(stop) != int(stop):
+        raise LoopVariableError("Loop stop index must evaluate to an integer")
+    if varname in loop_vars:
+        raise LoopVariableError(
+            f"The loop variable {varname} is already in use for another loop"
+        )
+    return int(start), int(stop)
 
 
 def cycle_for_loop(
@@ -128,27 +166,16 @@ def cycle_for_loop(
     for_head = get_child(tree, head_name)
     varname = get_child_value(for_head, "VARNAME")
     # determine range for loop counter
-    start_expr = get_child(for_head, "for_start")
-    stop_expr = get_child(for_head, "for_stop")
-    start = eval_expr_without_unknown_var(start_expr, datadic, loop_vars)
-    stop = eval_expr_without_unknown_var(stop_expr, datadic, loop_vars)
-    if float(start) != int(start):
-        raise LoopVariableError("Loop start index must evaluate to an integer")
-    if float(stop) != int(stop):
-        raise LoopVariableError("Loop stop index must evaluate to an integer")
-
-    start = int(start)
-    stop = int(stop)
+    start_field = RecordField(None, get_child(for_head, "for_start"))
+    stop_field = RecordField(None, get_child(for_head, "for_stop"))
+    start, stop = get_loop_bounds(varname, start_field, stop_field, datadic, loop_vars)
     for_body = get_child(tree, body_name)
-    if varname in loop_vars:
-        raise LoopVariableError(
-            f"The loop variable {varname} is already in use for another loop"
+    if info_enabled():
+        write_info(
+            f"Enter for loop (type {loop_name}) "
+            + reconstruct_tree_str(for_head)
+            + f" (for_start: {start} and for_stop {stop})"
         )
-    write_info(
-        f"Enter for loop (type {loop_name}) "
-        + reconstruct_tree_str(for_head)
-        + f" (for_start: {start} and for_stop {stop})"
-    )
     for i in range(start, stop + 1):
         loop_vars[varname] = i
         tree_handler(for_body)
@@ -157,17 +184,21 @@ def cycle_for_loop(
     # and consequently we don't have to delete it
     if start <= stop:
         del loop_vars[varname]
-    write_info(
-        f"Leave for loop (type {loop_name}) "
-        + reconstruct_tree_str(for_head)
-        + f" (for_start: {start} and for_stop: {stop})"
-    )
+    if info_enabled():
+        write_info(
+            f"Leave for loop (type {loop_name}) "
+            + reconstruct_tree_str(for_head)
+            + f" (for_start: {start} and for_stop: {stop})"
+        )
 
 
 def eval_if_condition(if_condition, datadic, loop_vars, missing_as_false=False):
     if len(if_condition.children) != 3:
         raise IndexError("if_condition must have three children")
-    write_info("Dealing with the if_condition " + reconstruct_tree_str(if_condition))
+    if info_enabled():
+        write_info(
+            "Dealing with the if_condition " + reconstruct_tree_str(if_condition)
+        )
     left_expr = if_condition.children[0]
     cmpop = get_child_value(if_condition, "IF_RELATION")
     right_expr = if_condition.children[2]
@@ -179,7 +210,8 @@ def eval_if_condition(if_condition, datadic, loop_vars, missing_as_false=False):
             return False
         else:
             raise exc
-    write_info(f"Left side evaluates to {left_val} and right side to {right_val}")
+    if info_enabled():
+        write_info(f"Left side evaluates to {left_val} and right side to {right_val}")
     if (
         (cmpop == ">" and left_val > right_val)
         or (cmpop == "<" and left_val < right_val)
@@ -258,6 +290,7 @@ def evaluate_if_clause(
     set_parser_state=None,
     get_parser_state=None,
     eval_body=True,
+    header_peeks=None,
 ):
     if_body = None
     first_if_statement = get_child(tree, "if_statement")
@@ -268,6 +301,7 @@ def evaluate_if_clause(
         tree_handler,
         set_parser_state,
         get_parser_state,
+        header_peeks,
     )
     if truthval is True:
         if_body = get_child(first_if_statement, "if_body")
@@ -281,6 +315,7 @@ def evaluate_if_clause(
                 tree_handler,
                 set_parser_state,
                 get_parser_state,
+                header_peeks,
             )
             if truthval is True:
                 if_body = get_child(elif_tree, "if_body")
@@ -302,6 +337,7 @@ def evaluate_if_statement(
     tree_handler=None,
     set_parser_state=None,
     get_parser_state=None,
+    header_peeks=None,
 ):
     assert tree.data in ("if_statement", "elif_statement", "else_statement")
     if_head = get_child(tree, "if_head")
@@ -311,22 +347,75 @@ def evaluate_if_statement(
         and lookahead_option
         and get_parser_state()["rwmode"] == "read"
     )
+    header_peek = None
+    if should_perform_lookahead and header_peeks is not None:
+        header_peek = header_peeks.get(tree, None)
+    if header_peek is not None and "__lookahead" not in loop_vars:
+        return evaluate_with_header_peek(
+            tree, header_peek, datadic, loop_vars, get_parser_state()
+        )
     if should_perform_lookahead:
         datadic, loop_vars, orig_parser_state = perform_lookahead(
             tree, tree_handler, datadic, loop_vars, set_parser_state, get_parser_state
         )
     # evaluate the condition (with variables in datadic potentially
     # affected by the lookahead)
-    write_info("Evaluate if head " + reconstruct_tree_str(if_head))
+    if info_enabled():
+        write_info("Evaluate if head " + reconstruct_tree_str(if_head))
     disj = get_child(if_head, "disjunction")
-    truthval = determine_truthvalue(disj, datadic, loop_vars, missing_as_false=True)
-    if should_perform_lookahead:
-        datadic, loop_vars = undo_lookahead_changes(
-            datadic, loop_vars, orig_parser_state, set_parser_state
-        )
+    try:
+        truthval = determine_truthvalue(disj, datadic, loop_vars, missing_as_false=True)
+    finally:
+        if should_perform_lookahead:
+            datadic, loop_vars = undo_lookahead_changes(
+                datadic, loop_vars, orig_parser_state, set_parser_state
+            )
     return truthval
 
 
+def evaluate_with_header_peek(tree, header_peek, datadic, loop_vars, parser_state):
+    # the condition only depends on fields in the header of the next
+    # record, so these fields are decoded and the variables temporarily
+    # bound instead of executing the body of the statement
+    if_head = get_child(tree, "if_head")
+    if info_enabled():
+        write_info("Peek at next record for if head " + reconstruct_tree_str(if_head))
+    lines = parser_state["lines"]
+    ofs = skip_blank_lines(lines, parser_state["ofs"])
+    record_dic = peek_cont(lines, ofs, header_peek.keys, **parser_state["read_opts"])
+    # variables of a record with unexpected control fields remain unbound
+    matching_ctrl = all(
+        expval == v or int(expval) == record_dic[v]
+        for v, expval in header_peek.ctrl_spec
+    )
+    journal = []
+    if matching_ctrl:
+        loop_vars["__journal"] = journal
+        try:
+            for field in header_peek.fields:
+                # variables already known keep their value
+                if get_field_vv(field, datadic, loop_vars, False)[2] is not None:
+                    set_field_value(field, record_dic[field.key], datadic, loop_vars)
+        finally:
+            del loop_vars["__journal"]
+    try:
+        disj = get_child(if_head, "disjunction")
+        truthval = determine_truthvalue(disj, datadic, loop_vars, missing_as_false=True)
+    finally:
+        if len(journal) > 0:
+            undo_journal(journal)
+            invalidate_abbreviations(loop_vars)
+    return truthval
+
+
+def invalidate_abbreviations(loop_vars):
+    # cached values may depend on variables bound during a lookahead
+    for abbrev in loop_vars.get("__abbrevs", {}).values():
+        while abbrev is not None:
+            abbrev.invalidate()
+            abbrev = abbrev.shadowed
+
+
 def should_proceed(datadic, loop_vars, action_type):
     if "__lookahead" in loop_vars:
         if loop_vars["__lookahead"] == 0:
@@ -342,7 +431,8 @@ def perform_lookahead(
     if_head = get_child(tree, "if_head")
     if_body = get_child(tree, "if_body")
     orig_parser_state = get_parser_state()
-    write_info("Start lookahead for if head " + reconstruct_tree_str(if_head))
+    if info_enabled():
+        write_info("Start lookahead for if head " + reconstruct_tree_str(if_head))
     lookahead_option = get_child(tree, "lookahead_option", nofail=True)
     lookahead_expr = get_child(lookahead_option, "expr")
     lookahead = eval_expr_without_unknown_var(lookahead_expr, datadic, loop_vars)
@@ -357,23 +447,37 @@ def perform_lookahead(
             "Nested if statements with several " + "lookahead options are not allowed"
         )
 
-    # we want to save the state of the parser
-    # before the lookahead to rewind it afterwards
-    new_parser_state = deepcopy(orig_parser_state)
+    # the state of the parser is saved before the lookahead to rewind
+    # it afterwards. Only the objects modified by the lookahead itself
+    # are copied, the changes to the dictionaries are recorded in
+    # a journal and undone in undo_lookahead_changes
+    new_parser_state = orig_parser_state.copy()
+    new_parser_state["logbuffer_state"] = orig_parser_state["logbuffer_state"].copy()
+    new_parser_state["logbuffer_state"]["buffer"] = list(
+        orig_parser_state["logbuffer_state"]["buffer"]
+    )
     # less strict parsing in lookahead.
     # problems will be captured later on (if requested by user)
     # when if body will be selected and executed
-    new_parse_opts = new_parser_state["parse_opts"]
+    new_parse_opts = new_parser_state["parse_opts"].copy()
     new_parse_opts["ignore_all_mismatches"] = True
-    set_parser_state(new_parser_state)
-    datadic = new_parser_state["datadic"]
-    loop_vars = new_parser_state["loop_vars"]
+    new_parser_state["parse_opts"] = new_parse_opts
+    loop_vars = loop_vars.copy()
+    loop_vars["__scopes"] = list(loop_vars.get("__scopes", (datadic,)))
+    loop_vars["__abbrevs"] = loop_vars.get("__abbrevs", {}).copy()
+    loop_vars["__journal"] = []
     loop_vars["__lookahead"] = lookahead
+    new_parser_state["loop_vars"] = loop_vars
+    set_parser_state(new_parser_state)
 
     try:
         tree_handler(if_body)
     except UnexpectedControlRecordError:
         pass
+    except BaseException:
+        # the state before the lookahead is restored for any other error
+        undo_lookahead_changes(datadic, loop_vars, orig_parser_state, set_parser_state)
+        raise
 
     del loop_vars["__lookahead"]
     return datadic, loop_vars, orig_parser_state
@@ -381,7 +485,9 @@ def perform_lookahead(
 
 def undo_lookahead_changes(datadic, loop_vars, orig_parser_state, set_parser_state):
     if orig_parser_state is not None:
+        undo_journal(loop_vars.pop("__journal"))
         set_parser_state(orig_parser_state)
         datadic = orig_parser_state["datadic"]
         loop_vars = orig_parser_state["loop_vars"]
+        invalidate_abbreviations(loop_vars)
     return datadic, loop_vars
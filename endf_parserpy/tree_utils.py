@@ -3,35 +3,135 @@
 # Author(s):       Georg Schnabel
 # Email:           g.schnabel@iaea.org
 # Creation date:   2022/05/30
-# Last modified:   2022/05/30
+# Last modified:   2026/10/16
 # License:         MIT
 # Copyright (c) 2022 International Atomic Energy Agency (IAEA)
 #
 ############################################################
 
-from lark.tree import Tree
-from lark.lexer import Token
+from sys import intern
+
+
+_no_children = ()
+_child_index_cache = {}
+
+
+def _get_child_index(child_names):
+    # nodes with the same sequence of child names share the same index
+    child_index = _child_index_cache.get(child_names, None)
+    if child_index is None:
+        child_index = {}
+        for pos, name in enumerate(child_names):
+            child_index.setdefault(name, pos)
+        _child_index_cache[child_names] = child_index
+    return child_index
+
+
+class RecipeToken:
+    """Compact token of a compiled ENDF-6 recipe.
+
+    Corresponds to a ``lark.Token`` but only stores
+    the (interned) token type and value. Information derived from
+    the token when the recipe is executed is kept in ``cache``,
+    which is not pickled.
+    """
+
+    __slots__ = ("type", "value", "cache")
+
+    def __init__(self, type, value):
+        self.type = intern(str(type))
+        self.value = intern(str(value))
+        self.cache = None
+
+    def __reduce__(self):
+        return (RecipeToken, (self.type, self.value))
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return f"RecipeToken({self.type!r}, {self.value!r})"
+
+
+class RecipeNode:
+    """Compact node of a compiled ENDF-6 recipe.
+
+    Corresponds to a ``lark.Tree`` with the (interned) rule name
+    stored in ``data`` and the child nodes in ``children``.
+    In addition, the children are available split into
+    ``tokens`` and ``subtrees``, and ``child_index`` maps the name
+    of a child to the position of the first child with that name.
+    Information derived from the node when the recipe is executed,
+    e.g., the compiled expressions, is kept in ``cache``.
+    Only ``data`` and ``children`` are stored when pickled,
+    the other attributes are derived upon construction.
+    """
+
+    __slots__ = ("data", "children", "tokens", "subtrees", "child_index", "cache")
+
+    def __init__(self, data, children):
+        self.data = intern(str(data))
+        self.cache = None
+        children = tuple(children)
+        self.children = children
+        names = []
+        subtrees = []
+        tokens = []
+        for c in children:
+            if type(c) is RecipeNode:
+                names.append(c.data)
+                subtrees.append(c)
+            else:
+                names.append(c.type)
+                tokens.append(c)
+        self.child_index = _get_child_index(tuple(names))
+        # avoid additional tuples if all children are of the same kind
+        if len(tokens) == 0:
+            self.subtrees = children
+            self.tokens = _no_children
+        elif len(subtrees) == 0:
+            self.subtrees = _no_children
+            self.tokens = children
+        else:
+            self.subtrees = tuple(subtrees)
+            self.tokens = tuple(tokens)
+
+    def __reduce__(self):
+        return (RecipeNode, (self.data, self.children))
+
+    def __repr__(self):
+        return f"RecipeNode({self.data!r}, {list(self.children)!r})"
+
+
+def compact_tree(tree):
+    """Convert a ``lark`` parse tree into RecipeNode and RecipeToken objects."""
+    if hasattr(tree, "children"):
+        return RecipeNode(tree.data, [compact_tree(ch) for ch in tree.children])
+    else:
+        return RecipeToken(tree.type, tree.value)
 
 
 def is_token(tree):
-    return type(tree) == Token
+    return type(tree) is RecipeToken
 
 
 def is_tree(tree):
-    return type(tree) == Tree
+    return type(tree) is RecipeNode
 
 
 def get_name(tree, nofail=False):
-    if type(tree) == Token:
-        return str(tree.type)
-    if type(tree) == Tree:
-        return str(tree.data)
+    tree_type = type(tree)
+    if tree_type is RecipeToken:
+        return tree.type
+    if tree_type is RecipeNode:
+        return tree.data
     else:
         if nofail:
             return None
         else:
             raise TypeError(
-                f"argument should have type Token or Tree " f"but has type {type(tree)}"
+                f"argument should have type RecipeToken or RecipeNode "
+                f"but has type {type(tree)}"
             )
 
 
@@ -44,9 +144,9 @@ def get_child_names(tree):
 
 
 def get_child(tree, name, nofail=False):
-    for child in tree.children:
-        if get_name(child) == name:
-            return child
+    pos = tree.child_index.get(name, None)
+    if pos is not None:
+        return tree.children[pos]
     if nofail:
         return None
     else:
@@ -54,10 +154,9 @@ def get_child(tree, name, nofail=False):
 
 
 def get_child_value(tree, name):
-    for child in tree.children:
-        if is_token(child):
-            if get_name(child) == name:
-                return child.value
+    pos = tree.child_index.get(name, None)
+    if pos is not None and type(tree.children[pos]) is RecipeToken:
+        return tree.children[pos].value
     raise IndexError(f"child with name {name} not found")
 
 
@@ -91,14 +190,25 @@ def retrieve_value(tree, name):
 
 
 def reconstruct_tree_str(tree):
-    if type(tree) == Tree:
+    if type(tree) is RecipeNode:
         curstr = ""
         for child in tree.children:
             curstr += reconstruct_tree_str(child)
             curstr += " "
         curstr = curstr[:-1]
         return curstr
-    elif type(tree) == Token:
+    elif type(tree) is RecipeToken:
         return tree.value
     else:
         raise TypeError("neither token nor tree, what nightmare for a bee!")
+
+
+def is_equal_tree(tree1, tree2):
+    """Check if two trees have the same structure and content."""
+    if type(tree1) is not type(tree2):
+        return False
+    if type(tree1) is RecipeToken:
+        return tree1.type == tree2.type and tree1.value == tree2.value
+    if tree1.data != tree2.data or len(tree1.children) != len(tree2.children):
+        return False
+    return all(is_equal_tree(c1, c2) for c1, c2 in zip(tree1.children, tree2.children))
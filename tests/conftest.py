@@ -1,4 +1,6 @@
 from pathlib import Path
+import pytest
+from endf_parserpy.endf_recipe_utils import create_recipe_bundle
 
 
 def pytest_addoption(parser):
@@ -19,6 +21,8 @@ def pytest_addoption(parser):
     parser.addoption("--ignore_blank_lines", action="store", default="False")
     parser.addoption("--ignore_send_records", action="store", default="False")
     parser.addoption("--ignore_missing_tpid", action="store", default="False")
+    # backends of the parser, comma-separated
+    parser.addoption("--backend", action="store", default="interpreter,codegen")
 
 
 def pytest_generate_tests(metafunc):
@@ -53,6 +57,10 @@ def pytest_generate_tests(metafunc):
             argval = argval == "true"
             metafunc.parametrize(curopt, [argval], scope="module")
 
+    if "backend" in metafunc.fixturenames:
+        backends = metafunc.config.option.backend.split(",")
+        metafunc.parametrize("backend", backends, scope="module")
+
     # to selectively test MF sections and MF/MT subsections
     if "mf_sel" in metafunc.fixturenames:
         if metafunc.config.option.mf is not None:
@@ -60,3 +68,10 @@ def pytest_generate_tests(metafunc):
         else:
             argval = None
         metafunc.parametrize("mf_sel", [argval], scope="module")
+
+
+@pytest.fixture(scope="session")
+def recipe_bundle_path(tmp_path_factory):
+    bundle_path = str(tmp_path_factory.mktemp("bundle") / "bundle.pkl")
+    create_recipe_bundle(bundle_path)
+    return bundle_path
@@ -0,0 +1,225 @@
+import gc
+import pytest
+from endf_parserpy import endf_recipe_utils
+from endf_parserpy.endf_recipe_utils import compile_recipe, get_recipe_parser
+from endf_parserpy.endf_mapping_utils import (
+    Abbreviation,
+    compile_expr,
+    eval_expr,
+    eval_expr_without_unknown_var,
+    get_indexquants,
+    get_varname,
+    journal_assignment,
+    undo_journal,
+)
+from endf_parserpy.endf_mapping_core import (
+    RecordField,
+    compile_record_fields,
+    map_record_fields,
+    set_field_value,
+)
+from endf_parserpy.meta_control_utils import evaluate_if_statement
+from endf_parserpy.tree_utils import RecipeNode, RecipeToken, get_child, get_name
+from endf_parserpy.custom_exceptions import (
+    InvalidIntegerError,
+    LoopVariableError,
+    SeveralUnboundVariablesError,
+    VariableInDenominatorError,
+    VariableNotFoundError,
+)
+
+
+@pytest.fixture(scope="module")
+def exprs():
+    recipe_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+    recipe = (
+        "[MAT, 1, MT/ 2*(NP+1), -3/2, 4-2*3, N % 4, C[i], NP/(1+1)]CONT\n"
+        "[MAT, 1, MT/ 1/NP, NP*N, 0, 0, 0, 0]CONT\n"
+    )
+    tree = compile_recipe(recipe, recipe_parser)
+    exprs = []
+    for code_token in tree.children:
+        record = code_token.children[0].children[0]
+        record_fields = get_child(record, "record_fields")
+        exprs.extend(ch for ch in record_fields.children if get_name(ch) == "expr")
+    return exprs
+
+
+def test_compiled_expressions_cached(exprs):
+    for expr in exprs:
+        assert compile_expr(expr) is compile_expr(expr)
+
+
+def test_constant_subexpressions_folded(exprs):
+    assert compile_expr(exprs[2])(None, None, True, True, True) == (-2, 0, None)
+    # division of ints depends on cast_int so it must not be folded
+    assert eval_expr(exprs[1], cast_int=False) == (-1.5, 0, None)
+    with pytest.raises(InvalidIntegerError):
+        eval_expr(exprs[1], cast_int=True)
+
+
+def test_expression_with_unbound_variable(exprs):
+    const, coeff, unbound_var = eval_expr(exprs[0], {})
+    assert (const, coeff) == (2, 2)
+    assert unbound_var.children[0].value == "NP"
+    assert eval_expr(exprs[0], {"NP": 3}) == (8, 0, None)
+    assert eval_expr(exprs[5], {"NP": 6}) == (3, 0, None)
+    assert eval_expr(exprs[5], {}, cast_int=False)[:2] == (0, 0.5)
+    with pytest.raises(VariableNotFoundError):
+        eval_expr_without_unknown_var(exprs[0], {})
+
+
+def test_expression_with_array_and_loop_variables(exprs):
+    datadic = {"C": {1: 5.0}, "N": 9}
+    loop_vars = {"i": 1, "__scopes": [{"NP": 1}, datadic]}
+    assert eval_expr(exprs[4], datadic, loop_vars) == (5.0, 0, None)
+    assert eval_expr(exprs[4], datadic, {"i": 2})[:2] == (0, 1)
+    assert eval_expr(exprs[3], datadic) == (1, 0, None)
+    assert eval_expr(exprs[0], datadic, loop_vars) == (4, 0, None)
+    assert eval_expr(exprs[0], datadic, loop_vars, look_up=False)[:2] == (2, 2)
+    with pytest.raises(LoopVariableError):
+        eval_expr(exprs[3], datadic, {"N": 2})
+
+
+def test_expression_errors(exprs):
+    with pytest.raises(SeveralUnboundVariablesError):
+        eval_expr(exprs[3], {})
+    with pytest.raises(SeveralUnboundVariablesError):
+        eval_expr(exprs[7], {})
+    assert eval_expr(exprs[7], {"N": 2})[:2] == (0, 2)
+    datadic = {"C": {1: 1.5}}
+    loop_vars = {"i": 1, "__abbrevs": {"NP": Abbreviation("NP", exprs[4], datadic)}}
+    assert eval_expr(exprs[0], datadic, loop_vars) == (5.0, 0, None)
+    with pytest.raises(VariableInDenominatorError):
+        eval_expr(exprs[6], {})
+    assert eval_expr(exprs[6], {"NP": 4.0}) == (0.25, 0, None)
+
+
+def test_record_fields_mapped_in_solvable_order():
+    recipe_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+    recipe = "[MAT, 3, MT/ 0.0, E, LG, 0, (LG+1)*NT, NT]CONT\n"
+    tree = compile_recipe(recipe, recipe_parser)
+    record_node = tree.children[0].children[0].children[0]
+    expr_list = get_child(record_node, "record_fields").children
+    basekeys = ("C1", "C2", "L1", "L2", "N1", "N2")
+    fields = compile_record_fields(expr_list, basekeys)
+    assert [f.key for f in fields] == ["C1", "C2", "L1", "L2", "N1", "N2"]
+    # (LG+1)*NT contains two unknown variables unless NT is read first
+    recipe = "[MAT, 3, MT/ 0.0, E, 0, 0, (LG+1)*NT, NT]CONT\n"
+    tree = compile_recipe(recipe, recipe_parser)
+    record_node = tree.children[0].children[0].children[0]
+    expr_list = get_child(record_node, "record_fields").children
+    fields = compile_record_fields(expr_list, basekeys)
+    assert [f.key for f in fields] == ["C1", "C2", "L1", "L2", "N2", "N1"]
+    record_dic = {"C1": 0.0, "C2": 2.5, "L1": 0, "L2": 0, "N1": 12, "N2": 4}
+    datadic = map_record_fields(fields, record_dic, {}, {}, "read")
+    assert datadic == {"E": 2.5, "LG": 2, "NT": 4}
+    assert map_record_fields(fields, {}, datadic, {}, "write") == record_dic
+
+
+def test_variable_names_and_indices_cached(exprs):
+    extvarname = exprs[4].children[0].children[0].children[0]
+    assert get_varname(extvarname) == "C"
+    indexquants = get_indexquants(extvarname)
+    assert [t.value for t in indexquants] == ["i"]
+    assert get_indexquants(extvarname) is indexquants
+    assert get_varname(exprs[2]) is None and get_indexquants(exprs[2]) is None
+    assert get_varname(exprs[0]) == "NP" and get_indexquants(exprs[0]) is None
+
+
+def test_node_caches_released_with_recipe():
+    def count_nodes():
+        gc.collect()
+        return sum(1 for obj in gc.get_objects() if type(obj) is RecipeNode)
+
+    recipe_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+    num_nodes = count_nodes()
+    recipe = "[MAT, 3, MT/ 0.0, E, 0, 0, (LG+1)*NT, NT]CONT\n"
+    tree = compile_recipe(recipe, recipe_parser)
+    record_node = tree.children[0].children[0].children[0]
+    for expr in get_child(record_node, "record_fields").subtrees:
+        get_varname(expr)
+        get_indexquants(expr)
+        compile_expr(expr)
+    assert "compiled" in expr.cache
+    assert count_nodes() > num_nodes
+    del tree, record_node, expr
+    assert count_nodes() == num_nodes
+
+
+def test_abbreviation_values_cached(exprs):
+    datadic = {"C": {1: 1.5, 2: 2.5}}
+    abbrev = Abbreviation("NP", exprs[4], datadic)
+    assert abbrev.depnames == ("C", "i")
+    loop_vars = {"i": 1, "__abbrevs": {"NP": abbrev}}
+    assert eval_expr(exprs[0], datadic, loop_vars) == (5.0, 0, None)
+    datadic["C"][1] = 3.5
+    # the value is reused as long as the loop variable is the same
+    assert eval_expr(exprs[0], datadic, loop_vars) == (5.0, 0, None)
+    loop_vars["i"] = 2
+    assert eval_expr(exprs[0], datadic, loop_vars) == (7.0, 0, None)
+    loop_vars["i"] = 1
+    abbrev.invalidate()
+    assert eval_expr(exprs[0], datadic, loop_vars) == (9.0, 0, None)
+    # values depending on unbound variables are not cached
+    loop_vars["i"] = 3
+    assert eval_expr(exprs[0], datadic, loop_vars)[:2] == (2, 2)
+    datadic["C"][3] = 0.5
+    assert eval_expr(exprs[0], datadic, loop_vars) == (3.0, 0, None)
+
+
+def test_changes_during_lookahead_undone():
+    datadic = {"NP": 2, "X": {1: 0.5}}
+    loop_vars = {"i": 2, "__journal": []}
+    field = RecordField(None, RecipeToken("VARNAME", "E"))
+    set_field_value(field, 1.5, datadic, loop_vars)
+    journal_assignment(datadic, ("X", 2), loop_vars)
+    datadic["X"][2] = 2.5
+    journal_assignment(datadic, ("Y", 1, 1), loop_vars)
+    datadic["Y"] = {1: {1: 3.5}}
+    journal_assignment(datadic, ("NP",), loop_vars)
+    datadic["NP"] = 3
+    assert len(loop_vars["__journal"]) == 4
+    undo_journal(loop_vars["__journal"])
+    assert datadic == {"NP": 2, "X": {1: 0.5}}
+    assert loop_vars["__journal"] == []
+
+
+def test_lookahead_state_restored_on_error():
+    recipe_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+    recipe = (
+        "if NP > 0 [lookahead=1]:\n"
+        "    [MAT, 1, MT/ NP, 0.0, 0, 0, 0, 0]CONT\n"
+        "endif\n"
+    )
+    tree = compile_recipe(recipe, recipe_parser)
+    if_statement = tree.children[0].children[0].children[0]
+    datadic = {"NP": 1}
+    loop_vars = {}
+    parser_state = {
+        "datadic": datadic,
+        "loop_vars": loop_vars,
+        "parse_opts": {},
+        "logbuffer_state": {"buffer": []},
+        "rwmode": "read",
+    }
+    parser_states = [parser_state]
+
+    def failing_tree_handler(tree):
+        state = parser_states[-1]
+        journal_assignment(state["datadic"], ("NP",), state["loop_vars"])
+        state["datadic"]["NP"] = 5
+        raise KeyError("failure during lookahead")
+
+    with pytest.raises(KeyError):
+        evaluate_if_statement(
+            if_statement,
+            datadic,
+            loop_vars,
+            failing_tree_handler,
+            parser_states.append,
+            lambda: parser_states[-1],
+        )
+    assert parser_states[-1] is parser_state
+    assert datadic == {"NP": 1}
+    assert loop_vars == {}
@@ -0,0 +1,235 @@
+import logging
+import pytest
+from endf_parserpy import EndfParser
+from endf_parserpy import endf_mappings
+from endf_parserpy.logging_utils import MismatchDiagnostics
+from endf_parserpy.custom_exceptions import (
+    NumberMismatchError,
+    UnavailableIndexError,
+)
+
+
+matrix_recipe = """
+[MAT, 3, MT/ ZA, AWR, 0, 0, 0, 0]HEAD
+[MAT, 3, MT/ 0.0, 0.0, 0, 0, NT, NE/
+    {E[k]}{k=1 to NE}
+    {{F[k,kp]}{kp=1 to NE-1}}{k=1 to NE-1} ]LIST
+[MAT, 3, MT/ 0.0, 0.0, 0, 0, 2*NP, NP/
+    {X[i], Y[i]}{i=1 to NP} ]LIST
+[MAT, 3, MT/ 0.0, 0.0, 0, 0, NP, 0/
+    {X[i]}{i=1 to NP} ]LIST
+SEND
+"""
+
+
+def get_datadic(ne):
+    np = 3
+    datadic = {
+        "MAT": 1,
+        "MF": 3,
+        "MT": 1,
+        "ZA": 1001.0,
+        "AWR": 0.9992,
+        "NE": ne,
+        "NT": ne + (ne - 1) ** 2,
+        "E": {k: float(k) for k in range(1, ne + 1)},
+        "F": {
+            k: {kp: float(k * 100 + kp) for kp in range(1, ne)} for k in range(1, ne)
+        },
+        "NP": np,
+        "X": {i: 0.5 * i for i in range(1, np + 1)},
+        "Y": {i: 2.5 * i for i in range(1, np + 1)},
+    }
+    if ne == 1:
+        # no values are assigned to F
+        del datadic["F"]
+    return datadic
+
+
+def create_parser(backend, recipe=matrix_recipe, **kwargs):
+    return EndfParser(
+        recipes={3: {1: recipe}},
+        ignore_missing_tpid=True,
+        cache_dir=False,
+        print_cache_info=False,
+        backend=backend,
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("ne", (1, 2, 5))
+def test_list_loops_mapped_in_bulk(backend, ne):
+    parser = create_parser(backend)
+    lines = parser.write({3: {1: get_datadic(ne)}})
+    endf_dic = parser.parse(lines)
+    assert endf_dic[3][1] == get_datadic(ne)
+    assert parser.write(endf_dic) == lines
+
+
+@pytest.mark.parametrize("check_arrays", (True, False))
+def test_list_loops_written_in_bulk(monkeypatch, check_arrays):
+    results = []
+    orig_map_list_loop_bulk = endf_mappings.map_list_loop_bulk
+
+    def recording_map_list_loop_bulk(*args, **kwargs):
+        results.append(orig_map_list_loop_bulk(*args, **kwargs))
+        return results[-1]
+
+    monkeypatch.setattr(
+        endf_mappings, "map_list_loop_bulk", recording_map_list_loop_bulk
+    )
+    parser = create_parser("interpreter", check_arrays=check_arrays)
+    datadic = get_datadic(3)
+    parser.write({3: {1: datadic}})
+    assert len(results) == 5
+    assert all(r is not None for r in results)
+    if check_arrays:
+        # the values not written are still detected
+        datadic["X"][4] = 2.0
+        with pytest.raises(IndexError, match="X/4 was not accessed"):
+            parser.write({3: {1: datadic}})
+
+
+def test_list_loop_values_checked_against_present_values(backend):
+    parser = create_parser(backend)
+    lines = parser.write({3: {1: get_datadic(3)}})
+    # the last LIST record contains X[1] to X[3] again
+    assert lines[7].startswith(" 5.000000-1 1.000000+0 1.500000+0")
+    lines[7] = " 9" + lines[7][2:]
+    with pytest.raises(NumberMismatchError):
+        parser.parse(lines)
+
+
+def test_record_log_rendered_on_failure(backend, caplog):
+    parser = create_parser(backend, log_mismatches=True)
+    orig_lines = parser.write({3: {1: get_datadic(3)}})
+    lines = orig_lines.copy()
+    lines[7] = " 9" + lines[7][2:]
+    with pytest.raises(NumberMismatchError) as exc_info:
+        parser.parse(lines)
+    record_spec = "[ MAT , 3 , MT / 0.0 , 0.0 , 0 , 0 , NP , 0 / \n"
+    errmsg = str(exc_info.value)
+    assert "-------- Line 6 -----------\nTemplate:  " + record_spec in errmsg
+    assert f'Line:     "{lines[6].rstrip()}"' in errmsg
+    # a mismatch of a zero in the header only yields a warning
+    lines[7] = orig_lines[7]
+    lines[6] = " 9.000000+0" + lines[6][11:]
+    with caplog.at_level(logging.WARNING):
+        parser.parse(lines)
+    # no diagnostics are produced if they are switched off
+    assert all(r.levelno >= logging.WARNING for r in caplog.records)
+    assert caplog.messages[-2].startswith("Record specification: " + record_spec)
+    assert caplog.messages[-1] == "Offending line: " + lines[6].rstrip()
+    caplog.clear()
+    with caplog.at_level(logging.INFO):
+        parser.parse(lines)
+    assert "Variable names in this record: NT: 7, NE: 3" in caplog.messages
+
+
+def test_tolerated_mismatches_summarized(backend, caplog):
+    parser = create_parser(backend)
+    lines = parser.write({3: {1: get_datadic(3)}})
+    # zeros in the headers of the three LIST records
+    for idx in (1, 4, 6):
+        lines[idx] = " 9.000000+0" + lines[idx][11:]
+    with caplog.at_level(logging.WARNING):
+        endf_dic = parser.parse(lines)
+    assert endf_dic[3][1] == get_datadic(3)
+    assert len(caplog.messages) == 1
+    assert caplog.messages[0].startswith("3 mismatches tolerated during parsing")
+    summary = parser.mismatch_diagnostics.summary()
+    assert summary["total"] == 3
+    assert summary["counts"] == {"zero": {(3, 1): 3}}
+    sample = summary["samples"][1]
+    assert sample["type"] == "zero" and sample["section"] == (3, 1)
+    assert sample["line"] == lines[4].rstrip()
+    assert "9.0" in sample["message"]
+    # the samples are bounded, the counts accumulate over the parse calls
+    diagnostics = MismatchDiagnostics(max_samples=2)
+    parser.parse(lines, diagnostics=diagnostics)
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        parser.parse(lines, diagnostics=diagnostics)
+    # the warning only reports the mismatches of the last call
+    assert caplog.messages[0].startswith("3 mismatches tolerated during parsing")
+    assert "(zero: 3)" in caplog.messages[0]
+    assert parser.mismatch_diagnostics is diagnostics
+    summary = diagnostics.summary()
+    assert summary["total"] == 6 and len(summary["samples"]) == 2
+
+
+def test_log_mismatches_option_appended_to_signature():
+    # the positions of the options before it remain the same
+    parser = EndfParser(False, True, False, False, cache_dir=False)
+    assert parser.parse_opts["fuzzy_matching"] is False
+    assert parser.parse_opts["log_mismatches"] is False
+
+
+def test_list_loop_missing_value_reported(backend):
+    parser = create_parser(backend)
+    datadic = get_datadic(4)
+    del datadic["F"][2][3]
+    with pytest.raises(UnavailableIndexError, match="index 3 does not exist"):
+        parser.write({3: {1: datadic}})
+
+
+section_recipe = """
+[MAT, 3, MT/ ZA, AWR, 0, 0, NS, 0]HEAD
+for k=1 to NS:
+(subsection[k])
+    [MAT, 3, MT/ 0.0, E, 0, 0, NX, 0/
+        {X[i]}{i=1 to NS} ]LIST (table)
+(/subsection[k])
+endfor
+SEND
+"""
+
+
+def test_outer_variables_found_without_bookkeeping_keys(backend):
+    parser = create_parser(backend, recipe=section_recipe)
+    datadic = {"MAT": 1, "MF": 3, "MT": 1, "ZA": 1001.0, "AWR": 0.9992, "NS": 2}
+    datadic["subsection"] = {
+        k: {"E": 1.5 * k, "NX": 2, "table": {"X": {1: 0.5 * k, 2: 2.5 * k}}}
+        for k in (1, 2)
+    }
+    lines = parser.write({3: {1: datadic}})
+    # the section dictionaries are left unchanged
+    subsection = {"E": 1.5, "NX": 2, "table": {"X": {1: 0.5, 2: 2.5}}}
+    assert datadic["subsection"][1] == subsection
+    endf_dic = parser.parse(lines)
+    assert endf_dic[3][1] == datadic
+    assert parser.write(endf_dic) == lines
+
+
+abbreviation_recipe = """
+[MAT, 3, MT/ ZA, AWR, 0, 0, NS, 0]HEAD
+for k=1 to NS:
+(subsection[k])
+    NT := NE*(NE+1)/2
+    [MAT, 3, MT/ 0.0, 0.0, 0, 0, NT, NE/
+        {{F[i,j]}{j=i to NE}}{i=1 to NE} ]LIST
+(/subsection[k])
+endfor
+SEND
+"""
+
+
+def test_abbreviations_not_stored_in_sections(backend):
+    parser = create_parser(backend, recipe=abbreviation_recipe)
+    datadic = {"MAT": 1, "MF": 3, "MT": 1, "ZA": 1001.0, "AWR": 0.9992, "NS": 2}
+    datadic["subsection"] = {
+        k: {
+            "NE": k + 1,
+            "F": {
+                i: {j: float(i * j) for j in range(i, k + 2)} for i in range(1, k + 2)
+            },
+        }
+        for k in (1, 2)
+    }
+    lines = parser.write({3: {1: datadic}})
+    assert lines[1].startswith(
+        " 0.000000+0 0.000000+0          0          0          3"
+    )
+    endf_dic = parser.parse(lines)
+    assert endf_dic[3][1] == datadic
+    assert parser.write(endf_dic) == lines
@@ -21,6 +21,7 @@ def myEndfParser(
     ignore_blank_lines,
     ignore_send_records,
     ignore_missing_tpid,
+    backend,
 ):
     return EndfParser(
         ignore_zero_mismatch=ignore_zero_mismatch,
@@ -35,6 +36,7 @@ def myEndfParser(
         ignore_blank_lines=ignore_blank_lines,
         ignore_send_records=ignore_send_records,
         ignore_missing_tpid=ignore_missing_tpid,
+        backend=backend,
     )
 
 
@@ -0,0 +1,152 @@
+import os
+import pytest
+from endf_parserpy import endf_recipe_utils
+from endf_parserpy.endf_recipe_utils import (
+    RecipeTreeDict,
+    clear_recipe_registry,
+    compile_recipe,
+    get_recipe_cache_filename,
+    get_recipe_hash,
+    get_recipe_parser,
+    get_recipe_parsetree,
+    load_recipe_bundle,
+    create_recipe_bundle,
+)
+from endf_parserpy.endf_recipe_analysis import analyze_recipe
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+
+
+@pytest.fixture(scope="module")
+def recipe_parser():
+    return get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+
+
+def analyze(recipe, recipe_parser):
+    tree = compile_recipe(recipe, recipe_parser)
+    return tree, analyze_recipe(tree)
+
+
+def get_node_ids(tree):
+    node_ids = {id(tree)}
+    for ch in tree.subtrees:
+        node_ids.update(get_node_ids(ch))
+    return node_ids
+
+
+def get_lookaheads(recipe, recipe_parser):
+    tree, analysis = analyze(recipe, recipe_parser)
+    return list(analysis.lookaheads.values())
+
+
+def test_variables_bound_before_lookahead_known(recipe_parser):
+    recipe = (
+        "[MAT, 1, MT/ ZA, AWR, 0, 0, 2*NP, NP/\n"
+        "    {X[i], Y[i]}{i=1 to NP} ]LIST\n"
+        "if NP > 1 and X[1] > 0 and A > 0 [lookahead=1]:\n"
+        "    [MAT, 1, MT/ A, 0.0, 0, 0, 0, 0]CONT\n"
+        "endif\n"
+        "SEND\n"
+    )
+    lookahead = get_lookaheads(recipe, recipe_parser)[0]
+    assert lookahead["condition_vars"] == (("NP", ()), ("X", ("1",)), ("A", ()))
+    assert lookahead["unbound_vars"] == (("A", ()),)
+    assert lookahead["peek_fields"] == {("A", ()): "C1"}
+
+
+def test_variables_bound_in_some_branches_only(recipe_parser):
+    recipe = (
+        "[MAT, 1, MT/ 0.0, 0.0, L, 0, 0, 0]CONT\n"
+        "if L == 1:\n"
+        "    [MAT, 1, MT/ A, B, 0, 0, 0, 0]CONT\n"
+        "else:\n"
+        "    [MAT, 1, MT/ A, 0.0, 0, 0, 0, 0]CONT\n"
+        "endif\n"
+        "if A > 0 and B > 0 [lookahead=1]:\n"
+        "    [MAT, 1, MT/ 0.0, 0.0, B, 0, 0, 0]CONT\n"
+        "endif\n"
+        "SEND\n"
+    )
+    lookahead = get_lookaheads(recipe, recipe_parser)[0]
+    assert lookahead["unbound_vars"] == (("B", ()),)
+    assert lookahead["peek_fields"] == {("B", ()): "L1"}
+
+
+def test_variables_of_enclosing_sections_known(recipe_parser):
+    recipe = (
+        "[MAT, 1, MT/ ZA, AWR, L, 0, 0, 0]HEAD\n"
+        "(sub)\n"
+        "    if L > 0 and MT > 0 and Z > 0 [lookahead=1]:\n"
+        "        [MAT, 1, MT/ Z, 0.0, 0, 0, 0, 0]CONT\n"
+        "    endif\n"
+        "(/sub)\n"
+        "SEND\n"
+    )
+    lookahead = get_lookaheads(recipe, recipe_parser)[0]
+    assert lookahead["unbound_vars"] == (("Z", ()),)
+    # the variables are not all in the header of the first record
+    recipe = recipe.replace("Z, 0.0, 0", "Z*2, 0.0, 0")
+    lookahead = get_lookaheads(recipe, recipe_parser)[0]
+    assert lookahead["peek_fields"] is None
+
+
+def test_lookahead_conditions_resolved_from_first_record(recipe_parser):
+    tree, analysis = analyze(endf_recipe_dictionary[33], recipe_parser)
+    lookaheads = list(analysis.lookaheads.values())
+    assert len(lookaheads) == 5
+    peek_fields = [la["peek_fields"] for la in lookaheads]
+    assert peek_fields[0] == {("LB", ()): "L2"}
+    assert peek_fields[1] == {("LS", ()): "L1", ("LB", ()): "L2"}
+    node_ids = get_node_ids(tree)
+    assert all(id(la["first_record"]) in node_ids for la in lookaheads)
+
+
+def test_all_shipped_recipes_analyzed(recipe_parser):
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    for mf, mt in tree_dic.iter_mfmt():
+        tree = tree_dic.get_tree(mf, mt)
+        analysis = tree_dic.get_recipe_analysis(mf, mt)
+        assert analysis is tree_dic.get_recipe_analysis(mf, mt)
+        node_ids = get_node_ids(tree)
+        assert all(id(node) in node_ids for node in analysis.lookaheads)
+    assert tree_dic.get_recipe_analysis(99, 1) is None
+
+
+def test_analysis_stored_in_cache_with_tree(tmp_path):
+    cache_dir = str(tmp_path)
+    recipe = endf_recipe_dictionary[33]
+    grammar = endf_recipe_utils.endf_recipe_grammar
+    get_recipe_parsetree(recipe, grammar, cache_dir)
+    filename = get_recipe_cache_filename(
+        get_recipe_hash(grammar), get_recipe_hash(recipe)
+    )
+    cache_entry = endf_recipe_utils.load_cached_recipe(
+        os.path.join(cache_dir, filename)
+    )
+    tree, analysis = cache_entry["tree"], cache_entry["analysis"]
+    # the analysis refers to the nodes of the loaded parse tree
+    node_ids = get_node_ids(tree)
+    assert len(analysis.lookaheads) == 5
+    assert all(id(node) in node_ids for node in analysis.lookaheads)
+    tree, analysis = get_recipe_parsetree(
+        recipe, grammar, cache_dir, with_analysis=True
+    )
+    assert all(id(node) in get_node_ids(tree) for node in analysis.lookaheads)
+
+
+def test_analysis_in_recipe_bundle(tmp_path, monkeypatch):
+    bundle_path = str(tmp_path / "bundle.pkl")
+    create_recipe_bundle(bundle_path, recipe_dic={33: endf_recipe_dictionary[33]})
+    monkeypatch.setattr(endf_recipe_utils, "default_recipe_bundle_path", bundle_path)
+    clear_recipe_registry()
+    try:
+        bundle = load_recipe_bundle(bundle_path)
+        recipe_hash = get_recipe_hash(endf_recipe_dictionary[33])
+        tree = bundle["trees"][recipe_hash]
+        analysis = bundle["analyses"][recipe_hash]
+        assert len(analysis.lookaheads) == 5
+        tree_dic = RecipeTreeDict(None, cache_dir=False)
+        assert tree_dic.get_tree(33, 1) is tree
+        statements = list(tree_dic.get_recipe_analysis(33, 1).lookaheads)
+        assert statements == list(analysis.lookaheads)
+    finally:
+        clear_recipe_registry()
@@ -0,0 +1,174 @@
+import os
+import pytest
+from endf_parserpy import EndfParser
+from endf_parserpy.endf_recipe_utils import (
+    RecipeTreeDict,
+    clear_recipe_registry,
+    get_recipe_cache_info,
+    prune_recipe_cache,
+)
+from endf_parserpy.endf_recipe_codegen import (
+    compile_recipe_functions,
+    generate_recipe_source,
+)
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+from endf_parserpy.custom_exceptions import NumberMismatchError
+
+
+recipe = """
+[MAT, 3, MT/ ZA, AWR, 0, 0, NS, 0]HEAD
+for k=1 to NS:
+    (sec[k])
+    [MAT, 3, MT/ 0.0, E, 0, 0, 2*NP, NP/
+        {X[i], {Y[i,j]}{j=1 to 2}}{i=1 to NP/2} PADLINE
+        {Z[i]}{i=1 to NP/2} ]LIST
+    (/sec[k])
+endfor
+if LB == 1 [lookahead=1]:
+    [MAT, 3, MT/ 0.0, 0.0, 0, LB, NC, 0/
+        {C[i]}{i=1 to NC} ]LIST
+elif LB == 2 [lookahead=1]:
+    [MAT, 3, MT/ 0.0, 0.0, 0, LB, NC, 0/
+        C1, C2 ]LIST
+endif
+SEND
+"""
+
+
+def get_datadic(lb):
+    datadic = {
+        "MAT": 2925,
+        "MF": 3,
+        "MT": 1,
+        "ZA": 29063.0,
+        "AWR": 62.389,
+        "NS": 2,
+        "sec": {},
+        "LB": lb,
+    }
+    for k in (1, 2):
+        datadic["sec"][k] = {
+            "E": 1.5 * k,
+            "NP": 4,
+            "X": {1: 1.0 * k, 2: 2.0},
+            "Y": {1: {1: 3.0, 2: 4.0}, 2: {1: 5.0, 2: 6.0 * k}},
+            "Z": {1: 7.0, 2: 8.0},
+        }
+    if lb == 1:
+        datadic.update({"NC": 3, "C": {1: 9.0, 2: 10.0, 3: 11.0}})
+    else:
+        datadic.update({"NC": 2, "C1": 9.0, "C2": 10.0})
+    return datadic
+
+
+@pytest.mark.parametrize("lb", (1, 2))
+def test_codegen_and_interpreter_yield_same_results(lb):
+    parsers = [
+        EndfParser(
+            recipes={3: {1: recipe}},
+            ignore_missing_tpid=True,
+            cache_dir=False,
+            print_cache_info=False,
+            backend=backend,
+        )
+        for backend in ("interpreter", "codegen")
+    ]
+    datadic = get_datadic(lb)
+    lines = parsers[0].write({3: {1: get_datadic(lb)}})
+    assert parsers[1].write({3: {1: get_datadic(lb)}}) == lines
+    for parser in parsers:
+        endf_dic = parser.parse(lines)
+        assert endf_dic[3][1] == datadic
+        assert parser.write(endf_dic) == lines
+
+
+def test_codegen_reports_inconsistent_values():
+    parser = EndfParser(
+        recipes={3: {1: recipe}},
+        ignore_missing_tpid=True,
+        cache_dir=False,
+        print_cache_info=False,
+        ignore_zero_mismatch=False,
+        backend="codegen",
+    )
+    lines = parser.write({3: {1: get_datadic(1)}})
+    # a zero is expected in the first field of the LIST record
+    lines[1] = lines[1][:4] + "9" + lines[1][5:]
+    with pytest.raises(NumberMismatchError, match="Expected 0.0 in the ENDF file"):
+        parser.parse(lines)
+
+
+def test_all_shipped_recipes_generated():
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    for mf, mt in tree_dic.iter_mfmt():
+        read_section, write_section = tree_dic.get_recipe_functions(mf, mt)
+        assert tree_dic.get_recipe_functions(mf, mt)[0] is read_section
+        assert callable(write_section)
+    assert tree_dic.get_recipe_functions(99, 1) is None
+
+
+def test_generated_modules_cached(tmp_path):
+    cache_dir = str(tmp_path)
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    program = tree_dic.get_recipe_program(6, 1)
+    source = generate_recipe_source(program)
+    assert source == generate_recipe_source(program)
+    compile_recipe_functions(program, cache_dir)
+    codegen_dir = tmp_path / "codegen"
+    module_files = [f for f in os.listdir(codegen_dir) if f.endswith(".py")]
+    assert len(module_files) == 1
+    assert (codegen_dir / module_files[0]).read_text() == source
+    assert len(os.listdir(codegen_dir / "__pycache__")) == 1
+    mtime = os.path.getmtime(codegen_dir / module_files[0])
+    compile_recipe_functions(program, cache_dir)
+    assert os.path.getmtime(codegen_dir / module_files[0]) == mtime
+
+
+def test_stale_generated_modules_pruned(tmp_path):
+    cache_dir = str(tmp_path)
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    compile_recipe_functions(tree_dic.get_recipe_program(6, 1), cache_dir)
+    codegen_dir = tmp_path / "codegen"
+    pycache_dir = codegen_dir / "__pycache__"
+    old_module = "recipe_code_" + "0" * 32
+    stale_files = [
+        codegen_dir / (old_module + ".py"),
+        codegen_dir / (old_module + "_v0.py"),
+        codegen_dir / (old_module + "_v1.py.123.456.tmp"),
+        pycache_dir / (old_module + "_v0.cpython-311.pyc"),
+        pycache_dir / ("recipe_code_" + "1" * 32 + "_v1.cpython-311.pyc"),
+    ]
+    for filepath in stale_files:
+        filepath.write_text("x")
+    # temporary files become stale after an hour
+    os.utime(stale_files[2], (0, 0))
+    info = get_recipe_cache_info(cache_dir)
+    # the generated module and its bytecode are not stale
+    assert info["num_files"] == 2 + len(stale_files)
+    assert info["num_stale_files"] == len(stale_files)
+    removed = prune_recipe_cache(cache_dir)
+    assert sorted(removed) == sorted(str(f) for f in stale_files)
+    info = get_recipe_cache_info(cache_dir)
+    assert info["num_files"] == 2
+    assert info["num_stale_files"] == 0
+
+
+def test_codegen_with_cache_dir(tmp_path):
+    clear_recipe_registry()
+    try:
+        parser = EndfParser(
+            recipes={3: {1: recipe}},
+            ignore_missing_tpid=True,
+            cache_dir=str(tmp_path),
+            backend="codegen",
+        )
+        lines = parser.write({3: {1: get_datadic(2)}})
+        assert parser.parse(lines)[3][1] == get_datadic(2)
+        assert len(os.listdir(tmp_path / "codegen" / "__pycache__")) == 1
+    finally:
+        clear_recipe_registry()
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError, match="unknown backend"):
+        EndfParser(cache_dir=False, backend="compiler")
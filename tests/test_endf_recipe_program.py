@@ -0,0 +1,217 @@
+import pytest
+from endf_parserpy import EndfParser
+from endf_parserpy import endf_recipe_utils
+from endf_parserpy.endf_recipe_utils import (
+    RecipeTreeDict,
+    compile_recipe,
+    get_recipe_parser,
+)
+from endf_parserpy.endf_recipe_program import (
+    RECORD,
+    FOR_START,
+    FOR_NEXT,
+    IF,
+    JUMP,
+    SECTION_OPEN,
+    SECTION_CLOSE,
+    ABBREVIATION,
+    compile_recipe_program,
+)
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+from endf_parserpy import meta_control_utils
+
+
+lookahead_recipe = """
+[MAT, 3, MT/ ZA, AWR, 0, 0, NS, 0]HEAD
+for k=1 to NS:
+    (sec[k])
+    [MAT, 3, MT/ 0.0, E, 0, 0, 0, 0]CONT
+    (/sec[k])
+endfor
+if LB == 1 [lookahead=2]:
+    for j=1 to 1:
+        [MAT, 3, MT/ 0.0, 0.0, 0, 0, 0, 0]CONT
+        [MAT, 3, MT/ 0.0, 0.0, 0, LB, NP, 0/
+            {X[i]}{i=1 to NP} ]LIST
+    endfor
+elif LB == 2 [lookahead=2]:
+    [MAT, 3, MT/ 0.0, 0.0, 0, 0, 0, 0]CONT
+    [MAT, 3, MT/ 0.0, 0.0, 0, LB, 2*NP, NP/
+        {X[i], Y[i]}{i=1 to NP} ]LIST
+endif
+SEND
+"""
+
+
+peek_recipe = """
+[MAT, 3, MT/ ZA, AWR, 0, 0, 0, 0]HEAD
+if LB == 1 [lookahead=1]:
+    [MAT, 3, MT/ 0.0, 0.0, 0, LB, NP, 0/
+        {X[i]}{i=1 to NP} ]LIST
+elif LB == 2 [lookahead=1]:
+    [MAT, 3, MT/ 0.0, 0.0, 0, LB, 2*NP, NP/
+        {X[i], Y[i]}{i=1 to NP} ]LIST
+endif
+SEND
+"""
+
+
+@pytest.fixture(scope="module")
+def recipe_parser():
+    return get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+
+
+def get_ops(program):
+    return [instr[0] for instr in program.instructions]
+
+
+def test_program_is_linear_with_resolved_targets(recipe_parser):
+    tree = compile_recipe(lookahead_recipe, recipe_parser)
+    program = compile_recipe_program(tree)
+    ops = get_ops(program)
+    assert ops == [
+        RECORD,
+        FOR_START,
+        SECTION_OPEN,
+        RECORD,
+        SECTION_CLOSE,
+        FOR_NEXT,
+        IF,
+        FOR_START,
+        RECORD,
+        RECORD,
+        FOR_NEXT,
+        JUMP,
+        RECORD,
+        RECORD,
+        JUMP,
+        RECORD,
+    ]
+    instructions = program.instructions
+    # the loop counter is incremented at the end of the body
+    # and the loop is left after the FOR_NEXT instruction
+    assert instructions[1][1] == "k"
+    assert instructions[1][5] == 6
+    assert instructions[5][1:3] == ("k", 2)
+    # the bodies of the branches end with a jump behind the if clause
+    if_clause, bodies, end_pc = instructions[6][1:]
+    assert sorted(bodies.values()) == [(7, 11), (12, 14)]
+    assert end_pc == 15
+    assert instructions[11] == (JUMP, 15)
+    assert instructions[14] == (JUMP, 15)
+    assert [instructions[pc][1].record_type for pc in (0, 9, 15)] == [
+        "HEAD",
+        "LIST",
+        "SEND",
+    ]
+
+
+def test_record_fields_resolved_at_compile_time(recipe_parser):
+    tree = compile_recipe(lookahead_recipe, recipe_parser)
+    program = compile_recipe_program(tree)
+    spec = program.instructions[13][1]
+    assert spec.record_type == "LIST"
+    fields = {f.key: f for f in spec.fields}
+    assert fields["C1"].is_const and fields["C1"].value == 0.0
+    assert fields["L2"].varname == "LB" and fields["L2"].indices == ()
+    # fields with an expression are evaluated by the generic code path
+    assert fields["N1"].varname is None and not fields["N1"].is_const
+    assert [f.varname for f in spec.list_body[0].body] == ["X", "Y"]
+    assert spec.list_body[0].body[0].indices == ("i",)
+
+
+def test_abbreviations_compiled_into_program(recipe_parser):
+    tree = compile_recipe(endf_recipe_dictionary[33], recipe_parser)
+    program = compile_recipe_program(tree)
+    ops = get_ops(program)
+    assert ABBREVIATION in ops
+    assert ops.count(SECTION_OPEN) == ops.count(SECTION_CLOSE)
+    assert ops.count(FOR_START) == ops.count(FOR_NEXT)
+
+
+def test_all_shipped_recipes_compiled():
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    for mf, mt in tree_dic.iter_mfmt():
+        program = tree_dic.get_recipe_program(mf, mt)
+        assert program is tree_dic.get_recipe_program(mf, mt)
+        assert len(program.instructions) > 0
+        for instr in program.instructions:
+            if instr[0] == JUMP:
+                assert instr[1] <= len(program.instructions)
+    assert tree_dic.get_recipe_program(99, 1) is None
+
+
+@pytest.mark.parametrize("lb", (1, 2))
+def test_lookahead_selects_branch_in_read_write_roundtrip(lb):
+    parser = EndfParser(
+        recipes={3: {1: lookahead_recipe}},
+        ignore_missing_tpid=True,
+        cache_dir=False,
+        print_cache_info=False,
+    )
+    datadic = {
+        "MAT": 2925,
+        "MF": 3,
+        "MT": 1,
+        "ZA": 29063.0,
+        "AWR": 62.389,
+        "NS": 2,
+        "sec": {1: {"E": 1.5}, 2: {"E": 2.5}},
+        "LB": lb,
+        "NP": 3,
+        "X": {1: 1.0, 2: 2.0, 3: 3.0},
+    }
+    if lb == 2:
+        datadic["Y"] = {1: 4.0, 2: 5.0, 3: 6.0}
+    lines = parser.write({3: {1: datadic}})
+    endf_dic = parser.parse(lines)
+    assert endf_dic[3][1] == datadic
+    assert parser.write(endf_dic) == lines
+
+
+def test_header_peeks_for_conditions_on_next_header(recipe_parser):
+    tree = compile_recipe(peek_recipe, recipe_parser)
+    program = compile_recipe_program(tree)
+    assert len(program.header_peeks) == 2
+    for header_peek in program.header_peeks.values():
+        assert header_peek.keys == ("L2",)
+        assert header_peek.fields[0].varname == "LB"
+    # LB is not in the first record read in the branches
+    tree = compile_recipe(lookahead_recipe, recipe_parser)
+    assert compile_recipe_program(tree).header_peeks == {}
+
+
+@pytest.mark.parametrize("lb", (1, 2, 3))
+def test_branch_selected_by_header_peek(backend, lb, monkeypatch):
+    def perform_lookahead(*args, **kwargs):
+        raise AssertionError("body of the branch executed for lookahead")
+
+    parser = EndfParser(
+        recipes={3: {1: peek_recipe}},
+        ignore_missing_tpid=True,
+        cache_dir=False,
+        print_cache_info=False,
+        backend=backend,
+    )
+    datadic = {
+        "MAT": 2925,
+        "MF": 3,
+        "MT": 1,
+        "ZA": 29063.0,
+        "AWR": 62.389,
+        "LB": lb,
+        "NP": 2,
+        "X": {1: 1.0, 2: 2.0},
+        "Y": {1: 4.0, 2: 5.0},
+    }
+    if lb == 1:
+        del datadic["Y"]
+    lines = parser.write({3: {1: datadic}})
+    monkeypatch.setattr(meta_control_utils, "perform_lookahead", perform_lookahead)
+    endf_dic = parser.parse(lines)
+    if lb == 3:
+        # no branch selected, the LIST record is not read
+        assert "LB" not in endf_dic[3][1]
+    else:
+        assert endf_dic[3][1] == datadic
+        assert parser.write(endf_dic) == lines
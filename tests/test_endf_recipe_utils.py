@@ -0,0 +1,353 @@
+import os
+import multiprocessing
+import shutil
+import threading
+from pathlib import Path
+import pytest
+from lark.exceptions import LarkError
+from endf_parserpy import EndfParser
+from endf_parserpy import endf_recipe_utils
+from endf_parserpy.endf_recipe_utils import (
+    RecipeTreeDict,
+    get_responsible_recipe_parsetree,
+    clear_recipe_registry,
+    create_recipe_bundle,
+    load_recipe_bundle,
+    get_recipe_parser,
+    compile_recipe,
+    get_recipe_parsetree,
+    get_registered_recipe_parsetree,
+    get_recipe_cache_filename,
+    get_recipe_cache_info,
+    prune_recipe_cache,
+    get_recipe_hash,
+    extract_variable_descriptions,
+)
+from endf_parserpy.tree_utils import compact_tree, is_equal_tree
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+
+
+@pytest.fixture(scope="function")
+def compile_counter(monkeypatch, tmp_path):
+    # disable a possibly installed recipe bundle
+    monkeypatch.setattr(
+        endf_recipe_utils, "default_recipe_bundle_path", str(tmp_path / "none.pkl")
+    )
+    clear_recipe_registry()
+    compiled = []
+    orig_get_recipe_parsetree = endf_recipe_utils.get_recipe_parsetree
+
+    def counting_get_recipe_parsetree(recipe, *args, **kwargs):
+        compiled.append(recipe)
+        return orig_get_recipe_parsetree(recipe, *args, **kwargs)
+
+    monkeypatch.setattr(
+        endf_recipe_utils, "get_recipe_parsetree", counting_get_recipe_parsetree
+    )
+    return compiled
+
+
+def test_parser_instantiation_compiles_no_recipe(compile_counter):
+    EndfParser(cache_dir=False)
+    assert len(compile_counter) == 0
+
+
+def test_recipe_compiled_on_first_request_only(compile_counter):
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    tree1 = get_responsible_recipe_parsetree(tree_dic, 3, 1)
+    tree2 = get_responsible_recipe_parsetree(tree_dic, 3, 2)
+    assert tree1 is tree2
+    assert len(compile_counter) == 1
+
+
+def test_identical_recipes_share_parsetree(compile_counter):
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    trees = [get_responsible_recipe_parsetree(tree_dic, 31, mt) for mt in (452, 455)]
+    assert trees[0] is trees[1]
+    assert len(compile_counter) == 1
+
+
+def test_concurrent_requests_compile_recipe_once(compile_counter):
+    num_threads = 4
+    barrier = threading.Barrier(num_threads)
+    trees = []
+
+    def request_tree():
+        barrier.wait()
+        tree = get_registered_recipe_parsetree(endf_recipe_dictionary[3], False)
+        trees.append(tree)
+
+    threads = [threading.Thread(target=request_tree) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(trees) == num_threads
+    assert all(tree is trees[0] for tree in trees)
+    assert len(compile_counter) == 1
+
+
+def test_excluded_sections_not_compiled(compile_counter):
+    endf_file = sorted(Path(__file__).parent.joinpath("testdata").glob("*.endf"))[0]
+    parser = EndfParser(cache_dir=False)
+    endf_dic = parser.parsefile(endf_file, include=(1,))
+    mf1_recipes = list(endf_recipe_dictionary[1].values())
+    assert len(compile_counter) > 0
+    assert all(recipe in mf1_recipes for recipe in compile_counter)
+    compile_counter.clear()
+    parser.write(endf_dic, exclude=(1,))
+    assert len(compile_counter) == 0
+
+
+def test_missing_recipe_yields_none(compile_counter):
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    assert get_responsible_recipe_parsetree(tree_dic, 99, 1) is None
+    assert get_responsible_recipe_parsetree(tree_dic, 1, 999) is None
+    assert len(compile_counter) == 0
+
+
+def test_compiled_recipes_shared_between_parsers(compile_counter):
+    tree_dic1 = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    tree_dic2 = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    tree1 = get_responsible_recipe_parsetree(tree_dic1, 3, 1)
+    tree2 = get_responsible_recipe_parsetree(tree_dic2, 3, 1)
+    assert tree1 is tree2
+    assert len(compile_counter) == 1
+
+
+def test_clear_recipe_registry_forces_recompilation(compile_counter):
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    tree1 = get_responsible_recipe_parsetree(tree_dic, 3, 1)
+    clear_recipe_registry()
+    tree2 = get_responsible_recipe_parsetree(tree_dic, 3, 1)
+    assert tree1 is not tree2
+    assert len(compile_counter) == 2
+
+
+def test_recipe_bundle_provides_default_recipes_without_compilation(
+    compile_counter, monkeypatch, recipe_bundle_path
+):
+    monkeypatch.setattr(
+        endf_recipe_utils, "default_recipe_bundle_path", recipe_bundle_path
+    )
+
+    def no_lark_parser(*args, **kwargs):
+        raise AssertionError("recipe compilation with Lark should not happen")
+
+    monkeypatch.setattr(endf_recipe_utils, "get_recipe_parser", no_lark_parser)
+    clear_recipe_registry()
+    tree_dic = RecipeTreeDict(None, cache_dir=False)
+    tree_dic.compile_all()
+    trees = [tree_dic.get_tree(31, mt) for mt in (452, 455, 456)]
+    assert trees[0] is trees[1] and trees[1] is trees[2]
+    assert tree_dic.get_tree(99, 1) is None
+    assert len(compile_counter) == 0
+
+
+def test_recipe_bundle_matches_recipe_compilation(recipe_bundle_path):
+    bundle = load_recipe_bundle(recipe_bundle_path)
+    recipe_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    for mf, mt in tree_dic.iter_mfmt():
+        recipe = tree_dic.get_recipe(mf, mt)
+        recipe_hash = endf_recipe_utils.get_recipe_hash(recipe)
+        assert is_equal_tree(
+            bundle["trees"][recipe_hash], compile_recipe(recipe, recipe_parser)
+        )
+
+
+def test_outdated_recipe_bundle_is_ignored(tmp_path):
+    bundle_path = str(tmp_path / "bundle.pkl")
+    create_recipe_bundle(bundle_path, recipe_dic={3: endf_recipe_dictionary[3]})
+    with open(bundle_path, "rb") as fr:
+        content = fr.read()
+    with open(bundle_path, "wb") as fw:
+        fw.write(content[: len(content) // 2])
+    assert load_recipe_bundle(bundle_path) is None
+    assert load_recipe_bundle(str(tmp_path / "nonexistent.pkl")) is None
+
+
+def test_recipe_sources_hash_up_to_date():
+    # update DEFAULT_RECIPE_SOURCES_HASH after modifying the default recipes
+    sources_hash = endf_recipe_utils.get_recipe_sources_hash()
+    assert sources_hash == endf_recipe_utils.DEFAULT_RECIPE_SOURCES_HASH
+
+
+def test_recipe_bundle_loaded_without_reading_recipe_sources(
+    recipe_bundle_path, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(
+        endf_recipe_utils, "default_recipe_sources_dir", str(tmp_path / "none")
+    )
+    assert load_recipe_bundle(recipe_bundle_path) is not None
+
+
+def test_recipe_bundle_of_changed_recipes_is_ignored(monkeypatch, tmp_path):
+    recipes_dir = tmp_path / "endf_recipes"
+    shutil.copytree(endf_recipe_utils.default_recipe_sources_dir, recipes_dir)
+    recipe_file = recipes_dir / "endf_recipe_mf3.py"
+    recipe_file.write_text(recipe_file.read_text().replace("SEND", "SEND\n"))
+    monkeypatch.setattr(endf_recipe_utils, "default_recipe_sources_dir", recipes_dir)
+    bundle_path = str(tmp_path / "bundle.pkl")
+    create_recipe_bundle(bundle_path, recipe_dic={3: endf_recipe_dictionary[3]})
+    assert load_recipe_bundle(bundle_path) is None
+
+
+@pytest.mark.skipif(
+    not os.path.exists(endf_recipe_utils.default_recipe_bundle_path),
+    reason="no recipe bundle has been built",
+)
+def test_installed_recipe_bundle_is_up_to_date():
+    bundle = load_recipe_bundle()
+    assert bundle is not None
+    tree_dic = RecipeTreeDict(endf_recipe_dictionary, cache_dir=False)
+    for mf, mt in tree_dic.iter_mfmt():
+        recipe_hash = endf_recipe_utils._lookup_recipe_entry(
+            bundle["recipe_index"], mf, mt
+        )
+        assert recipe_hash == endf_recipe_utils.get_recipe_hash(
+            tree_dic.get_recipe(mf, mt)
+        )
+
+
+def get_shipped_recipes():
+    recipes = {}
+    for mf, mf_recipes in endf_recipe_dictionary.items():
+        if isinstance(mf_recipes, str):
+            mf_recipes = {None: mf_recipes}
+        for mt, recipe in mf_recipes.items():
+            recipes.setdefault(recipe, (mf, mt))
+    return {mfmt: recipe for recipe, mfmt in recipes.items()}
+
+
+@pytest.fixture(scope="module")
+def lalr_and_earley_parser():
+    lalr_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar, "lalr")
+    earley_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar, "earley")
+    return lalr_parser, earley_parser
+
+
+@pytest.mark.parametrize(
+    "recipe",
+    get_shipped_recipes().values(),
+    ids=[f"MF{mf}/MT{mt}" for mf, mt in get_shipped_recipes()],
+)
+def test_lalr_and_earley_trees_are_equivalent(lalr_and_earley_parser, recipe):
+    lalr_parser, earley_parser = lalr_and_earley_parser
+    lalr_tree = compact_tree(lalr_parser.parse_lalr(recipe))
+    earley_tree = compile_recipe(recipe, earley_parser)
+    assert is_equal_tree(lalr_tree, earley_tree)
+
+
+def test_lalr_compiler_falls_back_to_earley(lalr_and_earley_parser):
+    lalr_parser, earley_parser = lalr_and_earley_parser
+    recipe = "[MAT, 3, MT/ 0.0, 0.0, 0, 0, NR, NP/2 / xs ]TAB2\nSEND\n"
+    with pytest.raises(LarkError):
+        lalr_parser.parse_lalr(recipe)
+    assert is_equal_tree(
+        compile_recipe(recipe, lalr_parser), compile_recipe(recipe, earley_parser)
+    )
+
+
+def test_unknown_recipe_compiler_is_rejected():
+    with pytest.raises(ValueError):
+        EndfParser(cache_dir=False, recipe_compiler="cyk")
+
+
+def compile_into_cache_and_count(cache_dir):
+    compiled = []
+    orig_compile_recipe = endf_recipe_utils.compile_recipe
+
+    def counting_compile_recipe(*args, **kwargs):
+        compiled.append(True)
+        return orig_compile_recipe(*args, **kwargs)
+
+    endf_recipe_utils.compile_recipe = counting_compile_recipe
+    try:
+        recipe = endf_recipe_dictionary[3]
+        get_recipe_parsetree(recipe, endf_recipe_utils.endf_recipe_grammar, cache_dir)
+    finally:
+        endf_recipe_utils.compile_recipe = orig_compile_recipe
+    return len(compiled)
+
+
+def get_cache_filepath(cache_dir, recipe):
+    grammar_hash = get_recipe_hash(endf_recipe_utils.endf_recipe_grammar)
+    filename = get_recipe_cache_filename(grammar_hash, get_recipe_hash(recipe))
+    return os.path.join(cache_dir, filename)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="processes cannot be forked",
+)
+def test_recipe_compiled_by_one_of_many_processes(tmp_path):
+    cache_dir = str(tmp_path)
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(4) as pool:
+        counts = pool.map(compile_into_cache_and_count, [cache_dir] * 8)
+    assert sum(counts) == 1
+    assert [f for f in os.listdir(cache_dir) if f.endswith(".tmp")] == []
+
+
+def test_corrupted_cache_entry_is_recompiled(tmp_path):
+    cache_dir = str(tmp_path)
+    recipe = endf_recipe_dictionary[3]
+    assert compile_into_cache_and_count(cache_dir) == 1
+    assert compile_into_cache_and_count(cache_dir) == 0
+    filepath = get_cache_filepath(cache_dir, recipe)
+    with open(filepath, "rb") as fr:
+        content = fr.read()
+    with open(filepath, "wb") as fw:
+        fw.write(content[: len(content) // 2])
+    assert compile_into_cache_and_count(cache_dir) == 1
+    assert compile_into_cache_and_count(cache_dir) == 0
+
+
+def test_prune_recipe_cache_removes_stale_entries(tmp_path):
+    cache_dir = str(tmp_path)
+    compile_into_cache_and_count(cache_dir)
+    stale_filename = "recipe_" + "0" * 32 + "_" + "1" * 32 + "_v2.pkl"
+    stale_files = [stale_filename, stale_filename + ".lock", "a" * 32 + ".pkl"]
+    for filename in stale_files + ["unrelated.txt"]:
+        with open(os.path.join(cache_dir, filename), "wb") as fw:
+            fw.write(b"x")
+    info = get_recipe_cache_info(cache_dir)
+    assert info["num_files"] == 5
+    assert info["num_stale_files"] == 3
+    assert info["stale_size"] == 3
+    removed = prune_recipe_cache(cache_dir)
+    assert sorted(os.path.basename(f) for f in removed) == sorted(stale_files)
+    info = get_recipe_cache_info(cache_dir)
+    assert info["num_files"] == 2 and info["num_stale_files"] == 0
+    assert os.path.exists(get_cache_filepath(cache_dir, endf_recipe_dictionary[3]))
+    assert os.path.exists(os.path.join(cache_dir, "unrelated.txt"))
+
+
+def test_variable_descriptions_extracted_from_recipe():
+    recipe_parser = get_recipe_parser(endf_recipe_utils.endf_recipe_grammar)
+    tree = compile_recipe(endf_recipe_dictionary[6], recipe_parser)
+    descriptions = extract_variable_descriptions(tree)
+    assert descriptions["AWR"].startswith("ratio of the mass of the material")
+    assert descriptions["subsection"]["*"]["LAW"].startswith("Flag to distinguish")
+    assert descriptions["subsection"]["*"]["NA"].startswith("Number of angular")
+
+
+def test_explain_without_parsing(compile_counter, capsys):
+    parser = EndfParser(cache_dir=False)
+    descr = parser.explain("6/5/subsection/2/LANG", stdout=False)
+    assert descr.startswith("Indicator which selects the angular representation")
+    assert parser.explain("6/5/subsection/2/LANG", stdout=False) is descr
+    assert len(compile_counter) == 1
+    assert parser.explain("6/5/nonexistent", stdout=False) is None
+    assert parser.explain("99/1/AWR", stdout=False) is None
+    parser.explain("3/1")
+    assert capsys.readouterr().out == "No description for `3/1` available\n"
+
+
+def test_recipe_bundle_contains_variable_descriptions(recipe_bundle_path):
+    bundle = load_recipe_bundle(recipe_bundle_path)
+    for recipe_hash, tree in bundle["trees"].items():
+        assert bundle["descriptions"][recipe_hash] == extract_variable_descriptions(
+            tree
+        )
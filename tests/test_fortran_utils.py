@@ -0,0 +1,199 @@
+import itertools
+import random
+import pytest
+from endf_parserpy import fortran_utils, math_utils
+from endf_parserpy.fortran_utils import (
+    float2fortstr,
+    fortstr2float,
+    read_fort_floats,
+    read_fort_float_block,
+    write_fort_floats,
+    write_fort_float_block,
+)
+from endf_parserpy.custom_exceptions import InvalidFloatError
+
+
+@pytest.fixture(params=("numpy", "line by line"))
+def kernel(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(math_utils, "_numpy", False)
+    return request.param
+
+
+def read_line_by_line(lines, num, blank=None, **read_opts):
+    vals = []
+    for ofs in range(0, num, 6):
+        vals += read_fort_floats(lines[ofs // 6], min(6, num - ofs), blank, **read_opts)
+    return vals
+
+
+def as_hex(vals):
+    # distinguishes 0.0 and -0.0
+    return [float.hex(v) for v in vals]
+
+
+def test_block_decoder_matches_fortstr2float(kernel, endf_file):
+    lines = []
+    expected_vals = []
+    for line in endf_file.read_text().splitlines():
+        fields = [line[i : i + 11] for i in range(0, 66, 11)]
+        try:
+            vals = [0.0 if f == " " * 11 else fortstr2float(f) for f in fields]
+        except (ValueError, InvalidFloatError):
+            continue
+        lines.append(line)
+        expected_vals.extend(vals)
+    assert len(lines) > 1000
+    for ofs in range(0, len(lines), 100):
+        block = lines[ofs : ofs + 100]
+        num = 6 * len(block) - 5
+        vals = read_fort_float_block(block, num, blank=0.0)
+        assert as_hex(vals) == as_hex(expected_vals[6 * ofs : 6 * ofs + num])
+
+
+irregular_fields = [
+    ["1.234567+5", "-1.234567-5", "1.23456+10", "-1.2345+100", "-0.000000+0", "3"],
+    ["1.0E+5", "1.5      ", "1.5 -3", "12345678901", ".5-3", "5."],
+    ["", "+2.5+3", "2.500000-23", "1.00000-22", "-9.99999+99", "0"],
+]
+irregular_lines = ["".join(f.rjust(11) for f in fields) for fields in irregular_fields]
+
+
+def test_block_decoder_handles_irregular_fields(kernel):
+    lines = irregular_lines * 20
+    num = 6 * len(lines)
+    expected_vals = read_line_by_line(lines, num, blank=0.0)
+    vals = read_fort_float_block(lines, num, blank=0.0)
+    assert as_hex(vals) == as_hex(expected_vals)
+    assert vals[:6] == [1.234567e5, -1.234567e-5, 1.23456e10, -1.2345e100, 0, 3]
+    assert vals[6:12] == [1e5, 1.5, 1.5e-3, 12345678901.0, 0.5e-3, 5.0]
+    # the field 1.5 -3 contains a space
+    with pytest.raises(InvalidFloatError):
+        read_fort_float_block(lines, num, blank=0.0, accept_spaces=False)
+    # blank fields are only accepted if a value for them is given
+    with pytest.raises(ValueError, match="blank encountered"):
+        read_fort_float_block(lines, num)
+    # fields beyond the end of the last line
+    vals = read_fort_float_block(lines + [" 1.000000+0 2.5+3"], num + 2, blank=0.0)
+    assert vals[-2:] == [1.0, 2500.0]
+    with pytest.raises(InvalidFloatError):
+        read_fort_float_block(lines + [" 1.000000+0"], num + 2, blank=0.0)
+    with pytest.raises(InvalidFloatError):
+        read_fort_float_block(lines + [" 1.000000+0 1.5D+3"], num + 2, blank=0.0)
+
+
+def test_block_decoder_respects_width(kernel):
+    lines = [" 1.2345678+5-1.2345678-5           3" * 2] * 20
+    vals = read_fort_float_block(lines, 120, width=12)
+    assert vals[:3] == [1.2345678e5, -1.2345678e-5, 3.0] and vals[-3:] == vals[:3]
+    # without the width, the fields are not aligned with the numbers
+    with pytest.raises(ValueError):
+        read_fort_float_block(lines, 120)
+
+
+def write_line_by_line(vals, **write_opts):
+    return [
+        write_fort_floats(vals[i : i + 6], **write_opts) for i in range(0, len(vals), 6)
+    ]
+
+
+def write_field_by_field(vals, **write_opts):
+    # numbers that cannot be formatted are left out
+    formatted_vals = []
+    fields = []
+    for v in vals:
+        try:
+            fields.append(float2fortstr(v, **write_opts))
+        except (InvalidFloatError, ZeroDivisionError):
+            continue
+        formatted_vals.append(v)
+    return formatted_vals, fields
+
+
+def random_floats(rng, num):
+    vals = []
+    for _ in range(num):
+        kind = rng.randrange(8)
+        if kind == 0:
+            # numbers with few significant digits
+            v = round(rng.uniform(0, 10), rng.randrange(8)) * 10 ** rng.randint(-6, 12)
+        elif kind == 1:
+            v = float(rng.randrange(10 ** rng.randint(1, 13)))
+        elif kind == 2:
+            v = 10.0 ** rng.randint(-120, 120)
+        elif kind == 3:
+            # numbers in the middle between two decimals
+            v = (rng.randrange(10**8) + 0.5) * 10.0 ** rng.randint(-12, 4)
+        elif kind == 4:
+            # including subnormal numbers
+            v = rng.uniform(0, 1) * 10 ** rng.randint(-320, 308)
+        else:
+            # the most frequent kind of numbers
+            v = rng.uniform(1, 10) * 10 ** rng.randint(-16, 16)
+        vals.append(-v if rng.random() < 0.5 else v)
+    return vals
+
+
+write_opt_names = ("abuse_signpos", "skip_intzero", "prefer_noexp", "keep_E")
+
+
+@pytest.mark.parametrize("opt_values", list(itertools.product((False, True), repeat=4)))
+def test_block_formatter_matches_float2fortstr(opt_values):
+    pytest.importorskip("numpy")
+    write_opts = dict(zip(write_opt_names, opt_values))
+    rng = random.Random(sum(v << i for i, v in enumerate(opt_values)))
+    # about 1.2 million numbers are formatted over all option combinations
+    for width in (11,) * 16 + (9, 12, 15):
+        vals = random_floats(rng, 4098)
+        vals, fields = write_field_by_field(vals, width=width, **write_opts)
+        lines = write_fort_float_block(vals, width=width, **write_opts)
+        assert "".join(lines) == "".join(fields)
+
+
+special_values = [
+    0.0,
+    -0.0,
+    1.0,
+    0.1,
+    1e10,
+    9.9999995,
+    9.99999949999,
+    1e-9,
+    9.9999999999e9,
+    1e100,
+    1e-100,
+    1e-300,
+    1.7e308,
+    123456789012.0,
+    12345678901,
+    7,
+    2**60,
+    0.5,
+]
+
+
+def test_block_formatter_handles_special_values(kernel):
+    for opt_values in itertools.product((False, True), repeat=4):
+        write_opts = dict(zip(write_opt_names, opt_values))
+        vals = special_values * 8
+        vals += [-v for v in vals]
+        vals, fields = write_field_by_field(vals, **write_opts)
+        lines = write_fort_float_block(vals, **write_opts)
+        assert "".join(lines) == "".join(fields)
+    lines = write_fort_float_block(special_values * 8)
+    assert lines == write_line_by_line(special_values * 8)
+    assert (
+        lines[0] == " 0.000000+0 0.000000+0 1.000000+0 1.000000-1 1.00000+10 9.999999+0"
+    )
+    lines = write_fort_float_block(special_values * 8, prefer_noexp=True)
+    assert (
+        lines[0] == "          0          0          1        0.1 1.00000+10  9.9999995"
+    )
+    # errors are raised as for the first failing number
+    vals = [1.5] * 200 + [1e-12, float("nan")]
+    with pytest.raises(InvalidFloatError):
+        write_fort_float_block(vals, prefer_noexp=True, skip_intzero=True)
+    with pytest.raises(ValueError):
+        write_fort_float_block(vals)
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+package_root = Path(__file__).parent.parent
+endf_file = Path(__file__).parent / "testdata" / "n_2925_29-Cu-63.endf"
+
+
+def get_loaded_modules(code):
+    code += (
+        "\nimport sys\n"
+        "print(' '.join(m for m in sys.modules "
+        "if m.split('.')[0] in ('endf_parserpy', 'lark', 'appdirs')))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=str(package_root),
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_package_import_is_lazy():
+    modules = get_loaded_modules("import endf_parserpy")
+    assert modules == {"endf_parserpy"}
+
+
+def test_accessories_import_without_parser():
+    modules = get_loaded_modules("from endf_parserpy.accessories import EndfPath")
+    assert "endf_parserpy.endf_parser" not in modules
+    assert "lark" not in modules
+
+
+def test_endf_parser_attribute_is_resolved_on_access():
+    modules = get_loaded_modules("from endf_parserpy import EndfParser")
+    assert "endf_parserpy.endf_parser" in modules
+    assert "lark" not in modules
+    assert "appdirs" not in modules
+
+
+def test_parsing_with_recipe_bundle_does_not_import_lark(recipe_bundle_path):
+    code = (
+        "from endf_parserpy import EndfParser, endf_recipe_utils\n"
+        f"endf_recipe_utils.default_recipe_bundle_path = {recipe_bundle_path!r}\n"
+        "parser = EndfParser(cache_dir=False)\n"
+        f"parser.parsefile({str(endf_file)!r}, include=(3,))\n"
+    )
+    modules = get_loaded_modules(code)
+    assert "lark" not in modules
+    assert "endf_parserpy.endf_recipes" not in modules
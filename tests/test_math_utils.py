@@ -0,0 +1,94 @@
+import random
+import warnings
+import pytest
+from endf_parserpy import math_utils
+from endf_parserpy.math_utils import (
+    math_add,
+    math_allclose,
+    math_div,
+    math_mod,
+    math_mul,
+    math_neg,
+    math_sub,
+)
+from endf_parserpy.custom_exceptions import InvalidIntegerError
+
+
+binary_ops = (math_add, math_sub, math_mul, math_div, math_mod)
+
+
+@pytest.fixture(params=("numpy", "elementwise"))
+def kernel(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(math_utils, "_numpy", False)
+    return request.param
+
+
+def test_integer_cast_semantics():
+    assert math_div(6, 3) == 2 and type(math_div(6, 3)) is int
+    assert math_div(-6, 4) == -1.5
+    assert type(math_div(6.0, 3)) is float
+    with pytest.raises(InvalidIntegerError):
+        math_div(7, 2, cast_int=True)
+    assert math_mod(7, 3, cast_int=True) == 1
+    assert math_mod(7.5, 2) == 1.5
+    assert math_div(True, True) == 1 and type(math_div(True, True)) is int
+    assert math_neg(3) == -3 and math_mul(2, 2.5) == 5.0
+    with pytest.raises(ZeroDivisionError):
+        math_div(1, 0)
+
+
+def test_array_operations_identical_to_elementwise(kernel, monkeypatch):
+    rng = random.Random(17)
+    x = [rng.uniform(-1e3, 1e3) for _ in range(100)]
+    y = [rng.uniform(0.5, 1e3) for _ in range(100)]
+    results = {}
+    for op in binary_ops:
+        results[op] = (op(x, y), op(x, 2.5), op(3, y), op(tuple(x), 7))
+    results[math_neg] = math_neg(x)
+    # processing element by element without NumPy
+    monkeypatch.setattr(math_utils, "_numpy", False)
+    for op in binary_ops:
+        assert results[op] == (op(x, y), op(x, 2.5), op(3, y), op(tuple(x), 7))
+        assert type(results[op][0]) is list and type(results[op][3]) is tuple
+        assert all(type(v) is float for v in results[op][0])
+    assert results[math_neg] == math_neg(x)
+
+
+def test_element_types_preserved_in_arrays(kernel):
+    x = [float(i) for i in range(50)]
+    x[10] = 10
+    res = math_add(x, 1)
+    assert type(res[10]) is int and type(res[11]) is float
+    assert math_div([6, 8] * 20, 2) == [3.0, 4.0] * 20
+    with pytest.raises(ValueError):
+        math_add(x, x[:-1])
+
+
+def test_allclose_checks_all_elements(kernel):
+    x = [0.1 * i for i in range(1000)]
+    y = [v * (1 + 1e-7) for v in x]
+    assert math_allclose(x, y) is True
+    y[500] *= 1.001
+    assert math_allclose(x, y) is False
+    assert math_allclose(x[:3], y[:3]) is True
+    assert math_allclose(x[:3], [0.0, 0.2, 0.2]) is False
+    assert math_allclose(1.0, 1.0 + 1e-9) and not math_allclose(1, 2)
+
+
+def test_division_by_zero_independent_of_length(kernel):
+    for num in (4, 40):
+        with pytest.raises(ZeroDivisionError):
+            math_div([1.0] * num, 0.0)
+        with pytest.raises(ZeroDivisionError):
+            math_mod([1.0] * num, 0.0)
+        with pytest.raises(ZeroDivisionError):
+            math_div(1.0, [1.0] * (num - 1) + [0.0])
+    # overflows yield inf without warning as for Python floats
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert math_mul([1e308] * 40, 10.0) == [float("inf")] * 40
+        assert math_div([1e308] * 40, 1e-10) == [float("inf")] * 40
+        assert math_allclose([float("inf")] * 40, [float("inf")] * 40) is False
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+
+package_root = Path(__file__).parent.parent
+endf_file = Path(__file__).parent / "testdata" / "n_2925_29-Cu-63.endf"
+
+# The script forks child processes that parse an ENDF file and
+# report their private memory after a garbage collection.
+# Shared memory pages only count as private once they are written to.
+child_memory_script = """
+import gc
+import os
+import sys
+from endf_parserpy import endf_recipe_utils
+endf_recipe_utils.default_recipe_bundle_path = sys.argv[1]
+from endf_parserpy import EndfParser, preload
+
+def get_private_memory():
+    with open("/proc/self/smaps_rollup") as fr:
+        for line in fr:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                yield int(line.split()[1])
+
+def run_child(parser, wfd):
+    if parser is None:
+        parser = EndfParser(cache_dir=False)
+    parser.parsefile(sys.argv[2], include=(3,))
+    parser.tree_dic.compile_all()
+    gc.collect()
+    os.write(wfd, str(sum(get_private_memory())).encode())
+    os._exit(0)
+
+parser = preload(cache_dir=False) if sys.argv[3] == "preload" else None
+memory = []
+for i in range(3):
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(rfd)
+        run_child(parser, wfd)
+    os.close(wfd)
+    os.waitpid(pid, 0)
+    memory.append(int(os.read(rfd, 100)))
+    os.close(rfd)
+print(sum(memory) // len(memory))
+"""
+
+
+def get_child_private_memory(recipe_bundle_path, mode):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            child_memory_script,
+            recipe_bundle_path,
+            str(endf_file),
+            mode,
+        ],
+        cwd=str(package_root),
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    return int(result.stdout)
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "fork") or not os.path.exists("/proc/self/smaps_rollup"),
+    reason="requires fork and /proc/self/smaps_rollup",
+)
+def test_preload_reduces_private_memory_of_children(recipe_bundle_path):
+    without_preload = get_child_private_memory(recipe_bundle_path, "no_preload")
+    with_preload = get_child_private_memory(recipe_bundle_path, "preload")
+    print(
+        f"private memory per child: {without_preload} kB without preload, "
+        f"{with_preload} kB with preload"
+    )
+    assert with_preload < without_preload
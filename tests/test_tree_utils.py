@@ -0,0 +1,48 @@
+import pickle
+from copy import deepcopy
+from endf_parserpy.endf_recipe_utils import get_recipe_parser
+from endf_parserpy.endf_lark import endf_recipe_grammar
+from endf_parserpy.endf_recipes import endf_recipe_dictionary
+from endf_parserpy.tree_utils import (
+    RecipeNode,
+    RecipeToken,
+    compact_tree,
+    get_child,
+    get_child_value,
+    get_name,
+    is_equal_tree,
+    is_token,
+    is_tree,
+    reconstruct_tree_str,
+)
+
+
+def test_compact_node_child_access():
+    tok1 = RecipeToken("VARNAME", "a")
+    tok2 = RecipeToken("VARNAME", "b")
+    sub1 = RecipeNode("expr", [tok2])
+    sub2 = RecipeNode("expr", [])
+    node = RecipeNode("record_fields", [tok1, sub1, tok2, sub2])
+    assert node.tokens == (tok1, tok2)
+    assert node.subtrees == (sub1, sub2)
+    assert get_child(node, "VARNAME") is tok1
+    assert get_child(node, "expr") is sub1
+    assert get_child(node, "missing", nofail=True) is None
+    assert get_child_value(node, "VARNAME") == "a"
+    assert get_name(node) == "record_fields" and get_name(tok1) == "VARNAME"
+    assert is_tree(node) and is_token(tok1)
+    assert reconstruct_tree_str(node) == "a b b "
+
+
+def test_compact_tree_roundtrip_through_pickle_and_deepcopy():
+    recipe_parser = get_recipe_parser(endf_recipe_grammar)
+    lark_tree = recipe_parser.parse(endf_recipe_dictionary[3])
+    tree = compact_tree(lark_tree)
+    assert reconstruct_tree_str(tree) == " ".join(
+        t.value for t in lark_tree.scan_values(lambda v: True)
+    )
+    tree2 = pickle.loads(pickle.dumps(tree))
+    tree3 = deepcopy(tree)
+    assert is_equal_tree(tree, tree2)
+    assert is_equal_tree(tree, tree3)
+    assert tree2.child_index is tree.child_index